@@ -0,0 +1,95 @@
+"""
+Benchmarks chunking of scraped pages, old path against the chunking stage.
+
+Pages from the fixture site, with a documentation sidebar and a field
+reference table added to each, are chunked two ways: `soup.get_text()`
+split by LlamaIndex's default SentenceSplitter (the old behavior), and
+`html_to_text` split by the StructuredNodeParser. For each it reports chunks, tokens to embed and wall
+time, and then prints the per-source statistics of the chunking stage.
+
+Usage:
+    python benchmarks/bench_chunking.py --pages 200 --chunk-size 512 --chunk-overlap 64
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from llama_index.core import Document  # noqa: E402
+from llama_index.core.node_parser import SentenceSplitter  # noqa: E402
+from llama_index.core.utils import get_tokenizer  # noqa: E402
+
+from chunking import StructuredNodeParser, html_to_text  # noqa: E402
+from scraping import HTML_PARSER  # noqa: E402
+from fixture_site import FixtureSite  # noqa: E402
+
+
+def render_pages(count: int, table_rows: int, sidebar_links: int) -> list[tuple[str, str]]:
+    """Returns (url, html) for fixture pages with a sidebar and a field reference table added."""
+    sidebar = "".join(f'<li><a href="/docs/section-{i}">Guide section {i}</a></li>' for i in range(sidebar_links))
+    sidebar = f'<aside class="sidebar"><ul>{sidebar}</ul></aside>'
+    rows = "".join(
+        f"<tr><td>field_{i}</td><td>string</td><td>Describes attribute {i} of the payment.</td></tr>"
+        for i in range(table_rows)
+    )
+    table = f"<h2>Fields</h2><table><tr><th>Name</th><th>Type</th><th>Description</th></tr>{rows}</table>"
+    with FixtureSite(num_pages=count, latency=0) as site:
+        return [
+            (
+                site.page_url(i),
+                site.render_page(i).replace("<h1>", sidebar + "<h1>").replace("<footer>", table + "<footer>"),
+            )
+            for i in range(count)
+        ]
+
+
+def run(label: str, pages: list[tuple[str, str]], to_text, node_parser) -> dict:
+    tokenizer = get_tokenizer()
+    start = time.perf_counter()
+    documents = [
+        Document(text=to_text(BeautifulSoup(html, HTML_PARSER)), extra_info={"url": url}) for url, html in pages
+    ]
+    nodes = node_parser.get_nodes_from_documents(documents)
+    seconds = time.perf_counter() - start
+    return {
+        "label": label,
+        "chunks": len(nodes),
+        "tokens": sum(len(tokenizer(node.get_content())) for node in nodes),
+        "seconds": seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunking of scraped pages.")
+    parser.add_argument("--pages", type=int, default=200, help="Number of fixture pages to chunk.")
+    parser.add_argument("--table-rows", type=int, default=40, help="Rows in each page's field table.")
+    parser.add_argument("--sidebar-links", type=int, default=80, help="Links in each page's navigation sidebar.")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Maximum tokens per chunk.")
+    parser.add_argument("--chunk-overlap", type=int, default=64, help="Tokens repeated between chunks.")
+    args = parser.parse_args()
+
+    pages = render_pages(args.pages, args.table_rows, args.sidebar_links)
+    structured = StructuredNodeParser(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    results = [
+        run(
+            "get_text + sentences",
+            pages,
+            lambda soup: soup.get_text(),
+            SentenceSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+        ),
+        run("structured", pages, html_to_text, structured),
+    ]
+
+    print("\n--- Chunking Benchmark ---")
+    print(f"{'mode':>22} {'chunks':>7} {'tokens':>10} {'seconds':>8}")
+    for r in results:
+        print(f"{r['label']:>22} {r['chunks']:>7} {r['tokens']:>10,} {r['seconds']:>8.2f}")
+    print()
+    print(structured.stats.summary())
+
+
+if __name__ == "__main__":
+    main()
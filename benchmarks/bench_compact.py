@@ -0,0 +1,229 @@
+"""
+Benchmarks compact storage: recall against full-precision search, size on disk, and query latency.
+
+Builds the same vectors into one full-precision Chroma collection and one
+compact collection per `--dims` value, through the same sinks the ingestion
+scripts use, and runs the same queries on each. For every configuration it
+reports:
+
+-   recall@k against the exact top k (a brute-force search over the full
+    float32 vectors), with the int8 re-scoring and, for comparison, with
+    the vector prefixes alone,
+-   the bytes on disk per chunk (the Chroma directory plus the int8 store),
+-   p50/p95 query latency.
+
+By default the vectors are synthetic: clustered, with their variance
+concentrated in the leading dimensions like the vectors of
+text-embedding-004, whose prefixes are trained to be usable embeddings on
+their own. `--from-collection` uses the stored vectors of a real
+(full-precision) knowledge base instead, holding out `--queries` of them as
+the queries, which is the number to trust before enabling the mode.
+
+Usage:
+    python benchmarks/bench_compact.py --chunks 20000 --dims 128 256 384
+    python benchmarks/bench_compact.py --from-collection ppro --output compact.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "scripts"))
+
+import chromadb  # noqa: E402
+from llama_index.core.schema import TextNode  # noqa: E402
+from llama_index.vector_stores.chroma import ChromaVectorStore  # noqa: E402
+
+import compact_storage  # noqa: E402
+import knowledge_store  # noqa: E402
+from query_server import LatencyStats  # noqa: E402
+
+WRITE_BATCH = 1000
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_vectors(chunks: int, queries: int, dims: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """Clustered unit vectors whose variance decays over the dimensions, and queries near random chunks."""
+    rng = np.random.default_rng(seed)
+    scale = (1.0 + np.arange(dims)) ** -0.5
+    centers = rng.normal(size=(max(1, chunks // 50), dims)) * scale
+    corpus = centers[rng.integers(len(centers), size=chunks)] + 0.6 * rng.normal(size=(chunks, dims)) * scale
+    targets = corpus[rng.integers(chunks, size=queries)]
+    query_vectors = targets + 0.6 * rng.normal(size=(queries, dims)) * scale
+    return normalize(corpus).astype(np.float32), normalize(query_vectors).astype(np.float32)
+
+
+def collection_vectors(name: str, queries: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """The stored vectors of a knowledge base, with `queries` of them held out as queries."""
+    chroma_collection = knowledge_store.get_client().get_collection(knowledge_store.collection_name(name))
+    if (chroma_collection.metadata or {}).get(compact_storage.COMPACT_DIMS_KEY):
+        raise SystemExit(f"'{name}' is already compact; pick a full-precision knowledge base.")
+    pages, offset = [], 0
+    while True:
+        page = chroma_collection.get(include=["embeddings"], limit=5000, offset=offset)
+        if len(page["ids"]):
+            pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        if len(page["ids"]) < 5000:
+            break
+        offset += 5000
+    vectors = normalize(np.concatenate(pages))
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[queries:]], vectors[order[:queries]]
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> list[set[str]]:
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return [{f"chunk-{i}" for i in row} for row in top]
+
+
+def directory_bytes(*paths: str) -> int:
+    total = 0
+    for path in paths:
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+        for root, _, files in os.walk(path):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def build(workdir: str, label: str, corpus: np.ndarray, dims: int | None):
+    """Writes the corpus into a fresh database; returns (client, collection, store path)."""
+    client = chromadb.PersistentClient(path=os.path.join(workdir, label, "chroma_db"))
+    chroma_collection = client.create_collection("bench_docs")
+    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    store_dir = os.path.join(workdir, label, "compact_vectors")
+    rescore_store = None
+    if dims:
+        knowledge_store.describe_collection(chroma_collection, compact_dims=dims)
+        rescore_store = compact_storage.RescoreStore(chroma_collection, store_dir)
+        vector_store = compact_storage.CompactSink(vector_store, rescore_store, dims)
+    for start in range(0, len(corpus), WRITE_BATCH):
+        vector_store.add(
+            [
+                TextNode(id_=f"chunk-{i}", text=f"chunk {i}", embedding=corpus[i].tolist())
+                for i in range(start, min(start + WRITE_BATCH, len(corpus)))
+            ]
+        )
+    if rescore_store is None:
+        return client, chroma_collection
+    return client, compact_storage.CompactCollection(chroma_collection, dims, rescore_store)
+
+
+def measure(collection, queries: np.ndarray, truth: list[set[str]], k: int, prefix_only: bool = False) -> dict:
+    latency = LatencyStats()
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        if prefix_only:
+            results = collection._collection.query(
+                query_embeddings=[compact_storage.truncate(query, collection.dims)], n_results=k, include=[]
+            )
+        else:
+            results = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        latency.record({"query": time.perf_counter() - start})
+        hits += len(expected & set(results["ids"][0]))
+    return {"recall": hits / (k * len(queries)), **latency.snapshot()["query"]}
+
+
+def run(args, workdir: str) -> dict:
+    if args.from_collection:
+        corpus, queries = collection_vectors(args.from_collection, args.queries, args.seed)
+    else:
+        corpus, queries = synthetic_vectors(args.chunks, args.queries, args.dimensions, args.seed)
+    print(f"\n{len(corpus)} chunk(s) of {corpus.shape[1]} dimensions, {len(queries)} queries, k={args.k}.")
+    truth = exact_top_k(corpus, queries, args.k)
+
+    results = []
+    for dims in [None, *sorted(args.dims)]:
+        label = f"{dims}d" if dims else "full"
+        start = time.perf_counter()
+        client, collection = build(workdir, label, corpus, dims)
+        build_seconds = time.perf_counter() - start
+        entry = {"config": label, "dims": dims or corpus.shape[1], "build_seconds": build_seconds}
+        entry.update(measure(collection, queries, truth, args.k))
+        if dims:
+            entry["prefix_only_recall"] = measure(collection, queries, truth, args.k, prefix_only=True)["recall"]
+            collection.rescore_store.close()
+        del collection, client
+        size = directory_bytes(os.path.join(workdir, label))
+        entry["bytes"] = size
+        entry["bytes_per_chunk"] = size / len(corpus)
+        results.append(entry)
+        print(f"  {label:<6} recall {entry['recall']:.3f}  {entry['bytes_per_chunk']:>7.0f} B/chunk")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "chunks": len(corpus),
+        "results": results,
+    }
+
+
+def print_report(report: dict):
+    full = report["results"][0]
+    print(f"\n--- Compact Storage Benchmark ({report['commit'] or 'no commit'}) ---")
+    print(
+        f"{'config':>6} {'recall':>7} {'prefix only':>12} {'B/chunk':>8} {'vs full':>8} "
+        f"{'p50 ms':>7} {'p95 ms':>7} {'build s':>8}"
+    )
+    for entry in report["results"]:
+        prefix = entry.get("prefix_only_recall")
+        print(
+            f"{entry['config']:>6} {entry['recall']:>7.3f} {(f'{prefix:.3f}' if prefix is not None else '-'):>12} "
+            f"{entry['bytes_per_chunk']:>8.0f} {entry['bytes'] / full['bytes'] * 100:>7.0f}% "
+            f"{entry['p50_ms']:>7.2f} {entry['p95_ms']:>7.2f} {entry['build_seconds']:>8.1f}"
+        )
+    print(f"\nRecall is against the exact top {report['config']['k']} over the full float32 vectors;")
+    print(f"compact queries re-score {compact_storage.RESCORE_FACTOR}x as many candidates with the int8 vectors.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall and size of compact vector storage.")
+    parser.add_argument("--chunks", type=int, default=20000, help="Synthetic chunks to index.")
+    parser.add_argument("--dimensions", type=int, default=768, help="Dimensions of the synthetic vectors.")
+    parser.add_argument("--from-collection", help="Use the stored vectors of this knowledge base instead.")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to run against each configuration.")
+    parser.add_argument("--dims", type=int, nargs="+", default=[128, 256, 384], help="Prefix lengths to compare.")
+    parser.add_argument("--k", type=int, default=10, help="Results per query.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data and held-out queries.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_compact_")
+    try:
+        report = run(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmarks the Confluence loader against a local mock of the REST API.
+
+Loads a whole space with one request in flight (how ConfluenceReader paged
+through a space) and with several, then modifies and deletes a few pages
+and runs an incremental load since the first run. Reports pages, requests
+and wall time for each.
+
+Usage:
+    python benchmarks/bench_confluence.py --pages 1000 --latency 0.2 --workers 1 4 8 --modified 20 --deleted 5
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from confluence_loader import ConfluenceLoader  # noqa: E402
+from mock_confluence import MockConfluence  # noqa: E402
+
+SPACE = "ENG"
+
+
+def run_load(site: MockConfluence, label: str, workers: int, modified_since=None) -> dict:
+    loader = ConfluenceLoader(site.base_url, "user@example.com", "token", workers=workers)
+    unchanged_ids = set()
+    start = time.perf_counter()
+    documents = list(loader.iter_documents(SPACE, modified_since, unchanged_ids))
+    seconds = time.perf_counter() - start
+    loader.close()
+    return {
+        "label": label,
+        "workers": workers,
+        "fetched": len(documents),
+        "unchanged": len(unchanged_ids),
+        "requests": loader.requests_made,
+        "seconds": seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Confluence loader against a mock REST API.")
+    parser.add_argument("--pages", type=int, default=1000, help="Pages in the mock space.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated per-request latency in seconds.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="Requests in flight to compare.")
+    parser.add_argument("--modified", type=int, default=20, help="Pages modified before the incremental run.")
+    parser.add_argument("--deleted", type=int, default=5, help="Pages deleted before the incremental run.")
+    args = parser.parse_args()
+
+    results = []
+    with MockConfluence(pages_per_space=args.pages, spaces=(SPACE,), latency=args.latency) as site:
+        for workers in args.workers:
+            results.append(run_load(site, "full", workers))
+
+        last_sync = datetime.now(timezone.utc)
+        page_ids = list(site.pages)
+        for page_id in page_ids[:args.modified]:
+            site.modify(page_id)
+        for page_id in page_ids[-args.deleted:] if args.deleted else []:
+            site.delete(page_id)
+        results.append(run_load(site, "incremental", max(args.workers), modified_since=last_sync))
+
+    print("\n--- Confluence Loader Benchmark ---")
+    print(f"{'run':>12} {'workers':>8} {'fetched':>8} {'unchanged':>10} {'requests':>9} {'seconds':>8}")
+    for r in results:
+        print(
+            f"{r['label']:>12} {r['workers']:>8} {r['fetched']:>8} {r['unchanged']:>10} "
+            f"{r['requests']:>9} {r['seconds']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmarks crawl_and_scrape against a local fixture site.
+
+Compares the sequential crawl (one worker) with the concurrent crawler at
+several worker counts and reports pages per second for each.
+
+Usage:
+    python benchmarks/bench_crawl.py --pages 200 --latency 0.05 --workers 1 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import fetcher  # noqa: E402
+from scraping import crawl_and_scrape  # noqa: E402
+from fixture_site import FixtureSite  # noqa: E402
+
+
+def run_crawl(site: FixtureSite, workers: int, recursive: bool) -> dict:
+    """Runs one crawl against the fixture site and returns its throughput."""
+    fetcher.configure(max_per_host=workers, max_retries=0)
+    site.request_count = 0
+    if recursive:
+        start_urls = [site.page_url(0)]
+    else:
+        start_urls = [site.page_url(i) for i in range(site.num_pages)]
+
+    start = time.perf_counter()
+    documents = crawl_and_scrape(start_urls, recursive=recursive, workers=workers)
+    elapsed = time.perf_counter() - start
+    return {
+        "workers": workers,
+        "pages": len(documents),
+        "requests": site.request_count,
+        "seconds": elapsed,
+        "pages_per_second": len(documents) / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crawler against a local fixture site.")
+    parser.add_argument("--pages", type=int, default=200, help="Number of pages on the fixture site.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated per-request latency in seconds.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16], help="Worker counts to compare.")
+    parser.add_argument("--recursive", action="store_true", help="Discover pages by following links instead of a URL list.")
+    args = parser.parse_args()
+
+    results = []
+    with FixtureSite(num_pages=args.pages, latency=args.latency) as site:
+        for workers in args.workers:
+            results.append(run_crawl(site, workers, args.recursive))
+
+    baseline = results[0]["pages_per_second"] or 1.0
+    print("\n--- Crawl Benchmark ---")
+    print(f"{'workers':>8} {'pages':>6} {'requests':>9} {'seconds':>8} {'pages/s':>8} {'speedup':>8}")
+    for r in results:
+        print(
+            f"{r['workers']:>8} {r['pages']:>6} {r['requests']:>9} {r['seconds']:>8.2f} "
+            f"{r['pages_per_second']:>8.1f} {r['pages_per_second'] / baseline:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmarks the near-duplicate filter at documentation-site scale.
+
+Generates `--pages` synthetic pages of random words, then adds exact copies
+and near copies (a few words changed, as in versioned or locale variants)
+of some of them. Reports how many copies were caught, false positives among
+the originals, throughput, and how much the process grew while the filter's index was built.
+
+Usage:
+    python benchmarks/bench_dedup.py --pages 20000 --copies 2000 --changed-words 2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from dedup import DEFAULT_MAX_DISTANCE, DuplicateFilter  # noqa: E402
+
+
+def make_pages(count: int, words: int, vocabulary: int, rng: random.Random) -> list[str]:
+    vocab = [f"term{i}" for i in range(vocabulary)]
+    return [" ".join(rng.choices(vocab, k=words)) for _ in range(count)]
+
+
+def near_copy(text: str, changed_words: int, rng: random.Random) -> str:
+    words = text.split()
+    for _ in range(changed_words):
+        words[rng.randrange(len(words))] = f"variant{rng.randrange(1000)}"
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate detection.")
+    parser.add_argument("--pages", type=int, default=20000, help="Number of distinct pages.")
+    parser.add_argument("--copies", type=int, default=2000, help="Exact and near copies added (each).")
+    parser.add_argument("--words", type=int, default=600, help="Words per page.")
+    parser.add_argument("--changed-words", type=int, default=2, help="Words changed in each near copy.")
+    parser.add_argument("--distance", type=int, default=DEFAULT_MAX_DISTANCE, help="Max SimHash bit distance.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = make_pages(args.pages, args.words, 20000, rng)
+    originals = rng.sample(range(args.pages), args.copies)
+    exact = [pages[i] for i in originals]
+    near = [near_copy(pages[i], args.changed_words, rng) for i in originals]
+
+    duplicates = DuplicateFilter(args.distance, label="page")
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    false_positives = sum(duplicates.check(f"page-{i}", text) is not None for i, text in enumerate(pages))
+    exact_caught = sum(duplicates.check(f"exact-{i}", text) is not None for i, text in enumerate(exact))
+    near_caught = sum(duplicates.check(f"near-{i}", text) is not None for i, text in enumerate(near))
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux.
+    memory = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+
+    checked = len(pages) + len(exact) + len(near)
+    print("\n--- Deduplication Benchmark ---")
+    print(f"Pages checked:      {checked} in {seconds:.2f}s ({checked / seconds:,.0f} pages/s)")
+    print(f"Exact copies:       {exact_caught}/{len(exact)} caught")
+    print(f"Near copies:        {near_caught}/{len(near)} caught ({args.changed_words} of {args.words} words changed)")
+    print(f"False positives:    {false_positives}/{len(pages)}")
+    print(f"Peak memory growth: {memory / 1_000_000:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
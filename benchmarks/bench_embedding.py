@@ -0,0 +1,96 @@
+"""
+Benchmarks the embedding stage against a deterministic fake model.
+
+Compares LlamaIndex's default `VectorStoreIndex.from_documents` path with the
+EmbeddingStage at several concurrency levels, writing into an in-memory
+Chroma collection. The fake model simulates per-request latency and can be
+configured to throttle, which shows the adaptive batch sizing at work.
+
+Usage:
+    python benchmarks/bench_embedding.py --docs 300 --in-flight 1 4 8 --max-concurrent 6
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import chromadb  # noqa: E402
+from llama_index.core import Document, StorageContext, VectorStoreIndex  # noqa: E402
+from llama_index.vector_stores.chroma import ChromaVectorStore  # noqa: E402
+
+from embedding_stage import EmbeddingStage  # noqa: E402
+from fakes import FakeEmbedding  # noqa: E402
+
+
+def make_documents(count: int) -> list[Document]:
+    paragraph = "Refunds for the payment method are processed within five business days. "
+    return [
+        Document(text=f"Document {i}. " + paragraph * (40 + i % 30), extra_info={"url": f"https://fixture/{i}"})
+        for i in range(count)
+    ]
+
+
+def new_vector_store(client, name: str) -> tuple:
+    collection = client.get_or_create_collection(name)
+    return collection, ChromaVectorStore(chroma_collection=collection)
+
+
+def run_baseline(client, documents, args) -> dict:
+    embedder = FakeEmbedding(request_latency=args.latency, max_concurrent_requests=args.max_concurrent)
+    collection, vector_store = new_vector_store(client, "baseline_docs")
+    start = time.perf_counter()
+    VectorStoreIndex.from_documents(
+        documents,
+        storage_context=StorageContext.from_defaults(vector_store=vector_store),
+        embed_model=embedder,
+    )
+    elapsed = time.perf_counter() - start
+    return {"mode": "from_documents", "chunks": collection.count(), "requests": embedder.requests_made,
+            "quota_errors": embedder.quota_errors, "seconds": elapsed}
+
+
+def run_stage(client, documents, in_flight: int, args) -> dict:
+    # One stage batch becomes exactly one request to the fake API.
+    embedder = FakeEmbedding(
+        embed_batch_size=args.batch,
+        request_latency=args.latency,
+        max_items_per_request=args.max_items,
+        max_concurrent_requests=args.max_concurrent,
+    )
+    collection, vector_store = new_vector_store(client, f"stage_{in_flight}_docs")
+    stage = EmbeddingStage(embedder, vector_store, max_batch_items=args.batch, max_in_flight=in_flight,
+                           backoff_factor=0.05)
+    start = time.perf_counter()
+    report = stage.run(documents)
+    elapsed = time.perf_counter() - start
+    return {"mode": f"stage x{in_flight}", "chunks": collection.count(), "requests": embedder.requests_made,
+            "quota_errors": report.quota_retries, "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the embedding stage with a fake model.")
+    parser.add_argument("--docs", type=int, default=300, help="Number of synthetic documents.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated latency per embedding request.")
+    parser.add_argument("--batch", type=int, default=250, help="Initial batch size for the stage.")
+    parser.add_argument("--max-items", type=int, default=250, help="Fake API limit on texts per request.")
+    parser.add_argument("--max-concurrent", type=int, default=None, help="Fake API limit on concurrent requests.")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 8], help="Stage concurrency levels.")
+    args = parser.parse_args()
+
+    client = chromadb.EphemeralClient()
+    results = [run_baseline(client, make_documents(args.docs), args)]
+    for in_flight in args.in_flight:
+        results.append(run_stage(client, make_documents(args.docs), in_flight, args))
+
+    print("\n--- Embedding Benchmark ---")
+    print(f"{'mode':>16} {'chunks':>7} {'requests':>9} {'quota':>6} {'seconds':>8} {'chunks/s':>9}")
+    for r in results:
+        rate = r["chunks"] / r["seconds"] if r["seconds"] else 0.0
+        print(f"{r['mode']:>16} {r['chunks']:>7} {r['requests']:>9} {r['quota_errors']:>6} "
+              f"{r['seconds']:>8.2f} {rate:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
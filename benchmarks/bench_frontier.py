@@ -0,0 +1,102 @@
+"""
+Benchmarks the crawl frontier on a synthetic, link-dense site, without any HTTP.
+
+Every page links to the same navigation links plus a few random pages, as
+documentation sidebars do. The old crawl loop (a list queue with
+`pop(0)`, every discovered link appended, a Python-level scan of the
+ignore patterns per URL) is replayed against the Frontier. For each it
+reports time, the largest queue length seen, and the memory held by the
+visited store.
+
+Usage:
+    python benchmarks/bench_frontier.py --pages 50000 --nav-links 100 --random-links 10
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from scraping import IGNORE_PATTERNS  # noqa: E402
+from ingest_common import canonicalize_url  # noqa: E402
+from frontier import Frontier, HashedURLSet, URLFilter  # noqa: E402
+
+BASE = "https://docs.example.com"
+
+
+def make_links(pages: int, nav_links: int, random_links: int, rng: random.Random) -> list[list[str]]:
+    nav = [f"{BASE}/docs/page-{i}" for i in range(nav_links)] + [f"{BASE}/login", f"{BASE}/assets/logo.png"]
+    return [
+        nav + [f"{BASE}/docs/page-{rng.randrange(pages)}/" for _ in range(random_links)]
+        for _ in range(pages)
+    ]
+
+
+def crawl_list(links: list[list[str]]) -> tuple[int, int]:
+    """The old loop: list queue, pop(0), links appended unless already visited."""
+    visited = set()
+    queue = [f"{BASE}/docs/page-0"]
+    longest = 0
+    while queue:
+        url = canonicalize_url(queue.pop(0))
+        if url in visited or any(pattern in url for pattern in IGNORE_PATTERNS):
+            continue
+        visited.add(url)
+        index = int(url.rsplit("-", 1)[1])
+        queue.extend(link for link in links[index] if link not in visited)
+        longest = max(longest, len(queue))
+    return len(visited), longest
+
+
+def crawl_frontier(links: list[list[str]]) -> tuple[int, int]:
+    frontier = Frontier("docs.example.com", URLFilter(exclude=map(re.escape, IGNORE_PATTERNS)))
+    frontier.add(f"{BASE}/docs/page-0")
+    visited = longest = 0
+    while frontier:
+        _, url, depth = frontier.pop()
+        visited += 1
+        frontier.extend(links[int(url.rsplit("-", 1)[1])], depth + 1)
+        longest = max(longest, len(frontier))
+    return visited, longest
+
+
+def store_size(store, count: int) -> int:
+    """Memory held by a visited store after adding `count` canonical URLs (strings included)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        store.add(canonicalize_url(f"{BASE}/docs/guides/payments/page-{i}"))
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crawl frontier.")
+    parser.add_argument("--pages", type=int, default=50000, help="Pages on the synthetic site.")
+    parser.add_argument("--nav-links", type=int, default=100, help="Navigation links repeated on every page.")
+    parser.add_argument("--random-links", type=int, default=10, help="Random in-site links per page.")
+    args = parser.parse_args()
+
+    links = make_links(args.pages, args.nav_links, args.random_links, random.Random(0))
+    print("\n--- Frontier Benchmark ---")
+    print(f"{'mode':>10} {'pages':>8} {'max queue':>10} {'seconds':>8}")
+    for label, crawl in (("list", crawl_list), ("frontier", crawl_frontier)):
+        start = time.perf_counter()
+        visited, longest = crawl(links)
+        print(f"{label:>10} {visited:>8} {longest:>10,} {time.perf_counter() - start:>8.2f}")
+
+    count = args.pages * 4
+    plain = store_size(set(), count)
+    hashed = store_size(HashedURLSet(), count)
+    print(f"\nVisited store for {count:,} URLs:")
+    print(f"  set[str]      {plain / 1_000_000:>6.1f} MB ({plain / count:.0f} B/URL)")
+    print(f"  HashedURLSet  {hashed / 1_000_000:>6.1f} MB ({hashed / count:.0f} B/URL)")
+
+
+if __name__ == "__main__":
+    main()
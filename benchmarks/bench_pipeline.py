@@ -0,0 +1,272 @@
+"""
+Benchmarks the whole pipeline end to end, from sitemap to answers, without any cloud service.
+
+Runs, in order and against local stand-ins only:
+
+1.  `fetch_sitemap_urls` on the fixture site (robots.txt, a sitemap index
+    and gzipped child sitemaps),
+2.  `crawl_and_scrape` of every sitemap URL, translated through a fake
+    translate client when `--translate-to` is given,
+3.  the PDF reading of `load_documents_from_sources` on the bundled PDFs,
+4.  `build_and_save_index` with a fake embedding model,
+5.  `answer_query` from `query_knowledge_base.py` with a fake LLM,
+6.  `ChromaDBReader.load_data` from `chroma_reader.py` (the reader behind `verify_chroma.py`),
+7.  `run_batch` from `batch_query.py` with the same questions; the run
+    fails if any of its records is an error.
+
+Everything is written to a scratch directory (Chroma, lexical index and all
+caches), so runs are independent and reproducible. For each stage it
+reports wall time, items per second and growth of the peak RSS, and for the
+query stages p50/p95 latency per step. `--output` saves the results as JSON,
+and `--compare` prints the change against an earlier JSON file, so two
+commits can be compared with the same command.
+
+Usage:
+    python benchmarks/bench_pipeline.py --pages 200 --queries 50 --output before.json
+    python benchmarks/bench_pipeline.py --pages 200 --queries 50 --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "scripts"))
+
+from llama_index.core import get_response_synthesizer  # noqa: E402
+
+import fetcher  # noqa: E402
+import knowledge_store  # noqa: E402
+import translation  # noqa: E402
+from batch_query import JsonlWriter, run_batch  # noqa: E402
+from chroma_reader import ChromaDBReader  # noqa: E402
+from create_knowledge_base import build_and_save_index, load_documents_from_sources  # noqa: E402
+from embedding_cache import with_cache  # noqa: E402
+from fakes import FakeEmbedding, FakeLLM, FakeTranslateClient  # noqa: E402
+from fixture_site import FixtureSite  # noqa: E402
+from pdf_ingest import DEFAULT_PAGES_PER_TASK  # noqa: E402
+from query_knowledge_base import answer_query, open_collection, open_retriever  # noqa: E402
+from query_server import LatencyStats  # noqa: E402
+from scraping import crawl_and_scrape, fetch_sitemap_urls  # noqa: E402
+
+KB_NAME = "bench"
+DEFAULT_PDFS = [os.path.join(REPO_DIR, "data")]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if platform.system() == "Darwin" else 1024)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class StageTimer:
+    """Times pipeline stages and records their throughput and peak RSS growth."""
+
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+        self.stages: dict[str, dict] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Times the body; set `result["items"]` inside it to get a throughput."""
+        result = {"items": 0}
+        rss_before = peak_rss_mb()
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        with output:
+            yield result
+        seconds = time.perf_counter() - start
+        self.stages[name] = {
+            "seconds": seconds,
+            "items": result["items"],
+            "items_per_second": result["items"] / seconds if seconds else 0.0,
+            "peak_rss_growth_mb": peak_rss_mb() - rss_before,
+            **{key: value for key, value in result.items() if key != "items"},
+        }
+        print(f"  {name:<8} {seconds:>8.2f}s  {result['items']:>6} item(s)")
+
+
+def make_queries(count: int, pages: int) -> list[str]:
+    """Questions about the fixture pages, with every fifth one an exact identifier lookup."""
+    return [
+        "payment_method_id" if i % 5 == 4 else f"Which currencies does payment flow {i * 7 % pages} accept?"
+        for i in range(count)
+    ]
+
+
+def run(args, workdir: str) -> dict:
+    timer = StageTimer(verbose=args.verbose)
+    fake_embedding = FakeEmbedding(request_latency=args.embed_latency, item_latency=args.embed_item_latency)
+    embed_model = with_cache(fake_embedding, cache_dir=os.path.join(workdir, ".embedding_cache"))
+    llm = FakeLLM(request_latency=args.llm_latency)
+    translate_client = FakeTranslateClient(request_latency=args.translate_latency)
+    fetcher.configure(max_per_host=args.workers, max_retries=0)
+    translation.configure(client=translate_client, cache_dir=os.path.join(workdir, ".translation_cache"))
+
+    print(f"\nRunning the pipeline in {workdir}...")
+    with FixtureSite(num_pages=args.pages, latency=args.latency, sitemap_chunk=args.sitemap_chunk) as site:
+        with timer.stage("sitemap") as stage:
+            urls = fetch_sitemap_urls(site.base_url)
+            stage["items"] = len(urls)
+        if sorted(urls) != sorted(site.page_url(i) for i in range(site.num_pages)):
+            raise SystemExit("❌ The sitemap stage did not return exactly the fixture pages (image entries leaked?)")
+        with timer.stage("scrape") as stage:
+            documents = crawl_and_scrape(urls, translate_to=args.translate_to, workers=args.workers)
+            stage["items"] = len(documents)
+            stage["requests"] = site.request_count
+            stage["translate_requests"] = translate_client.requests_made
+
+    with timer.stage("pdf") as stage:
+        pdf_args = argparse.Namespace(
+            urls=[],
+            pdfs=args.pdfs,
+            pdf_workers=args.pdf_workers,
+            pages_per_task=DEFAULT_PAGES_PER_TASK,
+            pdf_strategy=args.pdf_strategy,
+            no_ocr_cache=True,
+            ocr_cache_dir=None,
+        )
+        pdf_documents = load_documents_from_sources(pdf_args) if args.pdfs else []
+        stage["items"] = len(pdf_documents)
+
+    with timer.stage("index") as stage:
+        build_and_save_index(KB_NAME, documents + pdf_documents, overwrite=True, embed_model=embed_model)
+        collection = open_collection(knowledge_store.get_client(), KB_NAME)
+        stage["items"] = collection.count()
+        stage["embed_requests"] = fake_embedding.requests_made
+
+    queries = make_queries(args.queries, args.pages)
+    query_latency = LatencyStats()
+    with timer.stage("query") as stage:
+        retriever = open_retriever(collection, embed_model, mode=args.mode)
+        synthesizer = get_response_synthesizer(llm=llm)
+        for query in queries:
+            query_latency.record(answer_query(retriever, synthesizer, embed_model, query)["timings"])
+        stage["items"] = len(queries)
+
+    verify_latency = LatencyStats()
+    with timer.stage("verify") as stage:
+        reader = ChromaDBReader(collection.name, embed_model=embed_model)
+        for query in queries:
+            start = time.perf_counter()
+            reader.load_data(query, top_n=3, mode=args.mode)
+            verify_latency.record({"total": time.perf_counter() - start})
+        stage["items"] = len(queries)
+
+    with timer.stage("batch") as stage:
+        batch_path = os.path.join(workdir, "batch_results.jsonl")
+        writer = JsonlWriter(batch_path)
+        run_batch([KB_NAME], queries, embed_model, llm, knowledge_store.get_client(), writer)
+        writer.close()
+        with open(batch_path, encoding="utf-8") as f:
+            errors = [record["error"] for record in map(json.loads, f) if "error" in record]
+        if errors:
+            raise SystemExit(f"❌ {len(errors)} batch record(s) failed, e.g.: {errors[0]}")
+        stage["items"] = writer.count
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        "stages": timer.stages,
+        "latency_ms": {"query": query_latency.snapshot(), "verify": verify_latency.snapshot()},
+        "total_seconds": sum(stage["seconds"] for stage in timer.stages.values()),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(results: dict, baseline: dict | None = None):
+    def delta(new: float, old: float | None) -> str:
+        if not old:
+            return ""
+        return f"{(new - old) / old * 100:+7.1f}%"
+
+    base_stages = (baseline or {}).get("stages", {})
+    print(f"\n--- Pipeline Benchmark ({results['commit'] or 'no commit'}) ---")
+    print(f"{'stage':>8} {'seconds':>8} {'items':>7} {'items/s':>9} {'RSS +MB':>8} {'vs base':>8}")
+    for name, stage in results["stages"].items():
+        old = base_stages.get(name, {}).get("seconds")
+        print(
+            f"{name:>8} {stage['seconds']:>8.2f} {stage['items']:>7} {stage['items_per_second']:>9.1f} "
+            f"{stage['peak_rss_growth_mb']:>8.1f} {delta(stage['seconds'], old):>8}"
+        )
+
+    base_latency = (baseline or {}).get("latency_ms", {})
+    print(f"\n{'latency':>18} {'p50 ms':>8} {'p95 ms':>8} {'p95 vs base':>12}")
+    for path, steps in results["latency_ms"].items():
+        for step, values in steps.items():
+            old = base_latency.get(path, {}).get(step, {}).get("p95_ms")
+            label = f"{path}.{step}"
+            print(f"{label:>18} {values['p50_ms']:>8.1f} {values['p95_ms']:>8.1f} {delta(values['p95_ms'], old):>12}")
+
+    old_total = (baseline or {}).get("total_seconds")
+    print(f"\nTotal: {results['total_seconds']:.2f}s {delta(results['total_seconds'], old_total)}")
+    print(f"Peak RSS: {results['peak_rss_mb']:.0f} MB {delta(results['peak_rss_mb'], (baseline or {}).get('peak_rss_mb'))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion and query pipeline end to end.")
+    parser.add_argument("--pages", type=int, default=200, help="Pages on the fixture site.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated per-request latency of the site.")
+    parser.add_argument("--sitemap-chunk", type=int, default=50, help="Pages per child sitemap.")
+    parser.add_argument("--workers", type=int, default=8, help="Pages scraped concurrently.")
+    parser.add_argument("--translate-to", default=None, help="Translate pages with the fake translate client.")
+    parser.add_argument("--translate-latency", type=float, default=0.05, help="Simulated latency per translate request.")
+    parser.add_argument("--pdfs", nargs="*", default=DEFAULT_PDFS, help="PDFs or directories of PDFs to read.")
+    parser.add_argument("--pdf-workers", type=int, default=None, help="Worker processes for PDF reading.")
+    parser.add_argument("--pdf-strategy", default="fast", help="unstructured strategy; hi_res needs the OCR models.")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Simulated latency per embedding request.")
+    parser.add_argument("--embed-item-latency", type=float, default=0.0005, help="Simulated latency per embedded text.")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Simulated latency per LLM call.")
+    parser.add_argument("--queries", type=int, default=50, help="Questions asked through each query path.")
+    parser.add_argument("--mode", default="hybrid", help="Retrieval mode for the query paths.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A JSON file from an earlier run to compare against.")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output.")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    # Relative paths must survive the move into the scratch directory.
+    args.pdfs = [os.path.abspath(path) for path in args.pdfs]
+    args.output = os.path.abspath(args.output) if args.output else None
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = run(args, workdir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
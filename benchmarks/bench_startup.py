@@ -0,0 +1,206 @@
+"""
+Benchmarks CLI startup: how long `--help` takes for every command, and which heavy dependencies it loads.
+
+Each command of `apm_discovery.py` is run as `python scripts/<script>.py --help`
+in a fresh interpreter, `--repeat` times, and the median wall time is
+reported together with the heavy packages (Chroma, LlamaIndex, the Google
+Cloud SDKs, unstructured) that were imported before argparse answered. The
+entry point itself is measured with `--help` and a mistyped command.
+`--output` saves the results as JSON and `--compare` prints the change
+against an earlier file. The run fails if any `--help` crashes or loads a
+module in FORBIDDEN_AT_HELP.
+
+`--importtime COMMAND` prints the slowest imports of one command, from
+`python -X importtime`, to find what to defer next.
+
+Usage:
+    python benchmarks/bench_startup.py --output before.json
+    python benchmarks/bench_startup.py --compare before.json
+    python benchmarks/bench_startup.py --importtime query
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+SCRIPTS_DIR = os.path.join(REPO_DIR, "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from apm_discovery import COMMANDS  # noqa: E402
+
+HEAVY_MODULES = [
+    "chromadb",
+    "llama_index.core",
+    "llama_index.vector_stores.chroma",
+    "llama_index.embeddings.vertex",
+    "llama_index.llms.google_genai",
+    "vertexai",
+    "google.auth",
+    "google.cloud.translate_v2",
+    "unstructured",
+]
+# No command may load these just to print its --help.
+FORBIDDEN_AT_HELP = ["llama_index.core"]
+
+# Runs a script's --help in this interpreter and reports what it imported.
+PROBE = """
+import contextlib, io, json, runpy, sys
+script, heavy = sys.argv[1], sys.argv[2].split(",")
+sys.path.insert(0, sys.argv[3])
+sys.argv = [script, "--help"]
+error = None
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit:
+        pass
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+print(json.dumps({"loaded": [name for name in heavy if name in sys.modules], "error": error}))
+"""
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wall_time(args: list[str], repeat: int) -> float:
+    """The median wall time of running a command line in a fresh interpreter."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=REPO_DIR, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def probe(script: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, script, ",".join(HEAVY_MODULES), SCRIPTS_DIR],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+    )
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, json.JSONDecodeError):
+        return {"loaded": [], "error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "no output"}
+
+
+def run(args) -> dict:
+    entry_point = os.path.join("scripts", "apm_discovery.py")
+    interpreter = wall_time(["-c", "pass"], args.repeat)
+    print(f"\nTiming --help of {len(COMMANDS)} command(s), {args.repeat} run(s) each...")
+    commands = {}
+    for command, (module, _) in COMMANDS.items():
+        script = os.path.join("scripts", f"{module}.py")
+        commands[command] = {"script": script, "seconds": wall_time([script, "--help"], args.repeat), **probe(script)}
+        print(f"  {command:<14} {commands[command]['seconds']:>6.2f}s")
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "interpreter_seconds": interpreter,
+        "entry_point": {
+            "help": wall_time([entry_point, "--help"], args.repeat),
+            "unknown_command": wall_time([entry_point, "qurey"], args.repeat),
+        },
+        "commands": commands,
+    }
+
+
+def print_report(results: dict, baseline: dict | None = None):
+    def delta(new: float, old: float | None) -> str:
+        if not old:
+            return ""
+        return f"{(new - old) / old * 100:+7.1f}%"
+
+    base_commands = (baseline or {}).get("commands", {})
+    print(f"\n--- CLI Startup Benchmark ({results['commit'] or 'no commit'}, Python {results['python']}) ---")
+    print(f"{'command':<14} {'--help s':>9} {'vs base':>8}  heavy modules loaded")
+    for command, data in results["commands"].items():
+        old = base_commands.get(command, {}).get("seconds")
+        loaded = ", ".join(data["loaded"]) or "-"
+        print(f"{command:<14} {data['seconds']:>9.2f} {delta(data['seconds'], old):>8}  {loaded}")
+        if data["error"]:
+            print(f"{'':<14} {'':>9} {'':>8}  ❌ {data['error']}")
+    base_entry = (baseline or {}).get("entry_point", {})
+    for name, seconds in results["entry_point"].items():
+        label = f"{'entry point ' + name.replace('_', ' '):<29}"
+        print(f"\n{label} {seconds:>6.2f}s {delta(seconds, base_entry.get(name))}", end="")
+    print(f"\n\nA bare interpreter starts in {results['interpreter_seconds']:.2f}s.")
+
+
+def problems(results: dict) -> list[str]:
+    """Lists the commands whose --help crashed or loaded a module in FORBIDDEN_AT_HELP."""
+    found = []
+    for command, data in results["commands"].items():
+        forbidden = [name for name in data["loaded"] if name in FORBIDDEN_AT_HELP]
+        if forbidden:
+            found.append(f"'{command} --help' loaded {', '.join(forbidden)}")
+        if data["error"]:
+            found.append(f"'{command} --help' failed: {data['error']}")
+    return found
+
+
+def print_importtime(command: str, top: int):
+    """Prints the slowest imports (cumulative) of one command's --help."""
+    module = COMMANDS[command][0]
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join("scripts", f"{module}.py"), "--help"],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    print(f"\nSlowest imports of '{command}' ({module}.py --help):")
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1_000_000:>8.3f}s {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the startup time of the command-line scripts.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per command; the median is reported.")
+    parser.add_argument("--importtime", choices=list(COMMANDS), help="Print the slowest imports of one command.")
+    parser.add_argument("--top", type=int, default=25, help="Imports listed by --importtime.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A JSON file from an earlier run to compare against.")
+    args = parser.parse_args()
+
+    if args.importtime:
+        print_importtime(args.importtime, args.top)
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    results = run(args)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    found = problems(results)
+    if found:
+        raise SystemExit(f"❌ {'; '.join(found)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmarks the translation path against a fake translate client.
+
+Pages from the local fixture site are translated three ways: one request per
+page with the full text (the old behavior), with the segmenting Translator
+on a cold cache, and again on the warm cache as a re-ingestion would. For
+each it reports API requests, characters sent and wall time.
+
+Usage:
+    python benchmarks/bench_translation.py --pages 200 --workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import fetcher  # noqa: E402
+from scraping import crawl_and_scrape  # noqa: E402
+from fakes import FakeTranslateClient  # noqa: E402
+from fixture_site import FixtureSite  # noqa: E402
+from translation import Translator  # noqa: E402
+
+
+def run(label: str, texts: list[str], workers: int, client: FakeTranslateClient, translate) -> dict:
+    """Translates every text with `workers` threads and returns the client's counters."""
+    client.requests_made = client.chars_received = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(translate, texts))
+    return {
+        "label": label,
+        "requests": client.requests_made,
+        "chars": client.chars_received,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page translation against a fake client.")
+    parser.add_argument("--pages", type=int, default=200, help="Number of fixture pages to translate.")
+    parser.add_argument("--workers", type=int, default=8, help="Pages translated concurrently.")
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated per-request latency in seconds.")
+    args = parser.parse_args()
+
+    fetcher.configure(max_per_host=args.workers, max_retries=0)
+    with FixtureSite(num_pages=args.pages, latency=0) as site:
+        documents = crawl_and_scrape([site.page_url(i) for i in range(args.pages)], workers=args.workers)
+    texts = [doc.text for doc in documents]
+
+    client = FakeTranslateClient(request_latency=args.latency)
+    results = [
+        run(
+            "per page",
+            texts,
+            args.workers,
+            client,
+            lambda text: client.translate(text, target_language="de")["translatedText"],
+        )
+    ]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = Translator(client=client, cache_dir=cache_dir)
+        results.append(run("segmented, cold", texts, args.workers, client, lambda text: cold.translate(text, "de")))
+        cold.close()
+        warm = Translator(client=client, cache_dir=cache_dir)
+        results.append(run("segmented, warm", texts, args.workers, client, lambda text: warm.translate(text, "de")))
+        warm.close()
+
+    print("\n--- Translation Benchmark ---")
+    print(f"{'mode':>16} {'requests':>9} {'chars':>10} {'seconds':>8}")
+    for r in results:
+        print(f"{r['label']:>16} {r['requests']:>9} {r['chars']:>10,} {r['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
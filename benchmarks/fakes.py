@@ -0,0 +1,156 @@
+"""
+Deterministic local stand-ins for the cloud services used by the pipeline.
+
+These let the benchmarks exercise the real ingestion and query code without
+Google Cloud credentials or network access: an embedding model, an LLM and a
+translate client.
+"""
+import hashlib
+import threading
+import time
+from typing import Any
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import CompletionResponse, CompletionResponseGen, CustomLLM, LLMMetadata
+from pydantic import PrivateAttr
+
+
+class FakeQuotaError(Exception):
+    """Mimics the 429 / RESOURCE_EXHAUSTED error returned by Vertex AI."""
+
+
+def fake_vector(text: str, dim: int) -> list[float]:
+    """Returns a unit vector derived only from the text, so runs are reproducible."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    A deterministic embedding model with simulated latency and quota limits.
+
+    Each request sleeps `request_latency + item_latency * len(texts)` seconds.
+    Requests above `max_items_per_request`, or beyond `max_concurrent_requests`
+    running at once, fail with FakeQuotaError like a throttled Vertex endpoint.
+    """
+
+    dim: int = 768
+    request_latency: float = 0.05
+    item_latency: float = 0.0005
+    max_items_per_request: int = 250
+    max_concurrent_requests: int | None = None
+    requests_made: int = 0
+    texts_embedded: int = 0
+    quota_errors: int = 0
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _active: int = PrivateAttr(default=0)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    def _request(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.requests_made += 1
+            throttled = len(texts) > self.max_items_per_request or (
+                self.max_concurrent_requests is not None
+                and self._active >= self.max_concurrent_requests
+            )
+            if throttled:
+                self.quota_errors += 1
+            else:
+                self._active += 1
+        if throttled:
+            raise FakeQuotaError("429 Quota exceeded for text-embedding requests")
+        try:
+            time.sleep(self.request_latency + self.item_latency * len(texts))
+            with self._lock:
+                self.texts_embedded += len(texts)
+            return [fake_vector(text, self.dim) for text in texts]
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def get_query_embedding_batch(self, queries: list[str]) -> list[list[float]]:
+        return self._request(queries)
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._request([query])[0]
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._request([text])[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return self._request(texts)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embedding(text)
+
+
+class FakeTranslateClient:
+    """
+    A stand-in for `google.cloud.translate_v2.Client` with simulated latency.
+
+    Each request sleeps `request_latency + char_latency * characters` seconds.
+    A "translation" is the source text tagged with the target language, so
+    results are deterministic and easy to recognize.
+    """
+
+    def __init__(self, request_latency: float = 0.1, char_latency: float = 0.000002):
+        self.request_latency = request_latency
+        self.char_latency = char_latency
+        self.requests_made = 0
+        self.chars_received = 0
+        self._lock = threading.Lock()
+
+    def translate(self, values, target_language: str, format_: str = "html", **kwargs):
+        texts = [values] if isinstance(values, str) else list(values)
+        characters = sum(len(text) for text in texts)
+        with self._lock:
+            self.requests_made += 1
+            self.chars_received += characters
+        time.sleep(self.request_latency + self.char_latency * characters)
+        results = [
+            {"input": text, "translatedText": f"[{target_language}] {text}"} for text in texts
+        ]
+        return results[0] if isinstance(values, str) else results
+
+
+class FakeLLM(CustomLLM):
+    """
+    A deterministic stand-in for the Gemini LLM with simulated latency.
+
+    Each completion sleeps `request_latency + char_latency * len(prompt)`
+    seconds, so long retrieved contexts cost more, like a real model. The
+    answer names the prompt size, so results are deterministic.
+    """
+
+    request_latency: float = 0.2
+    char_latency: float = 0.00002
+    requests_made: int = 0
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="fake-llm")
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        with self._lock:
+            self.requests_made += 1
+        time.sleep(self.request_latency + self.char_latency * len(prompt))
+        return CompletionResponse(text=f"A fake answer drawn from {len(prompt)} characters of context.")
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponseGen:
+        response = self.complete(prompt, formatted=formatted, **kwargs)
+        yield CompletionResponse(text=response.text, delta=response.text)
@@ -0,0 +1,169 @@
+"""
+A local HTTP stand-in for a documentation site, used by the benchmarks.
+
+The site serves `num_pages` interlinked HTML pages under /docs/ plus a
+/sitemap.xml listing all of them. With `sitemap_chunk`, it instead
+publishes a sitemap index in robots.txt whose gzipped child sitemaps list
+`sitemap_chunk` pages each, as large developer portals do. Pages listed in
+`lastmod` carry that `<lastmod>` date, and every sitemap entry has an
+image-sitemap `<image:image>` child with its own `<image:loc>`, as sites
+with image sitemaps publish. Every response is delayed by `latency` seconds
+to simulate network round trips, so crawl throughput numbers reflect how
+well the crawler overlaps waiting rather than raw localhost speed.
+Responses carry an ETag and honor If-None-Match with 304 Not Modified.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_TEMPLATE = """<html>
+<head><title>Fixture page {index}</title></head>
+<body>
+<nav><a href="/docs/page-0">Home</a> <a href="/login">Login</a></nav>
+<h1>Payment method guide, part {index}</h1>
+<p>{body}</p>
+{links}
+<footer>Fixture documentation site</footer>
+</body>
+</html>
+"""
+
+
+class FixtureSite:
+    """A threaded HTTP server that serves the fixture documentation site."""
+
+    def __init__(
+        self, num_pages: int = 200, latency: float = 0.05, links_per_page: int = 5, sitemap_chunk: int = 0
+    ):
+        self.num_pages = num_pages
+        self.latency = latency
+        self.links_per_page = links_per_page
+        self.sitemap_chunk = sitemap_chunk
+        # Page index -> W3C datetime published as the page's <lastmod>.
+        self.lastmod: dict[int, str] = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/"
+
+    def page_url(self, index: int) -> str:
+        return f"{self.base_url}docs/page-{index}"
+
+    def render_page(self, index: int) -> str:
+        links = "\n".join(
+            f'<a href="/docs/page-{(index * 7 + j + 1) % self.num_pages}">Next {j}</a>'
+            for j in range(self.links_per_page)
+        )
+        body = " ".join(
+            f"The payment_method_id field for flow {index} accepts EUR and USD." for _ in range(20)
+        )
+        return PAGE_TEMPLATE.format(index=index, body=body, links=links)
+
+    def _sitemap_entry(self, index: int) -> str:
+        lastmod = f"<lastmod>{self.lastmod[index]}</lastmod>" if index in self.lastmod else ""
+        image = f"<image:image><image:loc>{self.base_url}images/page-{index}.png</image:loc></image:image>"
+        return f"<url><loc>{self.page_url(index)}</loc>{image}{lastmod}</url>"
+
+    def render_sitemap(self, pages: range | None = None) -> str:
+        entries = "\n".join(self._sitemap_entry(i) for i in pages or range(self.num_pages))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+            ' xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n'
+            f"{entries}\n</urlset>\n"
+        )
+
+    def render_sitemap_index(self) -> str:
+        parts = range((self.num_pages + self.sitemap_chunk - 1) // self.sitemap_chunk)
+        entries = "\n".join(f"<sitemap><loc>{self.base_url}sitemaps/part-{n}.xml.gz</loc></sitemap>" for n in parts)
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            f"{entries}\n</sitemapindex>\n"
+        )
+
+    def _sitemap_response(self, path: str) -> bytes | None:
+        """Returns the body served at a robots.txt or sitemap path, or None."""
+        if not self.sitemap_chunk:
+            return self.render_sitemap().encode("utf-8") if path == "/sitemap.xml" else None
+        if path == "/robots.txt":
+            return f"User-agent: *\nDisallow: /login\nSitemap: {self.base_url}sitemap_index.xml\n".encode("utf-8")
+        if path == "/sitemap_index.xml":
+            return self.render_sitemap_index().encode("utf-8")
+        if path.startswith("/sitemaps/part-") and path.endswith(".xml.gz"):
+            part = int(path[len("/sitemaps/part-"):-len(".xml.gz")])
+            pages = range(part * self.sitemap_chunk, min(self.num_pages, (part + 1) * self.sitemap_chunk))
+            return gzip.compress(self.render_sitemap(pages).encode("utf-8")) if pages else None
+        return None
+
+    def _make_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with site._lock:
+                    site.request_count += 1
+                if site.latency:
+                    time.sleep(site.latency)
+
+                content_type = "text/html; charset=utf-8"
+                sitemap = site._sitemap_response(self.path)
+                if sitemap is not None:
+                    payload, content_type = sitemap, "application/xml"
+                elif self.path.startswith("/docs/page-"):
+                    try:
+                        index = int(self.path.rsplit("-", 1)[1])
+                    except ValueError:
+                        index = -1
+                    if not 0 <= index < site.num_pages:
+                        self.send_error(404)
+                        return
+                    payload = site.render_page(index).encode("utf-8")
+                else:
+                    self.send_error(404)
+                    return
+
+                etag = '"' + hashlib.md5(payload).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FixtureSite":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
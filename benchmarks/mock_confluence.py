@@ -0,0 +1,203 @@
+"""
+A local stand-in for the Confluence Cloud REST API, used by the benchmarks.
+
+Serves the two endpoints the ConfluenceLoader uses, with `_links.next`
+relative to `_links.base` like the real API:
+
+-   `/rest/api/content?spaceKey=...`: the current pages of a space, paged
+    with `start`/`limit`. As on Confluence Cloud, `limit` is capped (at
+    `max_expanded_limit`) when page bodies are expanded.
+-   `/rest/api/content/search?cql=...`: paged by an opaque `cursor` that
+    only `_links.next` carries; as on Confluence Cloud, `start` is ignored.
+    Only the `space = "KEY"` and `lastmodified >= "yyyy-MM-dd HH:mm"`
+    clauses are understood, which is all the loader sends.
+
+Requests without the expected Basic auth header get 401. Every response is
+delayed by `latency` seconds, and pages can be modified or deleted between
+runs to exercise incremental syncs.
+"""
+import base64
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+_SPACE_CLAUSE = re.compile(r'space\s*=\s*"([^"]+)"')
+_MODIFIED_CLAUSE = re.compile(r'lastmodified\s*>=\s*"([^"]+)"')
+
+PAGE_TEMPLATE = """<h1>{title}</h1>
+<p>{body}</p>
+<h2>Fields</h2>
+<table><tr><th>Name</th><th>Type</th></tr><tr><td>amount_{index}</td><td>integer</td></tr></table>
+<pre><code>POST /payments/{index}</code></pre>
+"""
+
+
+class MockConfluence:
+    """A threaded HTTP server that serves Confluence spaces from memory."""
+
+    def __init__(
+        self,
+        pages_per_space: int = 500,
+        spaces: tuple[str, ...] = ("ENG",),
+        latency: float = 0.05,
+        max_limit: int = 100,
+        max_expanded_limit: int = 25,
+        username: str = "user@example.com",
+        api_token: str = "token",
+    ):
+        self.latency = latency
+        self.max_limit = max_limit
+        self.max_expanded_limit = max_expanded_limit
+        self.request_count = 0
+        token = base64.b64encode(f"{username}:{api_token}".encode("utf-8")).decode("ascii")
+        self._authorization = f"Basic {token}"
+        self._lock = threading.Lock()
+        created = datetime.now(timezone.utc) - timedelta(days=30)
+        # Page ID -> page record, in ID order.
+        self.pages: dict[str, dict] = {}
+        for space in spaces:
+            for _ in range(pages_per_space):
+                page_id = str(100000 + len(self.pages))
+                self.pages[page_id] = {"id": page_id, "space": space, "version": 1, "when": created}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/wiki"
+
+    def modify(self, page_id: str):
+        """Publishes a new version of a page."""
+        with self._lock:
+            page = self.pages[page_id]
+            page["version"] += 1
+            page["when"] = datetime.now(timezone.utc)
+
+    def delete(self, page_id: str):
+        with self._lock:
+            del self.pages[page_id]
+
+    def _render(self, page: dict, expand: str) -> dict:
+        title = f"Payment flow {page['id']}"
+        result = {
+            "id": page["id"],
+            "type": "page",
+            "status": "current",
+            "title": title,
+            "_links": {"webui": f"/spaces/{page['space']}/pages/{page['id']}"},
+        }
+        if "version" in expand:
+            result["version"] = {"number": page["version"], "when": page["when"].isoformat()}
+        if "body.export_view" in expand:
+            body = " ".join(
+                f"Version {page['version']} of flow {page['id']} settles in EUR and USD." for _ in range(30)
+            )
+            html = PAGE_TEMPLATE.format(title=title, body=body, index=page["id"])
+            result["body"] = {"export_view": {"value": html, "representation": "export_view"}}
+        return result
+
+    def _select(self, path: str, params: dict) -> list[dict] | None:
+        with self._lock:
+            pages = list(self.pages.values())
+        if path == "/wiki/rest/api/content":
+            space = params.get("spaceKey")
+            return [page for page in pages if page["space"] == space]
+        if path == "/wiki/rest/api/content/search":
+            cql = params.get("cql", "")
+            space = _SPACE_CLAUSE.search(cql)
+            modified = _MODIFIED_CLAUSE.search(cql)
+            since = (
+                datetime.strptime(modified.group(1), "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc)
+                if modified
+                else None
+            )
+            return [
+                page
+                for page in pages
+                if (space is None or page["space"] == space.group(1)) and (since is None or page["when"] >= since)
+            ]
+        return None
+
+    def _respond(self, path: str, params: dict) -> dict | None:
+        pages = self._select(path, params)
+        if pages is None:
+            return None
+        expand = params.get("expand", "")
+        cap = self.max_expanded_limit if "body" in expand else self.max_limit
+        limit = min(int(params.get("limit", 25)), cap)
+        # Links are relative to the base URL, which already ends in the /wiki context path.
+        relative_path = path[len("/wiki"):]
+        links = {"base": self.base_url}
+        if relative_path.endswith("/search"):
+            cursor = params.pop("cursor", "")
+            start = int(base64.urlsafe_b64decode(cursor).decode("ascii")) if cursor else 0
+            params.pop("start", None)
+            next_params = {"cursor": base64.urlsafe_b64encode(str(start + limit).encode("ascii")).decode("ascii")}
+        else:
+            start = int(params.get("start", 0))
+            next_params = {"start": start + limit}
+        window = pages[start:start + limit]
+        if start + limit < len(pages):
+            links["next"] = f"{relative_path}?{urlencode({**params, **next_params, 'limit': limit})}"
+        return {
+            "results": [self._render(page, expand) for page in window],
+            "start": start,
+            "limit": limit,
+            "size": len(window),
+            "_links": links,
+        }
+
+    def _make_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with site._lock:
+                    site.request_count += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                if self.headers.get("Authorization") != site._authorization:
+                    self.send_error(401)
+                    return
+
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                data = site._respond(url.path, params)
+                if data is None:
+                    self.send_error(404)
+                    return
+
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MockConfluence":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
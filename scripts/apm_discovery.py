@@ -0,0 +1,65 @@
+"""
+The single command-line entry point: `apm-discovery <command> [options]`.
+
+Every command is one of the scripts in this directory, run with the rest
+of the command line. Only the chosen script is imported, after the command
+has been resolved, so listing the commands or mistyping one answers
+immediately instead of loading Chroma and the LlamaIndex stack first.
+
+    python scripts/apm_discovery.py --help
+    python scripts/apm_discovery.py ingest --name klarna --urls https://docs.klarna.com/ --overwrite
+    python scripts/apm_discovery.py query --name klarna --query "Which currencies are supported?"
+"""
+import difflib
+import importlib
+import sys
+
+# --- Global Configuration ---
+PROG = "apm-discovery"
+# Command -> (script module, summary), in the order they are listed.
+COMMANDS = {
+    "ingest": ("create_knowledge_base", "Scrape websites and PDFs into a payment method's knowledge base."),
+    "ingest-core": ("create_core_knowledge_base", "Build the core knowledge base from Confluence and the API reference."),
+    "query": ("query_knowledge_base", "Answer a question from one knowledge base."),
+    "batch": ("batch_query", "Answer a checklist of questions across knowledge bases."),
+    "serve": ("query_server", "Keep the models and collections warm and answer over HTTP."),
+    "ask": ("query_client", "Ask a running query server."),
+    "verify": ("verify_chroma", "Show the chunks a search returns from a collection."),
+    "kb": ("knowledge_store", "List the knowledge bases or search several at once."),
+    "lexical-index": ("lexical_index", "Rebuild the BM25 index of a knowledge base."),
+    "setup-nltk": ("setup_nltk", "Download the NLTK data used by the PDF parser."),
+}
+# --- End Global Configuration ---
+
+
+def usage() -> str:
+    width = max(len(command) for command in COMMANDS)
+    lines = [f"usage: {PROG} <command> [options]", "", "commands:"]
+    lines += [f"  {command:<{width}}  {summary}" for command, (_, summary) in COMMANDS.items()]
+    lines += ["", f"Run '{PROG} <command> --help' for the options of a command."]
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Runs the command named by the first argument with the remaining ones."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, *rest = argv
+    if command not in COMMANDS:
+        close = difflib.get_close_matches(command, COMMANDS, n=3)
+        hint = f" Did you mean: {', '.join(close)}?" if close else ""
+        print(f"{PROG}: unknown command '{command}'.{hint}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    module = importlib.import_module(COMMANDS[command][0])
+    # The scripts parse sys.argv themselves; this also makes their usage
+    # lines read "apm-discovery <command>".
+    sys.argv = [f"{PROG} {command}", *rest]
+    module.main()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Runs a whole question set against many knowledge bases in one process.
+
+A discovery checklist of ~40 questions asked of every `<name>_docs`
+collection used to cost one `query_knowledge_base.py` launch (and one cold
+start) per question and collection. Here the models and Chroma are set up
+once, all questions are embedded in one batched call, retrieval of every
+(collection, question) pair fans out on a thread pool, and at most
+`--llm-concurrency` answer syntheses run at once. Each answer is written as one JSON line as
+soon as it is ready. Answers already in the query cache for the current
+version of a collection are reused without retrieval or LLM calls.
+
+Usage:
+    python scripts/batch_query.py --questions checklist.txt --all --output results.jsonl
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import knowledge_store
+from query_cache import DEFAULT_CACHE_DIR, DEFAULT_TTL_SECONDS, QueryCache, collection_version, retrieval_settings
+from query_knowledge_base import (
+    DEFAULT_LOCATION,
+    DEFAULT_SIMILARITY_TOP_K,
+    configure_models,
+    open_collection,
+    open_retriever,
+    source_list,
+)
+
+# --- Global Configuration ---
+DEFAULT_RETRIEVAL_WORKERS = 8
+DEFAULT_LLM_CONCURRENCY = 4
+# --- End Global Configuration ---
+
+
+def read_questions(path: str) -> list[str]:
+    """Reads one question per line, skipping blank lines and '#' comments."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class JsonlWriter:
+    """Appends one JSON object per line and flushes it, from any thread."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, record: dict):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(
+    names: list[str],
+    questions: list[str],
+    embed_model,
+    llm,
+    db,
+    writer: JsonlWriter,
+    cache: QueryCache | None = None,
+    retrieval_workers: int = DEFAULT_RETRIEVAL_WORKERS,
+    llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+    similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+):
+    """
+    Answers every question against every knowledge base, streaming results to `writer`.
+
+    Args:
+        names: The knowledge bases to query.
+        questions: The questions to ask each knowledge base.
+        embed_model: The embedding model used for the questions.
+        llm: The LLM used to synthesize answers.
+        db: A chromadb client.
+        writer: Receives one record per (knowledge base, question) pair.
+        cache: An optional QueryCache for query embeddings and answers.
+        retrieval_workers: How many retrievals run at once.
+        llm_concurrency: How many answer syntheses run at once.
+        similarity_top_k: How many chunks are retrieved per question.
+    """
+    from llama_index.core import QueryBundle, get_response_synthesizer
+
+    from embedding_cache import embed_query_batch
+
+    start = time.perf_counter()
+    if cache is not None:
+        embeddings = cache.embed_queries(embed_model, questions)
+    else:
+        embeddings = embed_query_batch(embed_model, questions)
+    bundles = [
+        QueryBundle(query_str=question, embedding=embedding)
+        for question, embedding in zip(questions, embeddings)
+    ]
+    print(f"✅ Embedded {len(questions)} question(s) in {time.perf_counter() - start:.2f}s.")
+
+    synthesizer = get_response_synthesizer(llm=llm)
+
+    def record(name: str, index: int, **fields) -> dict:
+        return {"name": name, "question_index": index, "question": questions[index], **fields}
+
+    def synthesize(name: str, version: str, settings: str, index: int, nodes, retrieve_seconds: float):
+        try:
+            started = time.perf_counter()
+            response = synthesizer.synthesize(bundles[index], nodes)
+            answer = {"response": str(response), "sources": source_list(response.source_nodes)}
+            if cache is not None:
+                cache.put_answer(version, settings, questions[index], answer)
+            timings = {"retrieve": retrieve_seconds, "synthesize": time.perf_counter() - started}
+            writer.write(record(name, index, **answer, timings=timings, cached=False))
+        except Exception as e:
+            writer.write(record(name, index, error=str(e)))
+
+    def open_engine(name: str):
+        """Returns (version, retriever) for a knowledge base, or None if it cannot be opened."""
+        try:
+            chroma_collection = open_collection(db, name)
+            retriever = open_retriever(chroma_collection, embed_model, similarity_top_k)
+            return collection_version(chroma_collection), retriever
+        except Exception as e:
+            print(f"❌ Could not open knowledge base '{name}': {e}")
+            for index in range(len(questions)):
+                writer.write(record(name, index, error=str(e)))
+            return None
+
+    with ThreadPoolExecutor(max_workers=llm_concurrency) as llm_pool:
+
+        def retrieve(name: str, version: str, retriever, index: int):
+            """Retrieves one question from one knowledge base and queues its synthesis."""
+            settings = retrieval_settings(retriever.mode, retriever.similarity_top_k)
+            answer = cache.get_answer(version, settings, questions[index]) if cache is not None else None
+            if answer is not None:
+                writer.write(record(name, index, **answer, timings={}, cached=True))
+                return
+            try:
+                started = time.perf_counter()
+                nodes = retriever.retrieve(bundles[index])
+                retrieve_seconds = time.perf_counter() - started
+            except Exception as e:
+                writer.write(record(name, index, error=str(e)))
+                return
+            llm_pool.submit(synthesize, name, version, settings, index, nodes, retrieve_seconds)
+
+        with ThreadPoolExecutor(max_workers=retrieval_workers) as retrieval_pool:
+            opened = dict(zip(names, retrieval_pool.map(open_engine, names)))
+            for name, engine in opened.items():
+                if engine is None:
+                    continue
+                for index in range(len(questions)):
+                    retrieval_pool.submit(retrieve, name, *engine, index)
+
+
+def main():
+    """Main function to parse arguments and run the batch."""
+    parser = argparse.ArgumentParser(
+        description="Ask a set of questions of many knowledge bases in one run.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "--questions", required=True, help="Text file with one question per line ('#' starts a comment)."
+    )
+    parser.add_argument("--names", nargs="*", default=[], help="Knowledge bases to query (e.g., alma ppro).")
+    parser.add_argument("--all", action="store_true", help="Query every knowledge base in the knowledge store.")
+    parser.add_argument("--output", default="batch_results.jsonl", help="Where to write the JSONL results.")
+    parser.add_argument(
+        "--retrieval-workers",
+        type=int,
+        default=DEFAULT_RETRIEVAL_WORKERS,
+        help=f"Knowledge bases retrieved from at once (default: {DEFAULT_RETRIEVAL_WORKERS}).",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=DEFAULT_LLM_CONCURRENCY,
+        help=f"Answer syntheses running at once (default: {DEFAULT_LLM_CONCURRENCY}).",
+    )
+    parser.add_argument("--location", default=DEFAULT_LOCATION, help="The Google Cloud location/region.")
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory for cached query embeddings and answers (default: {DEFAULT_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_SECONDS,
+        help="Seconds a cached answer stays valid (default: one week).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Always embed and answer questions afresh.")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    db = knowledge_store.get_client()
+    names = args.names
+    if args.all:
+        names = [entry.name for entry in knowledge_store.KnowledgeStore(db).knowledge_bases()]
+    if not questions or not names:
+        print("Error: Provide at least one question and one knowledge base (--names or --all).")
+        return
+
+    print(f"--- Asking {len(questions)} question(s) of {len(names)} knowledge base(s) ---")
+    print("Authenticating with Google Cloud and configuring models...")
+    embed_model, llm = configure_models(args.location)
+    print("✅ Authentication and model configuration successful.")
+
+    cache = None if args.no_cache else QueryCache(args.cache_dir, ttl_seconds=args.cache_ttl)
+    writer = JsonlWriter(args.output)
+    start = time.perf_counter()
+    try:
+        run_batch(
+            names,
+            questions,
+            embed_model,
+            llm,
+            db,
+            writer,
+            cache=cache,
+            retrieval_workers=args.retrieval_workers,
+            llm_concurrency=args.llm_concurrency,
+        )
+    finally:
+        writer.close()
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
+    print(f"🎉 Wrote {writer.count} answer(s) to {args.output} in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
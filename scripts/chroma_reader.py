@@ -0,0 +1,95 @@
+"""
+A LlamaIndex reader that searches one Chroma collection directly, for `verify_chroma.py`.
+
+It lives apart from the command because subclassing `BaseReader` loads
+LlamaIndex, which `verify_chroma.py --help` does not need.
+"""
+from typing import List
+
+from llama_index.core.readers.base import BaseReader
+from llama_index.core.schema import Document
+
+import compact_storage
+import knowledge_store
+import models
+from lexical_index import INDEX_DIR_NAME, LexicalIndex, hybrid_search
+
+
+class ChromaDBReader(BaseReader):
+    """
+    A reader to directly query a ChromaDB collection and retrieve documents.
+
+    This is a simplified reader that connects to an existing ChromaDB collection
+    and performs a hybrid (BM25 + vector) search to retrieve the top N most relevant documents
+    for a given query. It's primarily used for verification and direct querying,
+    bypassing the complexity of a full query engine.
+    """
+
+    def __init__(self, collection_name: str, persist_directory: str | None = None, embed_model=None):
+        """
+        Initializes the ChromaDBReader.
+
+        Args:
+            collection_name: The name of the ChromaDB collection to query.
+            persist_directory: The directory where ChromaDB data is stored.
+                Defaults to the knowledge store's shared client.
+            embed_model: The model that embeds queries, wrapped by
+                `embedding_cache.with_cache`. By default Vertex AI
+                text-embedding-004 is set up on the first vector search.
+        """
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.embed_model = embed_model
+        if persist_directory is None:
+            self.client = knowledge_store.get_client()
+        else:
+            import chromadb
+
+            self.client = chromadb.PersistentClient(path=persist_directory)
+
+    def load_data(self, query_text: str, top_n: int = 3, mode: str = "hybrid") -> List[Document]:
+        """
+        Searches the ChromaDB collection by BM25, vector similarity, or both.
+
+        Args:
+            query_text: The text to search for.
+            top_n: The number of top results to return.
+            mode: "hybrid", "vector" or "lexical".
+
+        Returns:
+            A list of LlamaIndex Document objects representing the results.
+        """
+        print(f"--- 1. Connecting to ChromaDB Collection: '{self.collection_name}' ---")
+        index_dir = store_dir = None
+        if self.persist_directory is not None:
+            # Lexical indexes and full vectors are kept beside the database they were built from.
+            index_dir = knowledge_store.side_store_dir(INDEX_DIR_NAME, path=self.persist_directory)
+            store_dir = knowledge_store.side_store_dir(compact_storage.STORE_DIR_NAME, path=self.persist_directory)
+        collection = compact_storage.wrap(self.client.get_collection(self.collection_name), store_dir=store_dir)
+        lexical_index = LexicalIndex(self.collection_name, index_dir)
+        if mode != "vector":
+            lexical_index.ensure_built(collection)
+        print("✅ Connected.")
+
+        def embed_query() -> list[float]:
+            if self.embed_model is None:
+                print("\n--- 2. Authenticating and Initializing Embedding Model ---")
+                self.embed_model = models.embedding_model()
+                print("✅ Embedding model initialized.")
+
+            print("\n--- 3. Generating Query Embedding ---")
+            # The query task type, as every other query path uses, so scores match theirs.
+            query_embedding = self.embed_model.get_query_embedding(query_text)
+            print("✅ Query embedding created.")
+            if hasattr(self.embed_model, "summary"):
+                print(self.embed_model.summary())
+            return query_embedding
+
+        print(f"\n--- 4. Searching for Top {top_n} Results ({mode}) ---")
+        hits = hybrid_search(collection, lexical_index, query_text, top_n, embed_query, mode=mode)
+        lexical_index.close()
+        if isinstance(collection, compact_storage.CompactCollection):
+            collection.close()
+        print("✅ Query complete.")
+
+        return [Document(text=hit.text, extra_info={"id": hit.id, "score": hit.score}) for hit in hits]
@@ -0,0 +1,403 @@
+"""
+Structure-aware chunking for the ingestion pipeline.
+
+Scraped pages used to be indexed as raw `soup.get_text()` (navigation menus,
+footers and long whitespace runs included) and split by the default
+sentence splitter, which also cut PDF tables mid-row. This module keeps the
+document structure instead:
+
+-   `html_to_text` keeps only the page's main content, drops boilerplate
+    (nav, footers, sidebars, scripts, cookie banners), and renders headings
+    as `#` lines, tables as `cell | cell` rows and code as fenced blocks.
+-   `StructuredNodeParser` splits text into blocks (paragraphs, tables, code)
+    grouped under their headings. Small sections are packed together up to
+    `chunk_size` tokens, a new chunk starts at a heading whenever the next
+    section no longer fits, tables and code blocks are never split between
+    rows or lines unless they alone exceed the chunk size (oversized tables
+    repeat their header row in every piece), and each chunk records its
+    heading path in the `section` metadata.
+-   `ChunkStats` counts documents, chunks and tokens per source (host or
+    file) so storage and embedding cost can be tuned per source.
+
+Scraped web pages and Confluence pages (fetched as rendered HTML by
+`confluence_loader`) both go through `html_to_text`, and `pdf_element_text`
+renders partitioned PDF elements in the same form (titles as `#` headings,
+tables as pipe rows), so every source is split the same way.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Sequence
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup, Comment, NavigableString
+from llama_index.core.node_parser import NodeParser, SentenceSplitter
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode
+from llama_index.core.utils import get_tokenizer
+from pydantic import Field, PrivateAttr
+
+from ingest_common import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE
+
+# --- Global Configuration ---
+# Tags that never hold documentation content.
+BOILERPLATE_TAGS = (
+    "script", "style", "noscript", "template", "svg", "nav", "footer", "aside", "form", "iframe", "button",
+)
+# ARIA roles of page furniture.
+BOILERPLATE_ROLES = ("navigation", "banner", "contentinfo", "search", "complementary")
+# Class or ID words that mark page furniture, e.g. class="sidebar" or id="cookie-banner".
+_BOILERPLATE_HINT = re.compile(
+    r"(^|[-_\s])(nav|navbar|menu|sidebar|breadcrumbs?|footer|cookie|cookies|consent|toc|skip-link)([-_\s]|$)",
+    re.IGNORECASE,
+)
+# unstructured element types that repeat on every PDF page.
+PDF_BOILERPLATE_TYPES = ("Header", "Footer", "PageNumber")
+# --- End Global Configuration ---
+
+_HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+# Block elements start a new paragraph; line elements only a new line.
+_BLOCK_TAGS = ("p", "div", "section", "article", "main", "blockquote", "ul", "ol", "dl", "figure", "details")
+_LINE_TAGS = ("li", "dt", "dd", "summary", "figcaption")
+_WHITESPACE = re.compile(r"\s+")
+_HEADING_LINE = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+_FENCE = "```"
+
+
+def _is_boilerplate(tag) -> bool:
+    if tag.attrs is None:
+        return False
+    if tag.get("role") in BOILERPLATE_ROLES or tag.get("aria-hidden") == "true":
+        return True
+    hints = " ".join(tag.get("class") or []) + " " + (tag.get("id") or "")
+    return bool(_BOILERPLATE_HINT.search(hints))
+
+
+def strip_boilerplate(root):
+    """Removes navigation, footers, sidebars, scripts and similar page furniture in place."""
+    for comment in root.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+    for tag in root.find_all(BOILERPLATE_TAGS):
+        tag.decompose()
+    # A <header> often holds the page title, so it is only dropped without one.
+    for tag in root.find_all("header"):
+        if not tag.find(_HEADING_TAGS[:2]):
+            tag.decompose()
+    for tag in root.find_all(_is_boilerplate):
+        if not tag.decomposed:
+            tag.decompose()
+
+
+def _cell_text(cell) -> str:
+    return " ".join(cell.get_text(" ").split()).replace("|", "\\|")
+
+
+def table_to_text(table) -> str:
+    """Renders a <table> as one `cell | cell` line per row."""
+    rows = []
+    for row in table.find_all("tr"):
+        cells = [_cell_text(cell) for cell in row.find_all(("th", "td"))]
+        if any(cells):
+            rows.append(" | ".join(cells))
+    return "\n".join(rows)
+
+
+def table_html_to_text(html: str) -> str:
+    """Renders an HTML table (e.g. a PDF table's `text_as_html`) as pipe rows."""
+    table = BeautifulSoup(html, "html.parser").find("table")
+    return table_to_text(table) if table is not None else ""
+
+
+def html_to_text(soup: BeautifulSoup) -> str:
+    """
+    Extracts the main content of a page as text that keeps its structure.
+
+    The soup is modified in place, so links should be collected first.
+
+    Args:
+        soup: The parsed page.
+
+    Returns:
+        Text with `#` heading lines, pipe table rows, fenced code blocks, and
+        blank lines between paragraphs.
+    """
+    root = soup.find("main") or soup.find(attrs={"role": "main"}) or soup.find("article") or soup.body or soup
+    strip_boilerplate(root)
+
+    # Collapse source formatting everywhere except code, where it matters.
+    for text in root.find_all(string=True):
+        if text.find_parent("pre") is None:
+            text.replace_with(_WHITESPACE.sub(" ", text))
+    for pre in root.find_all("pre"):
+        pre.replace_with(NavigableString(f"\n\n{_FENCE}\n{pre.get_text().strip(chr(10))}\n{_FENCE}\n\n"))
+    for table in root.find_all("table"):
+        table.replace_with(NavigableString(f"\n\n{table_to_text(table)}\n\n"))
+    for heading in root.find_all(_HEADING_TAGS):
+        title = " ".join(heading.get_text(" ").split())
+        heading.replace_with(NavigableString(f"\n\n{'#' * int(heading.name[1])} {title}\n\n" if title else ""))
+    for br in root.find_all("br"):
+        br.replace_with(NavigableString("\n"))
+    for tag in root.find_all(_LINE_TAGS):
+        tag.insert_before(NavigableString("\n"))
+    for tag in root.find_all(_BLOCK_TAGS):
+        tag.insert_before(NavigableString("\n\n"))
+        tag.insert_after(NavigableString("\n\n"))
+
+    lines, in_code = [], False
+    for line in root.get_text().split("\n"):
+        if line.strip() == _FENCE:
+            in_code = not in_code
+            lines.append(_FENCE)
+        elif in_code:
+            lines.append(line.rstrip())
+        else:
+            lines.append(line.strip())
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def split_blocks(text: str) -> list[str]:
+    """
+    Splits text into paragraphs, heading lines, tables and fenced code blocks.
+
+    Blank lines separate blocks, except inside code fences. A heading line is
+    always a block of its own.
+    """
+    blocks, current, in_code = [], [], False
+
+    def flush():
+        if current:
+            blocks.append("\n".join(current))
+            current.clear()
+
+    for line in text.split("\n"):
+        if line.strip().startswith(_FENCE):
+            if not in_code:
+                flush()
+            current.append(line)
+            in_code = not in_code
+            if not in_code:
+                flush()
+        elif in_code:
+            current.append(line)
+        elif not line.strip():
+            flush()
+        elif _HEADING_LINE.match(line):
+            flush()
+            blocks.append(line.strip())
+        else:
+            current.append(line)
+    flush()
+    return blocks
+
+
+def is_table(block: str) -> bool:
+    lines = block.split("\n")
+    return len(lines) > 1 and all("|" in line for line in lines)
+
+
+def iter_sections(blocks: list[str]):
+    """Groups blocks under their headings, yielding (heading path, blocks) pairs."""
+    path: list[tuple[int, str]] = []
+    current: list[str] = []
+    for block in blocks:
+        match = _HEADING_LINE.match(block)
+        if match:
+            if current:
+                yield " > ".join(title for _, title in path), current
+            level = len(match.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, match.group(2))]
+            current = [block]
+        else:
+            current.append(block)
+    if current:
+        yield " > ".join(title for _, title in path), current
+
+
+def source_label(doc: BaseNode) -> str:
+    """Names the source a document came from: its file, or the host of its URL."""
+    metadata = doc.metadata
+    if metadata.get("file_name"):
+        return metadata["file_name"]
+    if metadata.get("url"):
+        return urlparse(metadata["url"]).netloc or metadata["url"]
+    return "other"
+
+
+@dataclass
+class SourceStats:
+    documents: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    max_tokens: int = 0
+    split_blocks: int = 0
+
+
+class ChunkStats:
+    """Documents, chunks and tokens per source."""
+
+    def __init__(self):
+        self.sources: dict[str, SourceStats] = {}
+
+    def record(self, source: str, chunk_tokens: list[int], split_blocks: int = 0):
+        stats = self.sources.setdefault(source, SourceStats())
+        stats.documents += 1
+        stats.chunks += len(chunk_tokens)
+        stats.tokens += sum(chunk_tokens)
+        stats.max_tokens = max([stats.max_tokens, *chunk_tokens])
+        stats.split_blocks += split_blocks
+
+    def summary(self) -> str:
+        documents = sum(stats.documents for stats in self.sources.values())
+        chunks = sum(stats.chunks for stats in self.sources.values())
+        tokens = sum(stats.tokens for stats in self.sources.values())
+        lines = [
+            f"Chunked {documents} document(s) into {chunks} chunk(s), "
+            f"{tokens} token(s) (avg {tokens / (chunks or 1):.0f} per chunk)"
+        ]
+        if self.sources:
+            width = max(len("source"), *(len(source) for source in self.sources))
+            lines.append(f"  {'source':<{width}}  {'docs':>6}  {'chunks':>7}  {'tokens':>9}  {'avg':>5}  {'max':>5}  {'split':>5}")
+            for source, stats in sorted(self.sources.items(), key=lambda item: -item[1].tokens):
+                lines.append(
+                    f"  {source:<{width}}  {stats.documents:>6}  {stats.chunks:>7}  {stats.tokens:>9}  "
+                    f"{stats.tokens / (stats.chunks or 1):>5.0f}  {stats.max_tokens:>5}  {stats.split_blocks:>5}"
+                )
+        return "\n".join(lines)
+
+
+class StructuredNodeParser(NodeParser):
+    """Splits documents at headings and paragraph boundaries, keeping tables and code intact."""
+
+    chunk_size: int = Field(default=DEFAULT_CHUNK_SIZE, gt=0, description="The maximum tokens per chunk.")
+    chunk_overlap: int = Field(
+        default=DEFAULT_CHUNK_OVERLAP, ge=0, description="Tokens of trailing paragraphs repeated in the next chunk."
+    )
+
+    _tokenizer: Any = PrivateAttr()
+    _fallback: SentenceSplitter = PrivateAttr()
+    _stats: ChunkStats = PrivateAttr()
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, chunk_overlap: int = DEFAULT_CHUNK_OVERLAP, **kwargs):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size}).")
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+        self._tokenizer = get_tokenizer()
+        # Splits single paragraphs that are larger than a whole chunk.
+        self._fallback = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._stats = ChunkStats()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StructuredNodeParser"
+
+    @property
+    def stats(self) -> ChunkStats:
+        return self._stats
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def _split_table(self, table: str) -> list[str]:
+        """Splits an oversized table between rows, repeating the header row in every piece."""
+        header, *rows = table.split("\n")
+        budget = self.chunk_size - self.count_tokens(header)
+        pieces, current, size = [], [], 0
+        for row in rows:
+            tokens = self.count_tokens(row) + 1
+            if current and size + tokens > budget:
+                pieces.append("\n".join([header, *current]))
+                current, size = [], 0
+            current.append(row)
+            size += tokens
+        if current:
+            pieces.append("\n".join([header, *current]))
+        return pieces
+
+    def _split_block(self, block: str) -> list[str]:
+        if is_table(block):
+            return self._split_table(block)
+        return self._fallback.split_text(block)
+
+    def split_text(self, text: str) -> tuple[list[tuple[str, str]], int]:
+        """
+        Splits a document's text into chunks.
+
+        Returns:
+            The (section, chunk text) pairs, and how many single blocks were
+            too large for one chunk and had to be split.
+        """
+        chunks: list[tuple[str, str]] = []
+        current: list[str] = []
+        sizes: list[int] = []
+        section = ""
+        oversized = 0
+
+        def flush(overlap: bool):
+            nonlocal current, sizes
+            if not current:
+                return
+            chunks.append((section, "\n\n".join(current)))
+            carried, carried_sizes = [], []
+            if overlap:
+                # Repeat trailing paragraphs (never tables or code) in the next chunk.
+                for block, size in zip(reversed(current), reversed(sizes)):
+                    if sum(carried_sizes) + size > self.chunk_overlap or is_table(block) or block.startswith(_FENCE):
+                        break
+                    carried.insert(0, block)
+                    carried_sizes.insert(0, size)
+            current, sizes = carried, carried_sizes
+
+        for heading_path, blocks in iter_sections(split_blocks(text)):
+            block_sizes = [self.count_tokens(block) for block in blocks]
+            # Prefer heading boundaries: start afresh if the section does not fit.
+            if current and sum(sizes) + sum(block_sizes) > self.chunk_size:
+                flush(overlap=False)
+            if not current:
+                section = heading_path
+            for block, size in zip(blocks, block_sizes):
+                # Headings stay with the content that follows them.
+                headings_only = all(_HEADING_LINE.match(pending) for pending in current)
+                if size > self.chunk_size:
+                    pieces = self._split_block(block)
+                    if current and headings_only:
+                        pieces[0] = "\n\n".join([*current, pieces[0]])
+                        current, sizes = [], []
+                    flush(overlap=False)
+                    oversized += 1
+                    chunks.extend((heading_path, piece) for piece in pieces)
+                    section = heading_path
+                    continue
+                if current and not headings_only and sum(sizes) + size > self.chunk_size:
+                    flush(overlap=True)
+                    if current and sum(sizes) + size > self.chunk_size:
+                        current, sizes = [], []
+                    section = heading_path
+                current.append(block)
+                sizes.append(size)
+        flush(overlap=False)
+        return chunks, oversized
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs) -> list[BaseNode]:
+        all_nodes: list[BaseNode] = []
+        for node in nodes:
+            chunks, oversized = self.split_text(node.get_content())
+            parsed = build_nodes_from_splits([text for _, text in chunks], node, id_func=self.id_func)
+            for child, (section, _) in zip(parsed, chunks):
+                if section:
+                    child.metadata["section"] = section
+            self._stats.record(
+                source_label(node), [self.count_tokens(text) for _, text in chunks], split_blocks=oversized
+            )
+            all_nodes.extend(parsed)
+        return all_nodes
+
+
+def pdf_element_text(element: dict) -> str:
+    """Renders one partitioned PDF element; tables become pipe rows and titles `#` headings."""
+    if element["type"] in PDF_BOILERPLATE_TYPES:
+        return ""
+    if element["type"] == "Table" and element.get("html"):
+        return table_html_to_text(element["html"]) or element["text"]
+    if element["type"] == "Title" and element["text"]:
+        return f"# {' '.join(element['text'].split())}"
+    return element["text"]
+
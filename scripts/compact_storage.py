@@ -0,0 +1,332 @@
+"""
+Opt-in compact storage for knowledge base collections: short vectors in Chroma, full ones quantized beside it.
+
+text-embedding-004 returns 768 float32 values per chunk (3 KB), and Chroma
+keeps every vector of a collection in its HNSW index, on disk and in memory
+once the collection is loaded. The model is trained so that a prefix of its
+vector is itself a usable embedding (the API's `output_dimensionality`
+returns exactly that prefix, renormalized), so a compact collection stores
+only the first `dims` values of each vector in Chroma:
+
+-   The full vector is kept as int8 with one float scale (about 770 bytes)
+    in a SQLite file per collection, in a compact_vectors/ directory next
+    to the Chroma database. It is never loaded as a whole; rows are read
+    by ID. The file records the ID of its Chroma collection, and is
+    cleared if it meets another collection of the same name.
+-   A vector query searches Chroma with the query's prefix for
+    `RESCORE_FACTOR` times as many candidates as requested, then re-ranks
+    only those candidates by their cosine similarity to the full query
+    vector, computed from the int8 vectors.
+
+The mode is chosen when a collection is built (`--compact-dims 256`) and
+recorded in the collection's metadata, so incremental syncs keep it and
+every reader (`wrap`) picks it up without options. Changing it requires a
+rebuild with `--overwrite`. `benchmarks/bench_compact.py` measures recall
+against full-precision search and the size on disk for several prefixes.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Iterable
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from llama_index.core.schema import BaseNode
+
+# --- Global Configuration ---
+# Directory name of the stores, beside the Chroma database (see knowledge_store.side_store_dir).
+STORE_DIR_NAME = "compact_vectors"
+# Collection metadata recording the stored vector prefix length.
+COMPACT_DIMS_KEY = "kb_compact_dims"
+# Candidates fetched from Chroma per requested result, re-scored with the full vectors.
+RESCORE_FACTOR = 4
+# --- End Global Configuration ---
+
+# Fields of a Chroma query result that hold one entry per hit.
+_RESULT_FIELDS = ("ids", "documents", "metadatas", "distances", "embeddings", "uris", "data")
+
+
+def truncate(embedding: Iterable[float], dims: int) -> list[float]:
+    """Returns the first `dims` values of an embedding, scaled back to unit length."""
+    prefix = np.asarray(embedding, dtype=np.float32)[:dims]
+    norm = np.linalg.norm(prefix)
+    return (prefix / norm if norm else prefix).tolist()
+
+
+def quantize(embedding: Iterable[float]) -> tuple[float, bytes]:
+    """Quantizes a vector to int8 with one symmetric scale; returns (scale, int8 bytes)."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.abs(vector).max()) / 127 or 1.0
+    return scale, np.round(vector / scale).astype(np.int8).tobytes()
+
+
+def resolve_dims(chroma_collection, requested: int | None) -> int | None:
+    """
+    Returns the prefix length to write a collection with, or None for full vectors.
+
+    A collection keeps the mode it was created with: without a request the
+    recorded length is used, and a different request is refused unless the
+    collection is still empty.
+
+    Raises:
+        ValueError: If the request conflicts with how the collection is stored.
+    """
+    recorded = (chroma_collection.metadata or {}).get(COMPACT_DIMS_KEY)
+    recorded = int(recorded) if recorded else None
+    if requested is None or requested == recorded:
+        return recorded
+    if requested <= 0:
+        raise ValueError(f"--compact-dims must be positive, not {requested}.")
+    if recorded or chroma_collection.count():
+        stored = f"with {recorded}-dimension vectors" if recorded else "with full vectors"
+        raise ValueError(
+            f"Collection '{chroma_collection.name}' is stored {stored}; "
+            f"rebuild it with --overwrite to store {requested} dimensions."
+        )
+    return requested
+
+
+def default_store_dir() -> str:
+    """Returns the directory of the stores beside the shared Chroma client's database."""
+    import knowledge_store
+
+    return knowledge_store.side_store_dir(STORE_DIR_NAME)
+
+
+def delete_store(collection_name: str, store_dir: str | None = None):
+    """Deletes a collection's RescoreStore, if it has one, e.g. before the collection is rebuilt."""
+    path = os.path.join(store_dir or default_store_dir(), f"{collection_name}.sqlite3")
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class RescoreStore:
+    """The full vectors of a compact collection, as int8 in SQLite, for re-scoring candidates."""
+
+    def __init__(self, chroma_collection, store_dir: str | None = None):
+        """
+        Initializes the RescoreStore.
+
+        Args:
+            chroma_collection: The Chroma collection whose vectors are kept.
+            store_dir: The directory where the stores are kept. Defaults to
+                the one beside the shared Chroma client's database.
+        """
+        store_dir = store_dir or default_store_dir()
+        os.makedirs(store_dir, exist_ok=True)
+        self.collection_name = chroma_collection.name
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(store_dir, f"{self.collection_name}.sqlite3"), check_same_thread=False
+        )
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                node_id TEXT PRIMARY KEY,
+                ref_doc_id TEXT,
+                scale REAL NOT NULL,
+                vector BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS vectors_ref_doc ON vectors (ref_doc_id);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        self._db.commit()
+        self.ensure_current(chroma_collection)
+
+    def ensure_current(self, chroma_collection):
+        """
+        Clears the store if it was written for another collection of the same name.
+
+        The full vectors cannot be recovered from Chroma's prefixes, so
+        queries fall back to the prefix scores until the collection is
+        rebuilt. A store that predates the recorded ID is adopted.
+        """
+        collection_id = str(chroma_collection.id)
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'collection_id'").fetchone()
+            if row is not None and row[0] == collection_id:
+                return
+            if row is not None:
+                print(
+                    f"⚠️ The full vectors of '{self.collection_name}' belong to another collection and were "
+                    "dropped; rebuild it with --overwrite to re-score its results again."
+                )
+                self._db.execute("DELETE FROM vectors")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('collection_id', ?)", (collection_id,))
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def add(self, nodes: list[BaseNode]):
+        """Stores the full vectors of nodes, replacing any stored under the same node ID."""
+        rows = []
+        for node in nodes:
+            scale, vector = quantize(node.get_embedding())
+            rows.append((node.node_id, node.ref_doc_id, scale, vector))
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def delete_documents(self, ref_doc_ids: list[str]):
+        """Removes every vector belonging to the given source document IDs."""
+        with self._lock:
+            for i in range(0, len(ref_doc_ids), 500):
+                batch = ref_doc_ids[i:i + 500]
+                self._db.execute(
+                    f"DELETE FROM vectors WHERE ref_doc_id IN ({','.join('?' * len(batch))})", batch
+                )
+            self._db.commit()
+
+    def delete_nodes(self, node_ids: list[str]):
+        """Removes the vectors stored under the given node IDs."""
+        with self._lock:
+            for i in range(0, len(node_ids), 500):
+                batch = node_ids[i:i + 500]
+                self._db.execute(f"DELETE FROM vectors WHERE node_id IN ({','.join('?' * len(batch))})", batch)
+            self._db.commit()
+
+    def reset(self):
+        with self._lock:
+            self._db.execute("DELETE FROM vectors")
+            self._db.commit()
+
+    def similarities(self, node_ids: list[str], query_embedding: list[float]) -> dict[str, float]:
+        """Returns the cosine similarity of each stored node to the query; unknown IDs are left out."""
+        if not node_ids:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT node_id, scale, vector FROM vectors WHERE node_id IN ({','.join('?' * len(node_ids))})",
+                node_ids,
+            ).fetchall()
+        if not rows:
+            return {}
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        vectors = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.int8).reshape(len(rows), -1)
+        # The cosine does not depend on the scale, so the int8 values are used as they are.
+        vectors = vectors.astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        scores = vectors @ query / np.where(norms == 0, 1.0, norms)
+        return {row[0]: float(score) for row, score in zip(rows, scores)}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CompactSink:
+    """A vector store wrapper that keeps each node's full vector in a RescoreStore and writes its prefix."""
+
+    def __init__(self, vector_store, rescore_store: RescoreStore, dims: int):
+        self.vector_store = vector_store
+        self.rescore_store = rescore_store
+        self.dims = dims
+
+    def add(self, nodes: list[BaseNode], **kwargs) -> list[str]:
+        self.rescore_store.add(nodes)
+        for node in nodes:
+            embedding = node.get_embedding()
+            if self.dims >= len(embedding):
+                raise ValueError(f"--compact-dims {self.dims} is not shorter than the model's {len(embedding)}.")
+            node.embedding = truncate(embedding, self.dims)
+        return self.vector_store.add(nodes, **kwargs)
+
+
+class CompactCollection:
+    """
+    A compact Chroma collection whose vector queries are re-scored with the full vectors.
+
+    Everything but `query` is passed through to the collection, so it can be
+    used wherever a Chroma collection is. The RescoreStore is opened on the
+    first vector query.
+    """
+
+    def __init__(
+        self, chroma_collection, dims: int, rescore_store: RescoreStore | None = None, store_dir: str | None = None
+    ):
+        self._collection = chroma_collection
+        self.dims = dims
+        self._store_dir = store_dir
+        self._rescore_store = rescore_store
+        self._owns_store = rescore_store is None
+        self._store_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    @property
+    def rescore_store(self) -> RescoreStore:
+        with self._store_lock:
+            if self._rescore_store is None:
+                self._rescore_store = RescoreStore(self._collection, self._store_dir)
+            return self._rescore_store
+
+    def similarities(self, node_ids: list[str], query_embedding: list[float]) -> dict[str, float]:
+        """Returns the cosine similarity of each node's full vector to the query."""
+        return self.rescore_store.similarities(node_ids, query_embedding)
+
+    def query(self, query_embeddings=None, n_results: int = 10, include=None, **kwargs):
+        """
+        Runs a Chroma query on the vector prefixes and re-ranks the candidates with the full vectors.
+
+        Distances are returned as squared L2 distances between unit vectors
+        (2 - 2 * cosine), the scale of a full-precision Chroma collection.
+        """
+        if query_embeddings is None:
+            return self._collection.query(n_results=n_results, include=include, **kwargs)
+        if include is None:
+            include = ["metadatas", "documents", "distances"]
+        if len(query_embeddings) and np.ndim(query_embeddings[0]) == 0:
+            query_embeddings = [query_embeddings]
+        results = self._collection.query(
+            query_embeddings=[truncate(embedding, self.dims) for embedding in query_embeddings],
+            n_results=n_results * RESCORE_FACTOR,
+            include=list(include),
+            **kwargs,
+        )
+        reranked = {key: [] for key in _RESULT_FIELDS if results.get(key) is not None}
+        for i, embedding in enumerate(query_embeddings):
+            ids = results["ids"][i]
+            scores = self.similarities(ids, embedding)
+            # Chunks missing from the store keep their prefix distance.
+            distances = results.get("distances")
+            prefix_scores = [1 - d / 2 for d in distances[i]] if distances is not None else [-1.0] * len(ids)
+            order = sorted(
+                range(len(ids)), key=lambda j: scores.get(ids[j], prefix_scores[j]), reverse=True
+            )[:n_results]
+            for key in reranked:
+                if key == "distances":
+                    reranked[key].append([2 - 2 * scores.get(ids[j], prefix_scores[j]) for j in order])
+                else:
+                    reranked[key].append([results[key][i][j] for j in order])
+        return {**results, **reranked}
+
+    def close(self):
+        """Closes the RescoreStore if this wrapper opened it."""
+        with self._store_lock:
+            if self._owns_store and self._rescore_store is not None:
+                self._rescore_store.close()
+                self._rescore_store = None
+
+
+def wrap(chroma_collection, rescore_store: RescoreStore | None = None, store_dir: str | None = None):
+    """
+    Returns a CompactCollection for a compact collection, and any other collection unchanged.
+
+    Args:
+        chroma_collection: The Chroma collection.
+        rescore_store: The collection's RescoreStore, if already open.
+        store_dir: Where to open the RescoreStore otherwise, if not beside
+            the shared Chroma client's database.
+    """
+    dims = (chroma_collection.metadata or {}).get(COMPACT_DIMS_KEY)
+    if not dims:
+        return chroma_collection
+    return CompactCollection(chroma_collection, int(dims), rescore_store, store_dir)
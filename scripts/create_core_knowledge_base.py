@@ -1,16 +1,25 @@
+from __future__ import annotations
+
 import argparse
-import chromadb
+import itertools
 import os
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-import google.auth
 
-from llama_index.core import Document, VectorStoreIndex, StorageContext
-from llama_index.readers.confluence import ConfluenceReader
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.vertex import VertexTextEmbedding
+import fetcher
+import knowledge_store
+import telemetry
+from confluence_loader import DEFAULT_CONFLUENCE_WORKERS, ConfluenceLoader
+from index_sync import SourceListing, stored_document_ids
+from index_writer import write_index
+from ingest_common import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_DISTANCE
+from pipeline import Checkpoint, LastRun, merged
+from http_cache import ResponseCache, DEFAULT_CACHE_DIR
+from scraping import fetch_sitemap_urls, iter_scrape
 
-# Import the refactored web scraping functions from our other script
-from create_knowledge_base import fetch_sitemap_urls, crawl_and_scrape
+if TYPE_CHECKING:
+    from chunking import StructuredNodeParser
 
 # Define the path to the .env file
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
@@ -23,78 +32,145 @@ else:
     print(f"Warning: .env file not found at {dotenv_path}")
 
 
-def load_confluence_documents(base_url, space_key):
-    """Loads all documents from a specified Confluence space."""
-    print(f"\n--- Loading Documents from Confluence space: {space_key} ---")
-    
-    # Explicitly load credentials from environment variables
+def confluence_credentials() -> tuple[str, str]:
+    """Returns the Confluence username and API key from the environment, raising ValueError if either is unset."""
     username = os.getenv("CONFLUENCE_USERNAME")
     api_key = os.getenv("CONFLUENCE_API_KEY")
-
     if not username or not api_key:
-        print("❌ Error: CONFLUENCE_USERNAME and CONFLUENCE_API_KEY must be set in your .env file.")
-        return []
+        # Loading nothing would let a sync delete every Confluence page.
+        raise ValueError("CONFLUENCE_USERNAME and CONFLUENCE_API_KEY must be set in your .env file.")
+    return username, api_key
+
+
+def load_confluence_documents(
+    base_url,
+    space_keys,
+    workers=DEFAULT_CONFLUENCE_WORKERS,
+    modified_since=None,
+    unchanged_ids=None,
+    loaded_spaces=None,
+    stored_ids=(),
+):
+    """
+    Yields the documents of the given Confluence spaces, loading the spaces concurrently.
+
+    `modified_since` maps a space key to the start of its last successful
+    sync. For those spaces only modified pages are fetched, and the IDs of
+    the unchanged ones are added to `unchanged_ids` so a sync keeps them;
+    unchanged pages missing from `stored_ids` are fetched anyway. The key of every space that was loaded completely is added to
+    `loaded_spaces`. Missing credentials and failed requests raise, so an
+    incomplete load never reaches a sync.
+    """
+    print(f"\n--- Loading Documents from Confluence space(s): {', '.join(space_keys)} ---")
+    
+    username, api_key = confluence_credentials()
+
+    modified_since = modified_since or {}
+    loader = ConfluenceLoader(base_url, username, api_key, workers=workers)
+
+    def load_space(space_key):
+        yield from loader.iter_documents(space_key, modified_since.get(space_key), unchanged_ids, stored_ids)
+        if loaded_spaces is not None:
+            loaded_spaces.add(space_key)
 
     try:
-        reader = ConfluenceReader(
-            base_url=base_url,
-            user_name=username,
-            api_token=api_key
-        )
-        documents = reader.load_data(space_key=space_key, include_attachments=False)
-        print(f"✅ Found {len(documents)} documents in Confluence.")
-        return documents
+        yield from merged(*(load_space(key) for key in space_keys))
     except Exception as e:
+        # A partial listing must not reach a sync, which would delete the missing pages.
         print(f"❌ Failed to load from Confluence: {e}")
-        return []
+        raise
+    finally:
+        loader.close()
+
+def load_api_reference_documents(
+    url,
+    workers=1,
+    skip_urls=(),
+    modified_since=None,
+    unchanged_ids=None,
+    listing: SourceListing | None = None,
+    stored_ids=(),
+):
+    """
+    Yields documents from the API reference website as they are scraped.
 
-def load_api_reference_documents(url):
-    """Loads documents from the API reference website."""
+    Stored pages (`stored_ids`) whose sitemap `<lastmod>` is not after
+    `modified_since` are not scraped; their IDs are added to `unchanged_ids`
+    so a sync keeps them.
+    Pages that could not be fetched are recorded in `listing`, which is
+    marked incomplete if the crawl fallback missed their links.
+    """
     print(f"\n--- Loading Documents from API Reference: {url} ---")
+    if unchanged_ids is None:
+        unchanged_ids = set()
+    if listing is None:
+        listing = SourceListing()
     try:
-        sitemap_urls = fetch_sitemap_urls(url)
+        sitemap_urls = fetch_sitemap_urls(url, modified_since, unchanged_ids, stored_ids)
         scrape_urls = sitemap_urls or [url]
-        documents = crawl_and_scrape(scrape_urls, recursive=not sitemap_urls)
-        return documents
+        yield from iter_scrape(
+            scrape_urls,
+            recursive=not sitemap_urls,
+            workers=workers,
+            skip_urls=itertools.chain(skip_urls, unchanged_ids),
+            failed_urls=listing.failed_ids,
+        )
+        if not sitemap_urls and listing.failed_ids:
+            listing.mark_incomplete(
+                f"{len(listing.failed_ids)} API reference page(s) could not be fetched, so their links were not followed"
+            )
     except Exception as e:
+        # As for Confluence, a partial listing must not reach a sync.
         print(f"❌ Failed to load from API Reference: {e}")
-        return []
+        raise
+
+def build_core_index(
+    documents,
+    sync: bool = False,
+    checkpoint: Checkpoint | None = None,
+    done_ids=(),
+    node_parser: StructuredNodeParser | None = None,
+    dedup_distance: int | None = DEFAULT_MAX_DISTANCE,
+    unchanged_ids=(),
+    source: str | None = None,
+    compact_dims: int | None = None,
+    listing: SourceListing | None = None,
+):
+    """
+    Builds and saves the 'core_knowledge' index in ChromaDB.
+
+    The documents are streamed into the collection by
+    `index_writer.write_index`; see there for the arguments. Without `sync`
+    or a resumed run, the collection is rebuilt from scratch.
 
-def build_core_index(documents: list[Document]):
-    """Builds and saves the 'core_knowledge' index in ChromaDB."""
-    if not documents:
+    Returns:
+        True if the index was written, False if there was nothing to index.
+    """
+    documents = iter(documents)
+    first_document = next(documents, None)
+    if first_document is None and not (sync and unchanged_ids):
         print("No documents were loaded, skipping index creation.")
-        return
+        return False
+    documents = itertools.chain([first_document] if first_document is not None else [], documents)
 
     print("\n--- Building Core Knowledge Base Index ---")
-    db = chromadb.PersistentClient(path="./chroma_db")
-    collection_name = "core_knowledge"
-    
-    # Check if the collection exists before trying to delete it
-    existing_collections = [c.name for c in db.list_collections()]
-    if collection_name in existing_collections:
-        print(f"Deleting old '{collection_name}' collection...")
-        db.delete_collection(name=collection_name)
-        print("✅ Old collection deleted.")
-
-    chroma_collection = db.get_or_create_collection(collection_name)
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-    print("Initializing embedding model...")
-    credentials, _ = google.auth.default()
-    embed_model = VertexTextEmbedding(
-        model_name="text-embedding-004", credentials=credentials
-    )
-    print("✅ Embedding model initialized.")
-
-    print("Creating the index...")
-    VectorStoreIndex.from_documents(
+    collection_name = knowledge_store.CORE_COLLECTION
+    summary = write_index(
+        collection_name,
         documents,
-        storage_context=storage_context,
-        embed_model=embed_model,
+        overwrite=True,
+        sync=sync,
+        checkpoint=checkpoint,
+        done_ids=done_ids,
+        node_parser=node_parser,
+        dedup_distance=dedup_distance,
+        unchanged_ids=unchanged_ids,
+        source=source,
+        compact_dims=compact_dims,
+        listing=listing,
     )
-    print(f"🎉 Success! Core knowledge base '{collection_name}' has been created.")
+    print(f"🎉 Success! Core knowledge base '{collection_name}' {summary}.")
+    return True
 
 
 def main():
@@ -105,17 +181,100 @@ def main():
         description="Create the core knowledge base from Confluence and API references."
     )
     parser.add_argument("--confluence-url", required=True, help="Base URL of your Confluence instance.")
-    parser.add_argument("--confluence-space", required=True, help="The Confluence space key to ingest.")
+    parser.add_argument("--confluence-space", required=True, nargs="+", help="The Confluence space key(s) to ingest.")
+    parser.add_argument("--confluence-workers", type=int, default=DEFAULT_CONFLUENCE_WORKERS, help=f"Confluence result pages fetched concurrently per space (default: {DEFAULT_CONFLUENCE_WORKERS}).")
     parser.add_argument("--api-ref-url", default="https://api-reference.checkout.com/", help="URL for the API reference documentation.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of API reference pages to fetch concurrently.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for the HTTP response cache.")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the HTTP response cache.")
+    parser.add_argument("--sync", action="store_true", help="Update the index incrementally instead of rebuilding it.")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run, skipping documents it already stored.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help=f"Maximum tokens per chunk (default: {DEFAULT_CHUNK_SIZE}).")
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP, help=f"Tokens repeated between consecutive chunks (default: {DEFAULT_CHUNK_OVERLAP}).")
+    parser.add_argument("--dedup-distance", type=int, default=DEFAULT_MAX_DISTANCE, help=f"Max SimHash bit distance for near-duplicate pages and chunks (default: {DEFAULT_MAX_DISTANCE}).")
+    parser.add_argument("--no-dedup", action="store_true", help="Embed duplicate pages and chunks too.")
+    parser.add_argument("--compact-dims", type=int, default=None, help="Store only this many leading vector dimensions in Chroma (e.g. 256), with full int8 vectors for re-scoring.")
+    parser.add_argument("--report-dir", default=telemetry.DEFAULT_REPORT_DIR, help=f"Directory for the JSON run reports (default: {telemetry.DEFAULT_REPORT_DIR}).")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace of every request, embedding and write to this file.")
+    parser.add_argument("--profile", default=None, help="Write a cProfile of all threads to this file.")
     args = parser.parse_args()
 
-    # Load documents from all sources
-    all_documents = []
-    all_documents.extend(load_confluence_documents(args.confluence_url, args.confluence_space))
-    all_documents.extend(load_api_reference_documents(args.api_ref_url))
+    # Fail before anything is deleted or fetched, rather than midway through the run.
+    try:
+        confluence_credentials()
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return
+
+    if not args.no_cache:
+        fetcher.configure(cache=ResponseCache(args.cache_dir))
+
+    with telemetry.instrumented_run(
+        "core_knowledge", args.report_dir, trace_path=args.trace, profile_path=args.profile, options=vars(args)
+    ):
+        checkpoint = Checkpoint("core_knowledge")
+        if args.resume and checkpoint.exists():
+            done_ids = checkpoint.load()
+            print(f"Resuming: {len(done_ids)} document(s) were stored by the previous run.")
+        else:
+            done_ids = checkpoint.reset()
+
+        last_run = LastRun("core_knowledge")
+        # Each Confluence space remembers its own last sync.
+        space_runs = {key: LastRun(f"core_knowledge.confluence.{key}") for key in args.confluence_space}
+        started = datetime.now(timezone.utc)
+        unchanged_ids = set()
+        loaded_spaces = set()
+        listing = SourceListing()
+        stored_ids = set()
+        if args.sync:
+            stored_ids = stored_document_ids(knowledge_store.get_client(), knowledge_store.CORE_COLLECTION)
+
+        # Load Confluence and the API reference side by side, streaming straight into the index
+        documents = merged(
+            load_confluence_documents(
+                args.confluence_url,
+                args.confluence_space,
+                workers=args.confluence_workers,
+                modified_since={key: run.load() for key, run in space_runs.items()} if args.sync else None,
+                unchanged_ids=unchanged_ids,
+                loaded_spaces=loaded_spaces,
+                stored_ids=stored_ids,
+            ),
+            load_api_reference_documents(
+                args.api_ref_url,
+                workers=args.workers,
+                skip_urls=done_ids,
+                modified_since=last_run.load() if args.sync else None,
+                unchanged_ids=unchanged_ids,
+                listing=listing,
+                stored_ids=stored_ids,
+            ),
+        )
+        from chunking import StructuredNodeParser
+
+        node_parser = StructuredNodeParser(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        written = build_core_index(
+            documents,
+            sync=args.sync,
+            checkpoint=checkpoint,
+            done_ids=done_ids,
+            node_parser=node_parser,
+            dedup_distance=None if args.no_dedup else args.dedup_distance,
+            unchanged_ids=unchanged_ids,
+            source=f"{args.confluence_url} (spaces {', '.join(args.confluence_space)}), {args.api_ref_url}",
+            compact_dims=args.compact_dims,
+            listing=listing,
+        )
+        if written:
+            if listing.partial:
+                # Pages that failed must not look unchanged to the next sync.
+                print("Not recording the API reference run for --sync, since some pages were not loaded.")
+            else:
+                last_run.record(started)
+            for key in loaded_spaces:
+                space_runs[key].record(started)
 
-    # Build and save the final index
-    build_core_index(all_documents)
 
 if __name__ == "__main__":
     main()
@@ -1,232 +1,147 @@
-import argparse
-import chromadb
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import xml.etree.ElementTree as ET
-import google.auth
-from google.cloud import translate_v2 as translate
-from llama_index.core import Document, VectorStoreIndex, StorageContext
-from llama_index.readers.file import UnstructuredReader
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.vertex import VertexTextEmbedding
-
-# --- Global Configuration ---
-# A set of patterns to ignore during web crawling to avoid irrelevant links.
-IGNORE_PATTERNS = [
-    "/login", "/signup", "/edit", "cdn-cgi", "?", "#", ".pdf", ".zip", ".jpg", ".png"
-]
-
-# We initialize the translator client only when it's first needed.
-translate_client = None
-# --- End Global Configuration ---
-
-
-def fetch_sitemap_urls(base_url: str) -> list[str]:
-    """
-    Fetches and parses a sitemap.xml to extract all URLs.
-
-    This is the preferred method for URL discovery as it's efficient and
-    respects the website's own declared structure.
-
-    Args:
-        base_url: The base URL of the website (e.g., https://example.com).
-
-    Returns:
-        A list of URLs found in the sitemap, or an empty list if not found.
-    """
-    sitemap_url = urljoin(base_url, "sitemap.xml")
-    urls = []
-    try:
-        response = requests.get(sitemap_url)
-        response.raise_for_status()
-
-        root = ET.fromstring(response.content)
-        namespace = {"ns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-        for loc in root.findall("ns:url/ns:loc", namespace):
-            urls.append(loc.text)
-
-        if urls:
-            print(f"✅ Found {len(urls)} URLs in sitemap.xml")
-            return urls
-    except (requests.RequestException, ET.ParseError) as e:
-        print(f"Could not fetch or parse sitemap.xml: {e}")
-
-    return []
-
-
-def translate_text(text: str, target_language: str) -> str:
-    """
-    Translates a given text to the target language using Google Cloud Translate.
-
-    Initializes the client on the first call to avoid unnecessary setup.
-    If translation fails, it returns the original text.
-
-    Args:
-        text: The text to translate.
-        target_language: The ISO 639-1 code for the target language (e.g., "en").
-
-    Returns:
-        The translated text, or the original text if translation fails.
-    """
-    global translate_client
-
-    if translate_client is None:
-        try:
-            print("Initializing Google Translate client...")
-            translate_client = translate.Client()
-            print("✅ Translate client initialized.")
-        except Exception as e:
-            print(f"Could not initialize Google Translate client: {e}")
-            print("Translation will be skipped.")
-            return text  # Return original text if client fails to init
-
-    try:
-        result = translate_client.translate(text, target_language=target_language)
-        return result["translatedText"]
-    except Exception as e:
-        print(f"Could not translate text: {e}")
-        return text  # Return original text on failure
-
-
-def process_url(url: str, translate_to: str = None) -> Document | None:
-    """
-    Scrapes a single URL, extracts its text content, and optionally translates it.
-
-    Args:
-        url: The URL to scrape.
-        translate_to: The target language for translation. If None, no translation.
-
-    Returns:
-        A LlamaIndex Document object, or None if scraping fails.
-    """
-    print(f"Scraping: {url}")
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
+from __future__ import annotations
 
-        page_text = soup.get_text()
-        if translate_to:
-            print(f"Translating content to '{translate_to}'...")
-            page_text = translate_text(page_text, translate_to)
-            print("✅ Translation complete.")
-
-        return Document(text=page_text, extra_info={"url": url})
-    except requests.RequestException as e:
-        print(f"Could not fetch {url}: {e}")
-        return None
-
-
-def crawl_and_scrape(
-    urls: list[str], recursive: bool = False, translate_to: str = None
-) -> list[Document]:
+import argparse
+import itertools
+import re
+from typing import TYPE_CHECKING, Container, Iterable, Iterator
+from datetime import datetime, timezone
+
+import fetcher
+import knowledge_store
+import telemetry
+import translation
+from http_cache import ResponseCache, DEFAULT_CACHE_DIR
+from index_sync import SourceListing, stored_document_ids
+from index_writer import write_index
+from pipeline import Checkpoint, LastRun
+from pdf_ingest import DEFAULT_OCR_CACHE_DIR, DEFAULT_PAGES_PER_TASK, DEFAULT_STRATEGY, load_pdf_documents
+from embedding_stage import DEFAULT_MAX_IN_FLIGHT
+from ingest_common import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_DISTANCE
+from frontier import URLFilter
+from scraping import IGNORE_PATTERNS, fetch_sitemap_urls, iter_scrape
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+    from chunking import StructuredNodeParser
+
+
+def iter_documents_from_sources(
+    args,
+    skip_ids: Iterable[str] = (),
+    modified_since: datetime | None = None,
+    unchanged_ids: set[str] | None = None,
+    listing: SourceListing | None = None,
+    stored_ids: Container[str] = (),
+) -> Iterator[Document]:
     """
-    Scrapes a list of URLs, optionally crawling recursively and translating content.
+    Yields documents from web URLs or local PDFs based on provided arguments.
 
     Args:
-        urls: A list of starting URLs.
-        recursive: If True, recursively follows links on the same domain.
-        translate_to: The target language for translation.
-
-    Returns:
-        A list of LlamaIndex Document objects.
-    """
-    visited = set()
-    documents = []
-    queue = list(urls)
-    base_domain = urlparse(urls[0]).netloc
-
-    print("Starting scrape...")
-    while queue:
-        current_url = queue.pop(0)
-
-        if current_url in visited or any(pattern in current_url for pattern in IGNORE_PATTERNS):
-            continue
-
-        if urlparse(current_url).netloc != base_domain:
-            continue
-
-        visited.add(current_url)
-        doc = process_url(current_url, translate_to)
-        if doc:
-            documents.append(doc)
-
-        if recursive:
-            try:
-                response = requests.get(current_url)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, "html.parser")
-                for link in soup.find_all("a", href=True):
-                    absolute_link = urljoin(current_url, link["href"])
-                    if absolute_link not in visited:
-                        queue.append(absolute_link)
-            except requests.RequestException as e:
-                print(f"Could not fetch links from {current_url}: {e}")
-
-    print(f"✅ Scrape complete. Found {len(documents)} pages.")
-    return documents
-
-
-def load_documents_from_sources(args) -> list[Document]:
+        args: The parsed command-line arguments.
+        skip_ids: Stable IDs of documents that are already stored; web pages
+            with these URLs are not scraped again.
+        modified_since: The start of the last successful run. Pages whose
+            sitemap `<lastmod>` is older are not scraped again.
+        unchanged_ids: Collects the IDs of the pages skipped because of
+            `modified_since`, so a sync keeps them.
+        listing: Collects the pages that could not be fetched, and whether
+            the pages found are all the site has, so a sync keeps the rest.
+        stored_ids: IDs of the documents already in the collection. Only
+            these can be skipped because of `modified_since`.
     """
-    Loads documents from web URLs or local PDFs based on provided arguments.
-    """
-    documents = []
     # 1. Load from URLs if provided
     if args.urls:
-        sitemap_urls = fetch_sitemap_urls(args.urls[0])
+        if unchanged_ids is None:
+            unchanged_ids = set()
+        if listing is None:
+            listing = SourceListing()
+        sitemap_urls = fetch_sitemap_urls(args.urls[0], modified_since, unchanged_ids, stored_ids)
         scrape_urls = sitemap_urls or args.urls
-        documents.extend(
-            crawl_and_scrape(scrape_urls, args.recursive, args.translate_to)
+        left_urls = set()
+        if not sitemap_urls and not args.recursive:
+            listing.mark_incomplete("No sitemap was found, so only the given URLs are scraped")
+        yield from iter_scrape(
+            scrape_urls,
+            args.recursive,
+            args.translate_to,
+            workers=args.workers,
+            skip_urls=itertools.chain(skip_ids, unchanged_ids),
+            url_filter=URLFilter(args.include, [re.escape(pattern) for pattern in IGNORE_PATTERNS] + args.exclude),
+            max_depth=args.max_depth,
+            max_pages=args.max_pages,
+            failed_urls=listing.failed_ids,
+            left_urls=left_urls,
         )
-
-    # 2. Load from PDFs if provided
+        if left_urls:
+            listing.mark_incomplete(f"--max-pages stopped the crawl with {len(left_urls)} URL(s) still queued")
+        if args.recursive and listing.failed_ids:
+            listing.mark_incomplete(
+                f"{len(listing.failed_ids)} page(s) could not be fetched, so their links were not followed"
+            )
+
+    # 2. Load from PDFs (or directories of PDFs) if provided
     if args.pdfs:
-        print(f"Reading {len(args.pdfs)} PDF file(s) using UnstructuredReader...")
-        pdf_reader = UnstructuredReader()
-        pdf_documents = pdf_reader.load_data(
-            file=args.pdfs[0], unstructured_kwargs={"strategy": "hi_res"}
+        yield from load_pdf_documents(
+            args.pdfs,
+            workers=args.pdf_workers,
+            pages_per_task=args.pages_per_task,
+            strategy=args.pdf_strategy,
+            cache_dir=None if args.no_ocr_cache else args.ocr_cache_dir,
         )
-        documents.extend(pdf_documents)
         print("✅ PDFs read successfully.")
-    
-    return documents
 
 
-def build_and_save_index(name: str, documents: list[Document], overwrite: bool = False):
+def load_documents_from_sources(args) -> list[Document]:
     """
-    Builds a vector index from the documents and saves it to ChromaDB.
+    Loads documents from web URLs or local PDFs based on provided arguments.
     """
-    print("\nSetting up ChromaDB vector store...")
-    db = chromadb.PersistentClient(path="./chroma_db")
-
-    collection_name = f"{name.lower()}_docs"
-    if overwrite:
-        print(f"Overwrite flag is set. Deleting collection '{collection_name}' if it exists...")
-        db.delete_collection(name=collection_name)
-        print(f"✅ Collection '{collection_name}' deleted.")
-
-    chroma_collection = db.get_or_create_collection(collection_name)
-    print(f"✅ Using collection: '{collection_name}'")
-
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    return list(iter_documents_from_sources(args))
+
+
+def build_and_save_index(
+    name: str,
+    documents: Iterable[Document],
+    overwrite: bool = False,
+    sync: bool = False,
+    embed_concurrency: int = DEFAULT_MAX_IN_FLIGHT,
+    checkpoint: Checkpoint | None = None,
+    done_ids: Iterable[str] = (),
+    node_parser: StructuredNodeParser | None = None,
+    dedup_distance: int | None = DEFAULT_MAX_DISTANCE,
+    unchanged_ids: Iterable[str] = (),
+    embed_model=None,
+    source: str | None = None,
+    compact_dims: int | None = None,
+    listing: SourceListing | None = None,
+):
+    """
+    Builds a vector index from the documents and saves it to ChromaDB.
 
-    print("Initializing the embedding model...")
-    credentials, _ = google.auth.default()
-    embed_model = VertexTextEmbedding(
-        model_name="text-embedding-004", credentials=credentials
-    )
-    print("✅ Embedding model initialized.")
+    The documents are streamed into the knowledge base's collection by
+    `index_writer.write_index`; see there for the arguments. With `sync`,
+    the existing collection is updated incrementally instead of rebuilt.
 
-    print("Creating the index. This may take a few minutes...")
-    VectorStoreIndex.from_documents(
+    Args:
+        name: The unique name for the knowledge base.
+    """
+    summary = write_index(
+        f"{name.lower()}_docs",
         documents,
-        storage_context=storage_context,
+        overwrite=overwrite,
+        sync=sync,
+        embed_concurrency=embed_concurrency,
+        checkpoint=checkpoint,
+        done_ids=done_ids,
+        node_parser=node_parser,
+        dedup_distance=dedup_distance,
+        unchanged_ids=unchanged_ids,
         embed_model=embed_model,
+        source=source,
+        compact_dims=compact_dims,
+        listing=listing,
     )
-    print(f"🎉 Success! Knowledge base for '{name}' has been created.")
+    print(f"🎉 Success! Knowledge base for '{name}' {summary}.")
 
 
 def main():
@@ -242,33 +157,242 @@ def main():
         "--urls", nargs="*", default=[], help="List of website URLs to scrape."
     )
     parser.add_argument(
-        "--pdfs", nargs="*", default=[], help="List of local PDF file paths to read."
+        "--pdfs",
+        nargs="*",
+        default=[],
+        help="List of local PDF files, or directories of PDFs, to read.",
     )
     parser.add_argument(
         "--recursive", action="store_true", help="Recursively scrape all links from the provided URLs."
     )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        help="Only crawl URLs matching this regex. Can be given several times.",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Never crawl URLs matching this regex, in addition to the built-in ignore list. Can be given several times.",
+    )
+    parser.add_argument(
+        "--max-depth", type=int, help="With --recursive, follow links at most this many hops from the start URLs."
+    )
+    parser.add_argument("--max-pages", type=int, help="Stop crawling after this many pages.")
     parser.add_argument(
         "--overwrite",
         action="store_true",
         help="If set, delete any existing knowledge base with the same name.",
     )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Update the knowledge base incrementally: embed only new or changed\n"
+        "documents and remove documents whose source disappeared.",
+    )
+    parser.add_argument(
+        "--embed-concurrency",
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f"Number of embedding requests to run at once (default: {DEFAULT_MAX_IN_FLIGHT}).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Maximum tokens per chunk (default: {DEFAULT_CHUNK_SIZE}).",
+    )
+    parser.add_argument(
+        "--chunk-overlap",
+        type=int,
+        default=DEFAULT_CHUNK_OVERLAP,
+        help=f"Tokens of trailing paragraphs repeated in the next chunk (default: {DEFAULT_CHUNK_OVERLAP}).",
+    )
+    parser.add_argument(
+        "--dedup-distance",
+        type=int,
+        default=DEFAULT_MAX_DISTANCE,
+        help="Pages and chunks whose SimHash fingerprints differ in at most this many\n"
+        f"of 64 bits are treated as duplicates (default: {DEFAULT_MAX_DISTANCE}; 0 for near-exact only).",
+    )
+    parser.add_argument(
+        "--no-dedup", action="store_true", help="Embed duplicate pages and chunks too."
+    )
+    parser.add_argument(
+        "--pdf-workers",
+        type=int,
+        default=None,
+        help="Number of processes used to parse PDFs (default: one per CPU core).",
+    )
+    parser.add_argument(
+        "--pages-per-task",
+        type=int,
+        default=DEFAULT_PAGES_PER_TASK,
+        help=f"PDF pages handled by each worker task (default: {DEFAULT_PAGES_PER_TASK}).",
+    )
+    parser.add_argument(
+        "--pdf-strategy",
+        choices=["auto", "fast", "hi_res", "ocr_only"],
+        default=DEFAULT_STRATEGY,
+        help="'auto' reads pages with a text layer directly and uses hi_res for the rest, and for\n"
+        "text pages that look like tables, whose structure 'fast' drops (default: auto).",
+    )
+    parser.add_argument(
+        "--ocr-cache-dir",
+        default=DEFAULT_OCR_CACHE_DIR,
+        help=f"Directory for cached PDF page results (default: {DEFAULT_OCR_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--no-ocr-cache", action="store_true", help="Disable the PDF page result cache."
+    )
+    parser.add_argument(
+        "--compact-dims",
+        type=int,
+        default=None,
+        help="Store only this many leading vector dimensions in Chroma (e.g. 256), and the full\n"
+        "vectors as int8 for re-scoring the top candidates. Set when the collection is created.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run, skipping documents it already stored.",
+    )
     parser.add_argument(
         "--translate-to",
         type=str,
         default=None,
         help="Optional ISO 639-1 language code to translate content to (e.g., 'en').",
     )
+    parser.add_argument(
+        "--translation-cache-dir",
+        default=translation.DEFAULT_CACHE_DIR,
+        help=f"Directory for cached translations (default: {translation.DEFAULT_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of pages to fetch concurrently while scraping (default: 1).",
+    )
+    parser.add_argument(
+        "--max-per-host",
+        type=int,
+        default=4,
+        help="Maximum concurrent requests to a single host (default: 4).",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="Optional maximum requests per second to a single host.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory for the HTTP response cache (default: {DEFAULT_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=1024,
+        help="Size cap for the HTTP response cache in MB (default: 1024).",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Disable the HTTP response cache."
+    )
+    parser.add_argument(
+        "--report-dir",
+        default=telemetry.DEFAULT_REPORT_DIR,
+        help=f"Directory for the JSON run reports (default: {telemetry.DEFAULT_REPORT_DIR}).",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="Write a Chrome trace of every fetch, parse, translation, PDF range,\n"
+        "embedding request and vector store write to this file (open it in Perfetto).",
+    )
+    parser.add_argument(
+        "--profile", default=None, help="Write a cProfile of all threads to this file (for pstats or snakeviz)."
+    )
     args = parser.parse_args()
 
-    print(f"--- Starting Ingestion for: {args.name} ---")
-
-    documents = load_documents_from_sources(args)
-
-    if not documents:
-        print("\nError: No documents were loaded. Please check your sources.")
-        return
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+    pool = fetcher.configure(
+        max_per_host=args.max_per_host, requests_per_second=args.rate_limit, cache=cache
+    )
 
-    build_and_save_index(args.name, documents, args.overwrite)
+    # The translation cache is only opened (and created) when pages are translated.
+    translator = translation.configure(cache_dir=args.translation_cache_dir) if args.translate_to else None
+
+    collection_name = f"{args.name.lower()}_docs"
+    with telemetry.instrumented_run(
+        collection_name, args.report_dir, trace_path=args.trace, profile_path=args.profile, options=vars(args)
+    ):
+        print(f"--- Starting Ingestion for: {args.name} ---")
+
+        checkpoint = Checkpoint(collection_name)
+        if args.resume and checkpoint.exists():
+            done_ids = checkpoint.load()
+            print(f"Resuming: {len(done_ids)} document(s) were stored by the previous run.")
+        else:
+            done_ids = checkpoint.reset()
+
+        last_run = LastRun(collection_name)
+        started = datetime.now(timezone.utc)
+        modified_since = last_run.load() if args.sync else None
+        stored_ids = stored_document_ids(knowledge_store.get_client(), collection_name) if modified_since else set()
+        unchanged_ids = set()
+        listing = SourceListing()
+
+        documents = iter_documents_from_sources(
+            args,
+            skip_ids=done_ids,
+            modified_since=modified_since,
+            unchanged_ids=unchanged_ids,
+            listing=listing,
+            stored_ids=stored_ids,
+        )
+        first_document = next(documents, None)
+        if first_document is None and unchanged_ids:
+            print("\nNo page changed since the last run; checking for removed pages.")
+        elif first_document is None:
+            if done_ids:
+                print("\nNothing left to ingest; the previous run had already stored every document.")
+                checkpoint.clear()
+            else:
+                print("\nError: No documents were loaded. Please check your sources.")
+            return
+
+        from chunking import StructuredNodeParser
+
+        build_and_save_index(
+            args.name,
+            itertools.chain([first_document] if first_document is not None else [], documents),
+            args.overwrite,
+            sync=args.sync,
+            embed_concurrency=args.embed_concurrency,
+            checkpoint=checkpoint,
+            done_ids=done_ids,
+            node_parser=StructuredNodeParser(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap),
+            dedup_distance=None if args.no_dedup else args.dedup_distance,
+            unchanged_ids=unchanged_ids,
+            source=", ".join(args.urls + args.pdfs),
+            compact_dims=args.compact_dims,
+            listing=listing,
+        )
+        if listing.partial:
+            # Pages that failed or were cut off must not look unchanged to the next sync.
+            print("Not recording this run for --sync, since some pages were not loaded.")
+        else:
+            last_run.record(started)
+        if pool.cache is not None:
+            print(pool.cache.summary())
+        if translator is not None:
+            print(translator.summary())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+"""
+Near-duplicate detection ahead of the embedder.
+
+Documentation sites serve the same page under many URLs (trailing slashes,
+`index.html`, tracking parameters, mixed-case hosts), and the same content
+under many paths (versioned docs, locale variants that were never
+translated). `ingest_common.canonicalize_url` collapses the URL variants
+before the crawler decides whether a page was visited. `DuplicateFilter`
+catches the rest by content: exact duplicates by a hash of the normalized
+text, and near duplicates by a 64-bit SimHash of word 3-grams.
+
+Near duplicates are found with the pigeonhole trick: two fingerprints within
+`max_distance` differing bits must agree exactly on at least one of
+`max_distance + 1` bit bands, so each fingerprint is filed under its band
+values and only fingerprints sharing a band are compared. The index stores a
+few integers per document, so tens of thousands of pages fit comfortably in
+memory.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import numpy as np
+
+from ingest_common import DEFAULT_MAX_DISTANCE, estimate_tokens
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+# --- Global Configuration ---
+# Texts with fewer words are only checked for exact duplicates.
+MIN_WORDS_FOR_SIMHASH = 20
+SHINGLE_SIZE = 3
+# How many duplicate clusters are listed in the summary.
+_CLUSTERS_SHOWN = 10
+# Word hashes are memoized; the memo is cleared when it grows past this.
+_WORD_CACHE_LIMIT = 1_000_000
+# --- End Global Configuration ---
+
+_WORD = re.compile(r"\w+")
+# Odd 64-bit constants for combining word hashes into shingle hashes.
+_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class DuplicateFilter:
+    """Remembers every text it has accepted and recognizes exact and near duplicates of them."""
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE, label: str = "document"):
+        """
+        Initializes the DuplicateFilter.
+
+        Args:
+            max_distance: Fingerprints at most this many bits apart are near
+                duplicates. 0 only catches texts whose fingerprints match.
+            label: What is being filtered ("page", "chunk"), for the summary.
+        """
+        self.max_distance = max_distance
+        self.label = label
+        self._bands = max_distance + 1
+        self._band_bits = 64 // self._bands
+        self._exact: dict[str, str] = {}
+        self._band_index: list[dict[int, list[tuple[int, str]]]] = [{} for _ in range(self._bands)]
+        self._word_hashes: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Kept key -> keys of the duplicates dropped in its favor.
+        self.clusters: dict[str, list[str]] = {}
+        self.checked = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.tokens_saved = 0
+
+    def fingerprint(self, text: str) -> int | None:
+        """Returns the 64-bit SimHash of a text's word 3-grams, or None for very short texts."""
+        words = _WORD.findall(text.casefold())
+        if len(words) < MIN_WORDS_FOR_SIMHASH:
+            return None
+        if len(self._word_hashes) > _WORD_CACHE_LIMIT:
+            self._word_hashes.clear()
+        for word in set(words).difference(self._word_hashes):
+            self._word_hashes[word] = _word_hash(word)
+        word_hashes = np.fromiter(map(self._word_hashes.__getitem__, words), dtype=np.uint64, count=len(words))
+        # Combine each run of SHINGLE_SIZE word hashes (wrapping arithmetic) and mix the bits.
+        count = len(word_hashes) - SHINGLE_SIZE + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(SHINGLE_SIZE):
+            shingles += word_hashes[offset:offset + count] * _MULTIPLIERS[offset]
+        shingles ^= shingles >> np.uint64(31)
+        shingles *= np.uint64(0xBF58476D1CE4E5B9)
+        shingles ^= shingles >> np.uint64(29)
+        # A bit of the fingerprint is set when most shingles have it set.
+        bits = np.unpackbits(shingles.view(np.uint8).reshape(-1, 8), axis=1)
+        majority = (bits.sum(axis=0, dtype=np.int64) * 2 > count).astype(np.uint8)
+        return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+    def _bands_of(self, fingerprint: int) -> list[int]:
+        mask = (1 << self._band_bits) - 1
+        return [(fingerprint >> (band * self._band_bits)) & mask for band in range(self._bands)]
+
+    def check(self, key: str, text: str) -> str | None:
+        """
+        Checks a text against everything accepted so far.
+
+        Args:
+            key: Identifies the text, e.g. a document ID or URL.
+            text: The text.
+
+        Returns:
+            The key of the earlier text this one duplicates, or None if it is
+            new, in which case it is remembered.
+        """
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        fingerprint = self.fingerprint(text)
+        with self._lock:
+            self.checked += 1
+            original = self._exact.get(digest)
+            if original is not None:
+                self.exact_duplicates += 1
+            elif fingerprint is not None:
+                original = self._find_near(fingerprint)
+                if original is not None:
+                    self.near_duplicates += 1
+
+            if original is not None:
+                self.clusters.setdefault(original, []).append(key)
+                self.tokens_saved += estimate_tokens(text)
+                return original
+
+            self._exact[digest] = key
+            if fingerprint is not None:
+                for band, value in enumerate(self._bands_of(fingerprint)):
+                    self._band_index[band].setdefault(value, []).append((fingerprint, key))
+            return None
+
+    def _find_near(self, fingerprint: int) -> str | None:
+        for band, value in enumerate(self._bands_of(fingerprint)):
+            for candidate, key in self._band_index[band].get(value, ()):
+                if (candidate ^ fingerprint).bit_count() <= self.max_distance:
+                    return key
+        return None
+
+    def filter_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Yields the documents that are not duplicates of an earlier one."""
+        for doc in documents:
+            original = self.check(doc.id_, doc.text)
+            if original is None:
+                yield doc
+            else:
+                print(f"Skipping duplicate {self.label} {doc.id_} (same content as {original})")
+
+    def summary(self) -> str:
+        dropped = self.exact_duplicates + self.near_duplicates
+        lines = [
+            f"Deduplication: {dropped}/{self.checked} {self.label}(s) dropped "
+            f"({self.exact_duplicates} exact, {self.near_duplicates} near duplicates), "
+            f"~{self.tokens_saved} token(s) not embedded, {len(self.clusters)} cluster(s)"
+        ]
+        largest = sorted(self.clusters.items(), key=lambda item: -len(item[1]))[:_CLUSTERS_SHOWN]
+        for original, duplicates in largest:
+            shown = ", ".join(duplicates[:3]) + (f" (+{len(duplicates) - 3} more)" if len(duplicates) > 3 else "")
+            lines.append(f"  {original} <- {shown}")
+        return "\n".join(lines)
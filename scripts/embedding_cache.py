@@ -0,0 +1,308 @@
+"""
+A content-addressed, on-disk cache for text embeddings.
+
+Vectors are keyed by (model name, embedding kind, SHA-256 of the text), so a
+chunk that appears in several collections - a shared API reference page, a
+boilerplate Confluence section, a repeated PDF header - is only ever sent to
+the embedding API once. Each model's vectors live in an append-only float32
+matrix that is read through a memory map, with a small SQLite index mapping
+keys to rows.
+
+CachedEmbedding wraps any LlamaIndex embedding model, so it can be dropped
+in wherever a VertexTextEmbedding is used today.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Any
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+# --- Global Configuration ---
+DEFAULT_CACHE_DIR = ".embedding_cache"
+# How long a write waits for another process appending to the same store.
+LOCK_TIMEOUT_SECONDS = 60
+# --- End Global Configuration ---
+
+
+class EmbeddingStore:
+    """
+    An append-only float32 matrix of vectors plus an index of content keys.
+
+    One store holds the vectors of a single model, so every row has the same
+    dimension. The store is thread-safe, and processes sharing a cache
+    directory append to it safely.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        """
+        Initializes the EmbeddingStore.
+
+        Args:
+            cache_dir: The root directory of the embedding cache.
+            model_name: The embedding model whose vectors this store holds.
+        """
+        safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", model_name)
+        self.directory = os.path.join(cache_dir, safe_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self._matrix_path = os.path.join(self.directory, "vectors.f32")
+        self._lock = threading.Lock()
+        self._matrix = None
+
+        # Several processes (an ingestion run next to the query server) may
+        # share the store. Writers take SQLite's write lock for the whole
+        # append, so the timeout is how long one waits for another's append.
+        self._db = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite3"), timeout=LOCK_TIMEOUT_SECONDS, check_same_thread=False
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.commit()
+        self.dim = self._stored_dim()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def _stored_dim(self) -> int | None:
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        return row[0] if row else None
+
+    def _mapped_matrix(self, rows: int) -> np.ndarray:
+        """Returns a memory map covering at least the first `rows` rows."""
+        if self._matrix is None or self._matrix.shape[0] < rows:
+            # Other processes append too, so the map covers the whole file.
+            available = os.path.getsize(self._matrix_path) // (self.dim * 4)
+            self._matrix = np.memmap(
+                self._matrix_path, dtype=np.float32, mode="r", shape=(available, self.dim)
+            )
+        return self._matrix
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Returns the cached vectors for whichever of the keys are present."""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    self._db.execute(
+                        f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                )
+            if not found:
+                return {}
+            if self.dim is None:
+                self.dim = self._stored_dim()
+            matrix = self._mapped_matrix(max(found.values()) + 1)
+            return {key: matrix[row].tolist() for key, row in found.items()}
+
+    def put_many(self, items: dict[str, list[float]]):
+        """Appends vectors for keys that are not cached yet."""
+        if not items:
+            return
+        with self._lock:
+            # BEGIN IMMEDIATE takes the database's write lock, which also
+            # serializes appends to the matrix across processes: rows are
+            # assigned and written while no other writer can run.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._append(items)
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def _append(self, items: dict[str, list[float]]):
+        keys = list(items)
+        existing = set()
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            existing.update(
+                key for (key,) in self._db.execute(
+                    f"SELECT key FROM vectors WHERE key IN ({placeholders})", batch
+                )
+            )
+        new_keys = [key for key in keys if key not in existing]
+        if not new_keys:
+            return
+
+        vectors = np.asarray([items[key] for key in new_keys], dtype=np.float32)
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (vectors.shape[1],))
+        self.dim = self._stored_dim()
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+
+        # Rows follow the last committed one. Bytes past it belong to an
+        # append that never committed and are overwritten.
+        (last_row,) = self._db.execute("SELECT MAX(row) FROM vectors").fetchone()
+        start = 0 if last_row is None else last_row + 1
+        with open(self._matrix_path, "r+b" if os.path.exists(self._matrix_path) else "wb") as f:
+            f.seek(start * self.dim * 4)
+            f.write(vectors.tobytes())
+        self._db.executemany(
+            "INSERT INTO vectors VALUES (?, ?)",
+            [(key, start + i) for i, key in enumerate(new_keys)],
+        )
+
+    def close(self):
+        with self._lock:
+            self._matrix = None
+            self._db.close()
+
+
+def _vertex_query_batch(embed_model: BaseEmbedding, queries: list[str]) -> list[list[float]]:
+    """Embeds queries with a VertexTextEmbedding, `embed_batch_size` per request, with the query task type."""
+    # Private parts of llama-index-embeddings-vertex; they may move in any release.
+    from llama_index.embeddings.vertex.base import _get_embedding_request
+
+    vectors = []
+    for i in range(0, len(queries), embed_model.embed_batch_size):
+        texts = _get_embedding_request(
+            texts=queries[i:i + embed_model.embed_batch_size],
+            embed_mode=embed_model.embed_mode,
+            is_query=True,
+            model_name=embed_model.model_name,
+        )
+        embeddings = embed_model._model.get_embeddings(texts, **embed_model.additional_kwargs)
+        vectors.extend(embedding.values for embedding in embeddings)
+    return vectors
+
+
+def embed_query_batch(embed_model: BaseEmbedding, queries: list[str]) -> list[list[float]]:
+    """
+    Embeds several queries, in as few requests as the model allows.
+
+    LlamaIndex only has a one-query-at-a-time API for query embeddings. Models
+    that provide `get_query_embedding_batch` (like CachedEmbedding) are asked
+    for the whole batch; Vertex models get one request per `embed_batch_size`
+    queries with the query task type, as long as the private helpers this
+    needs still exist in the installed llama-index-embeddings-vertex;
+    anything else falls back to one call per query.
+    """
+    if hasattr(embed_model, "get_query_embedding_batch"):
+        return embed_model.get_query_embedding_batch(queries)
+    if type(embed_model).__name__ == "VertexTextEmbedding":
+        try:
+            return _vertex_query_batch(embed_model, queries)
+        except (ImportError, AttributeError) as e:
+            print(f"Batched Vertex query embedding is unavailable ({e}); embedding queries one at a time.")
+    return [embed_model.get_query_embedding(query) for query in queries]
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model so repeated texts are served from the local cache.
+
+    Only texts that miss the cache are sent to the wrapped model, and cache
+    hits never make a remote call. Query and document embeddings are cached
+    separately, since models like text-embedding-004 embed them differently.
+    """
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _store: EmbeddingStore = PrivateAttr()
+    _stats_lock: Any = PrivateAttr()
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(self, inner: BaseEmbedding, cache_dir: str = DEFAULT_CACHE_DIR, **kwargs: Any):
+        """
+        Initializes the CachedEmbedding.
+
+        Args:
+            inner: The embedding model to call on cache misses.
+            cache_dir: The root directory of the embedding cache.
+        """
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            **kwargs,
+        )
+        self._inner = inner
+        self._store = EmbeddingStore(cache_dir, inner.model_name)
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def hit_rate(self) -> float:
+        total = self._hits + self._misses
+        return self._hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Embedding cache: {self._hits} hit(s), {self._misses} miss(es) "
+            f"({self.hit_rate:.0%} hit rate), {len(self._store)} vector(s) stored"
+        )
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{kind}:{digest}"
+
+    def _embed_cached(self, kind: str, texts: list[str], embed_missing) -> list[list[float]]:
+        """Looks texts up in the cache and embeds only the misses, in one call."""
+        keys = [self._key(kind, text) for text in texts]
+        found = self._store.get_many(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = embed_missing(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self._store.put_many(computed)
+            found.update(computed)
+
+        with self._stats_lock:
+            self._misses += len(missing)
+            self._hits += len(texts) - len(missing)
+        return [found[key] for key in keys]
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._embed_cached(
+            "query", [query], lambda texts: [self._inner.get_query_embedding(texts[0])]
+        )[0]
+
+    def get_query_embedding_batch(self, queries: list[str]) -> list[list[float]]:
+        """Embeds several queries, sending all cache misses to the wrapped model together."""
+        return self._embed_cached(
+            "query", queries, lambda texts: embed_query_batch(self._inner, texts)
+        )
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return self._embed_cached("text", texts, self._inner.get_text_embedding_batch)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embedding(text)
+
+    async def _aget_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return self._get_text_embeddings(texts)
+
+
+def with_cache(embed_model: BaseEmbedding, cache_dir: str = DEFAULT_CACHE_DIR) -> CachedEmbedding:
+    """Wraps an embedding model with the shared on-disk embedding cache."""
+    return CachedEmbedding(embed_model, cache_dir=cache_dir)
@@ -0,0 +1,289 @@
+"""
+An explicit, concurrent embedding stage for building Chroma collections.
+
+Documents are split into nodes, and the nodes are grouped into batches that
+respect the embedding API's per-request limits (item count and an estimate
+of tokens). Several batches are embedded in flight at once. When the API
+reports a quota error, both the batch size and the number of requests in
+flight shrink, and the failed batch is split and retried after a backoff;
+after a run of successes they grow back. Finished vectors are streamed into the vector
+store with bulk `add` calls as batches complete, so nothing waits for the
+whole corpus to be embedded, and documents are consumed lazily, so the
+corpus never has to fit in memory.
+
+The embedder is anything with `get_text_embedding_batch(texts)`, so the
+stage can be benchmarked against a deterministic local fake model.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Iterable, Protocol
+
+import telemetry
+from ingest_common import estimate_tokens
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+    from llama_index.core.schema import BaseNode
+
+# --- Global Configuration ---
+# Per-request limits of Vertex AI text-embedding-004.
+MAX_BATCH_ITEMS = 250
+MAX_BATCH_TOKENS = 20000
+# How many embedding requests run at once by default.
+DEFAULT_MAX_IN_FLIGHT = 4
+# After this many successful batches in a row, a throttled stage speeds up again.
+_GROWTH_STREAK = 10
+# Substrings that identify a quota / rate-limit error from the embedding API.
+_QUOTA_MARKERS = ("429", "quota", "resource exhausted", "resourceexhausted", "rate limit")
+# --- End Global Configuration ---
+
+
+class Embedder(Protocol):
+    def get_text_embedding_batch(self, texts: list[str], **kwargs) -> list[list[float]]:
+        ...
+
+
+class VectorSink(Protocol):
+    def add(self, nodes: list[BaseNode], **kwargs) -> list[str]:
+        ...
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Returns True for errors that mean the embedding API is throttling us."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _QUOTA_MARKERS)
+
+
+@dataclass
+class EmbeddingReport:
+    """Counts and timings for one run of the embedding stage."""
+
+    nodes: int = 0
+    batches: int = 0
+    quota_retries: int = 0
+    final_batch_size: int = 0
+    final_concurrency: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        rate = self.nodes / self.seconds if self.seconds else 0.0
+        return (
+            f"Embedded {self.nodes} chunk(s) in {self.batches} batch(es) "
+            f"({rate:.1f} chunks/s, {self.quota_retries} quota retr(ies), "
+            f"final batch size {self.final_batch_size}, final concurrency {self.final_concurrency})"
+        )
+
+
+class EmbeddingStage:
+    """Embeds nodes in adaptive, concurrent batches and streams them into a vector store."""
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        vector_store: VectorSink,
+        max_batch_items: int = MAX_BATCH_ITEMS,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_retries: int = 8,
+        backoff_factor: float = 1.0,
+        node_parser=None,
+        chunk_filter=None,
+        on_document_written: Callable[[str], None] | None = None,
+    ):
+        """
+        Initializes the EmbeddingStage.
+
+        Args:
+            embedder: The model used to embed text batches.
+            vector_store: Where embedded nodes are written, e.g. a ChromaVectorStore.
+            max_batch_items: The maximum number of texts per embedding request.
+            max_batch_tokens: The maximum estimated tokens per embedding request.
+            max_in_flight: How many embedding requests may run at once.
+            max_retries: How many times one batch may hit a quota error before giving up.
+            backoff_factor: Base delay in seconds before retrying a throttled batch.
+            node_parser: Splits documents into nodes. Defaults to Settings.node_parser.
+            chunk_filter: An optional dedup.DuplicateFilter. Chunks that
+                duplicate an earlier chunk are dropped before embedding.
+            on_document_written: Called with a document's ID once all of its
+                chunks are in the vector store, e.g. to checkpoint progress.
+        """
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        if node_parser is None:
+            from llama_index.core import Settings
+
+            node_parser = Settings.node_parser
+        self.node_parser = node_parser
+        self.chunk_filter = chunk_filter
+        self.on_document_written = on_document_written
+        # Chunks still to be written, per source document.
+        self._pending: dict[str, int] = {}
+        self.batch_size = max_batch_items
+        self.concurrency = max_in_flight
+        self._success_streak = 0
+        # Bumped on every back-off, so a burst of failures from requests that
+        # were already in flight only shrinks the stage once.
+        self._generation = 0
+
+    def _make_batches(self, nodes: Iterable[BaseNode]):
+        """Yields batches sized by the current batch size and the token budget."""
+        from llama_index.core.schema import MetadataMode
+
+        batch, batch_tokens = [], 0
+        for node in nodes:
+            tokens = estimate_tokens(node.get_content(metadata_mode=MetadataMode.EMBED))
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.max_batch_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(node)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch: list[BaseNode]) -> list[BaseNode]:
+        from llama_index.core.schema import MetadataMode
+
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+        with telemetry.span("embed", bytes=sum(map(len, texts))):
+            embeddings = self.embedder.get_text_embedding_batch(texts)
+        for node, embedding in zip(batch, embeddings):
+            node.embedding = embedding
+        return batch
+
+    def run_nodes(self, nodes: Iterable[BaseNode]) -> EmbeddingReport:
+        """
+        Embeds the given nodes and writes them to the vector store.
+
+        Args:
+            nodes: The nodes to embed. They are consumed lazily.
+
+        Returns:
+            An EmbeddingReport describing the run.
+        """
+        report = EmbeddingReport()
+        start = time.perf_counter()
+        batches = self._make_batches(nodes)
+        # Throttled batches wait here, split in half, until they are due again.
+        retry_queue: list[tuple[float, int, int, list[BaseNode]]] = []
+        sequence = itertools.count()
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            in_flight = {}
+            exhausted = False
+            while True:
+                while len(in_flight) < self.concurrency:
+                    if retry_queue and retry_queue[0][0] <= time.monotonic():
+                        _, _, attempt, batch = heapq.heappop(retry_queue)
+                    elif not exhausted:
+                        batch = next(batches, None)
+                        attempt = 0
+                        if batch is None:
+                            exhausted = True
+                            continue
+                    else:
+                        break
+                    future = executor.submit(self._embed_batch, batch)
+                    in_flight[future] = (attempt, batch, self._generation)
+
+                if not in_flight:
+                    if not retry_queue:
+                        break
+                    time.sleep(max(0.0, retry_queue[0][0] - time.monotonic()))
+                    continue
+
+                done, _ = wait(in_flight, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    attempt, batch, generation = in_flight.pop(future)
+                    try:
+                        embedded = future.result()
+                    except Exception as e:
+                        if not is_quota_error(e) or attempt >= self.max_retries:
+                            raise
+                        for retry in self._split_for_retry(batch, attempt, generation):
+                            heapq.heappush(retry_queue, (retry[0], next(sequence), *retry[1:]))
+                        report.quota_retries += 1
+                        continue
+                    self._on_success()
+                    with telemetry.span("vector_write"):
+                        self.vector_store.add(embedded)
+                    self._mark_written(embedded)
+                    report.nodes += len(embedded)
+                    report.batches += 1
+
+        report.final_batch_size = self.batch_size
+        report.final_concurrency = self.concurrency
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def _mark_written(self, nodes: list[BaseNode]):
+        """Reports documents whose last pending chunk was just written."""
+        if self.on_document_written is None:
+            return
+        for node in nodes:
+            doc_id = node.ref_doc_id
+            if doc_id not in self._pending:
+                continue
+            self._pending[doc_id] -= 1
+            if not self._pending[doc_id]:
+                del self._pending[doc_id]
+                self.on_document_written(doc_id)
+
+    def _on_success(self):
+        """Grows batch size and concurrency back toward their maximums after a run of successes."""
+        self._success_streak += 1
+        if self._success_streak >= _GROWTH_STREAK:
+            self.batch_size = min(self.max_batch_items, self.batch_size * 2)
+            self.concurrency = min(self.max_in_flight, self.concurrency + 1)
+            self._success_streak = 0
+
+    def _split_for_retry(self, batch: list[BaseNode], attempt: int, generation: int):
+        """Backs off after a quota error and yields (due, attempt, batch) retries for the batch."""
+        if generation == self._generation:
+            self.batch_size = max(1, min(self.batch_size, len(batch)) // 2)
+            self.concurrency = max(1, self.concurrency // 2)
+            self._generation += 1
+        self._success_streak = 0
+        delay = self.backoff_factor * (2 ** attempt)
+        print(
+            f"Embedding quota hit; retrying in {delay:.1f}s with batch size {self.batch_size} "
+            f"and {self.concurrency} request(s) in flight..."
+        )
+        due = time.monotonic() + delay
+        for i in range(0, len(batch), self.batch_size):
+            yield due, attempt + 1, batch[i:i + self.batch_size]
+
+    def iter_nodes(self, documents: Iterable[Document]) -> Iterable[BaseNode]:
+        """Splits documents into nodes one document at a time, as they arrive."""
+        for doc in documents:
+            nodes = self.node_parser.get_nodes_from_documents([doc])
+            if self.chunk_filter is not None:
+                nodes = [
+                    node
+                    for index, node in enumerate(nodes)
+                    if self.chunk_filter.check(f"{doc.id_}#chunk={index}", node.get_content()) is None
+                ]
+            if self.on_document_written is not None:
+                if nodes:
+                    self._pending[doc.id_] = len(nodes)
+                else:
+                    self.on_document_written(doc.id_)
+            yield from nodes
+
+    def run(self, documents: Iterable[Document]) -> EmbeddingReport:
+        """
+        Chunks, embeds and writes documents as they are produced.
+
+        Documents are consumed lazily, so a generator of scraped pages flows
+        straight through to the vector store without being collected first.
+        """
+        return self.run_nodes(self.iter_nodes(documents))
@@ -0,0 +1,213 @@
+"""
+Shared HTTP fetching for the scraping scripts.
+
+Every request made while scraping goes through a HostPool, which keeps one
+pooled, keep-alive `requests.Session` per host and applies per-host
+politeness limits: a cap on concurrent requests, an optional minimum
+interval between requests, and retry with exponential backoff on 429/5xx
+responses and connection errors. When the pool has a ResponseCache, cached
+URLs are revalidated with conditional requests instead of re-downloaded.
+"""
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import ResponseCache
+
+# --- Global Configuration ---
+# Status codes that indicate a transient failure worth retrying.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Seconds to wait for a server before giving up on a single attempt.
+DEFAULT_TIMEOUT = 30
+# Longest Retry-After, in seconds, that is waited out; a URL asking for longer is given up.
+MAX_RETRY_AFTER = 60
+USER_AGENT = "apm-discovery-agent/1.0 (+knowledge-base ingestion)"
+
+# The shared pool is created on first use, or explicitly via configure().
+_default_pool = None
+_default_pool_lock = threading.Lock()
+# --- End Global Configuration ---
+
+
+class _HostState:
+    """Connection pool and politeness bookkeeping for a single host."""
+
+    def __init__(self, max_concurrency: int, min_interval: float):
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.min_interval = min_interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait_for_slot(self):
+        """Blocks until the host's rate limit allows another request."""
+        if not self.min_interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HostPool:
+    """
+    Fetches URLs with one keep-alive session and politeness limits per host.
+
+    The pool is thread-safe and is meant to be shared by every worker of a
+    crawl, so that the per-host limits hold across the whole run.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 4,
+        requests_per_second: float | None = None,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = DEFAULT_TIMEOUT,
+        cache: ResponseCache | None = None,
+        max_retry_after: float = MAX_RETRY_AFTER,
+    ):
+        """
+        Initializes the HostPool.
+
+        Args:
+            max_per_host: Maximum number of concurrent requests to one host.
+            requests_per_second: Optional rate limit per host. None disables it.
+            max_retries: How many times a 429/5xx or connection error is retried.
+            backoff_factor: Base delay in seconds; attempt n waits factor * 2**n.
+            timeout: Timeout in seconds for a single attempt.
+            cache: Optional on-disk response cache used for conditional requests.
+            max_retry_after: The longest Retry-After, in seconds, to wait out.
+                If a server asks for longer, its response is returned as is.
+        """
+        self.max_per_host = max_per_host
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.cache = cache
+        self.max_retry_after = max_retry_after
+        self._hosts: dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host: str) -> _HostState:
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = _HostState(self.max_per_host, self.min_interval)
+                self._hosts[host] = state
+            return state
+
+    def _backoff_delay(self, attempt: int, response: requests.Response | None = None) -> float:
+        """Honors a numeric Retry-After header, otherwise backs off exponentially."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff_factor * (2 ** attempt) * (1 + random.random() * 0.1)
+
+    def get(self, url: str, headers: dict | None = None, stream: bool = False) -> requests.Response:
+        """
+        Performs a GET request, retrying transient failures with backoff.
+
+        If the URL is in the response cache, the request is made conditional
+        and a 304 answer is turned into the cached 200 response.
+
+        Args:
+            url: The URL to fetch.
+            headers: Optional extra request headers.
+            stream: Leaves the body unread so the caller can consume it with
+                `iter_content()`; close the response when done. A cached
+                body is streamed from disk, and a new one is cached as it
+                is read.
+
+        Returns:
+            The final response. Non-retryable error statuses, and retryable
+            ones whose Retry-After exceeds `max_retry_after`, are returned
+            as-is, so callers should still call `raise_for_status()`.
+
+        Raises:
+            requests.RequestException: If the request still fails after all retries.
+        """
+        if self.cache is None:
+            return self._get_with_retries(url, headers, stream)
+
+        conditional = self.cache.conditional_headers(url)
+        response = self._get_with_retries(url, {**conditional, **(headers or {})}, stream)
+        if response.status_code == 304 and conditional:
+            response.close()
+            cached = self.cache.load(url, response, stream=stream)
+            if cached is not None:
+                return cached
+            # The cached body vanished; fetch the page unconditionally.
+            response = self._get_with_retries(url, headers, stream)
+        if stream:
+            return self.cache.spool(url, response)
+        self.cache.store(url, response)
+        return response
+
+    def _get_with_retries(self, url: str, headers: dict | None, stream: bool = False) -> requests.Response:
+        state = self._host_state(urlparse(url).netloc)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            with state.semaphore:
+                state.wait_for_slot()
+                try:
+                    response = state.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.max_retries:
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                        return response
+                    response.close()
+            delay = self._backoff_delay(attempt, response)
+            if delay > self.max_retry_after:
+                # Waiting would tie up a crawl worker; the caller gets the 429/5xx.
+                print(f"Giving up on {url}: the server asked to retry in {delay:.0f}s.")
+                return response
+            print(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})...")
+            time.sleep(delay)
+
+    def close(self):
+        """Closes every pooled session and the response cache."""
+        with self._lock:
+            for state in self._hosts.values():
+                state.session.close()
+            self._hosts.clear()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def configure(**kwargs) -> HostPool:
+    """Replaces the shared pool with one built from the given HostPool options."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+        _default_pool = HostPool(**kwargs)
+        return _default_pool
+
+
+def get_pool() -> HostPool:
+    """Returns the shared pool, creating it with default limits on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HostPool()
+        return _default_pool
+
+
+def get(url: str, headers: dict | None = None, stream: bool = False) -> requests.Response:
+    """Fetches a URL through the shared pool."""
+    return get_pool().get(url, headers=headers, stream=stream)
@@ -0,0 +1,220 @@
+"""
+The crawl frontier: which URLs the web scraper fetches next, and which it never fetches.
+
+`Frontier` is a FIFO of canonical URLs backed by a deque. Every URL is
+checked once when it is discovered: against the seen set (queued and
+visited URLs alike, so a link that appears on a thousand pages is queued
+once), against the site's domain, against the include/exclude rules of a
+`URLFilter`, and against the depth limit. The URL filter compiles all of its
+rules into one regular expression per direction, so a check is a single
+`search` call no matter how many patterns are configured.
+
+The seen set is a `HashedURLSet`: an open-addressing table of 64-bit URL
+hashes in a numpy array, 16 to 32 bytes per URL instead of the ~200 bytes
+of a Python set of URL strings. A hash collision (odds around 1 in 10^7 for
+a million URLs) would only make the crawler skip one page. Links repeated on
+every page (sidebars, headers) are recognized by their exact spelling in a
+bounded set before any canonicalization or hashing happens.
+"""
+import hashlib
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable
+from urllib.parse import urlparse
+
+import numpy as np
+
+from ingest_common import canonicalize_url
+
+# --- Global Configuration ---
+# Slots in a new HashedURLSet; the table doubles whenever it is half full.
+_INITIAL_SLOTS = 1024
+# Links exactly as written on recent pages, to skip canonicalizing the same
+# navigation links over and over; cleared when it grows past this.
+_RECENT_LINKS_LIMIT = 100_000
+# --- End Global Configuration ---
+
+
+def _url_hash(url: str) -> int:
+    # 0 marks an empty slot, so it is never used as a hash.
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class HashedURLSet:
+    """A memory-compact set of URLs that stores only a 64-bit hash of each."""
+
+    def __init__(self, slots: int = _INITIAL_SLOTS):
+        self._table = np.zeros(slots, dtype=np.uint64)
+        self._mask = slots - 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self._table.nbytes
+
+    def _slot(self, table: np.ndarray, mask: int, value: int) -> int:
+        """Returns the slot holding `value`, or the empty slot where it belongs."""
+        slot = value & mask
+        while True:
+            current = int(table[slot])
+            if current == value or current == 0:
+                return slot
+            slot = (slot + 1) & mask
+
+    def __contains__(self, url: str) -> bool:
+        value = _url_hash(url)
+        return int(self._table[self._slot(self._table, self._mask, value)]) == value
+
+    def add(self, url: str) -> bool:
+        """Adds a URL. Returns False if it was already present."""
+        value = _url_hash(url)
+        slot = self._slot(self._table, self._mask, value)
+        if int(self._table[slot]) == value:
+            return False
+        self._table[slot] = value
+        self._size += 1
+        if self._size * 2 > len(self._table):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self._table[self._table != 0]
+        self._table = np.zeros(len(self._table) * 2, dtype=np.uint64)
+        self._mask = len(self._table) - 1
+        for value in old.tolist():
+            self._table[self._slot(self._table, self._mask, value)] = value
+
+
+def _compile(patterns: Iterable[str]) -> re.Pattern | None:
+    patterns = list(patterns)
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns)) if patterns else None
+
+
+class URLFilter:
+    """Include and exclude rules for crawl URLs, each compiled into a single regex."""
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        """
+        Initializes the URLFilter.
+
+        Args:
+            include: Regexes; if any are given, a URL must match one of them.
+            exclude: Regexes; a URL matching any of them is never crawled.
+                Use `re.escape` for plain substrings.
+        """
+        self._include = _compile(include)
+        self._exclude = _compile(exclude)
+
+    def allows(self, url: str) -> bool:
+        if self._exclude is not None and self._exclude.search(url):
+            return False
+        return self._include is None or self._include.search(url) is not None
+
+
+@dataclass
+class FrontierStats:
+    """Why discovered URLs were or were not queued."""
+
+    queued: int = 0
+    duplicates: int = 0
+    filtered: int = 0
+    off_site: int = 0
+    too_deep: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"Frontier: {self.queued} URL(s) queued, {self.duplicates} duplicate(s), "
+            f"{self.filtered} filtered, {self.off_site} off-site, {self.too_deep} beyond max depth"
+        )
+
+
+class Frontier:
+    """A breadth-first queue of canonical URLs to crawl, each queued at most once."""
+
+    def __init__(
+        self,
+        base_domain: str,
+        url_filter: URLFilter | None = None,
+        max_depth: int | None = None,
+        max_pages: int | None = None,
+    ):
+        """
+        Initializes the Frontier.
+
+        Args:
+            base_domain: Only URLs on this host are queued.
+            url_filter: Include/exclude rules applied to canonical URLs.
+            max_depth: Links more than this many hops from a start URL are
+                not queued. None means no limit.
+            max_pages: At most this many URLs are handed out by `pop`.
+                None means no limit.
+        """
+        self.base_domain = base_domain
+        self.url_filter = url_filter or URLFilter()
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.seen = HashedURLSet()
+        self.popped = 0
+        self.stats = FrontierStats()
+        self._queue: deque[tuple[str, str, int]] = deque()
+        self._recent_links: set[str] = set()
+
+    def add(self, url: str, depth: int = 0) -> bool:
+        """
+        Queues a URL unless it was seen before or is ruled out.
+
+        Args:
+            url: The URL as linked; it is fetched as given, which avoids a
+                redirect when the site prefers another spelling.
+            depth: Hops from the start URLs.
+
+        Returns:
+            True if the URL was queued.
+        """
+        if url in self._recent_links:
+            self.stats.duplicates += 1
+            return False
+        if self.max_depth is not None and depth > self.max_depth:
+            self.stats.too_deep += 1
+            return False
+        if len(self._recent_links) >= _RECENT_LINKS_LIMIT:
+            self._recent_links.clear()
+        self._recent_links.add(url)
+        canonical = canonicalize_url(url)
+        if not self.seen.add(canonical):
+            self.stats.duplicates += 1
+            return False
+        if urlparse(canonical).netloc != self.base_domain:
+            self.stats.off_site += 1
+            return False
+        if not self.url_filter.allows(canonical):
+            self.stats.filtered += 1
+            return False
+        self._queue.append((url, canonical, depth))
+        self.stats.queued += 1
+        return True
+
+    def extend(self, urls: Iterable[str], depth: int = 0):
+        for url in urls:
+            self.add(url, depth)
+
+    def pop(self) -> tuple[str, str, int] | None:
+        """Returns the next (linked URL, canonical URL, depth), or None when done."""
+        if not self:
+            return None
+        self.popped += 1
+        return self._queue.popleft()
+
+    def remaining(self) -> list[tuple[str, str, int]]:
+        """Returns the queued (linked URL, canonical URL, depth) entries that were never popped."""
+        return list(self._queue)
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __bool__(self) -> bool:
+        return bool(self._queue) and (self.max_pages is None or self.popped < self.max_pages)
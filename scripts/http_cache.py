@@ -0,0 +1,272 @@
+"""
+An on-disk HTTP response cache with conditional revalidation.
+
+Response bodies are stored as files in the cache directory, and a small
+SQLite index keeps each URL's validators (ETag / Last-Modified), headers,
+size and last-access time. On later runs the fetcher sends the validators
+as If-None-Match / If-Modified-Since, and a 304 Not Modified answer is
+served from disk. The total size of stored bodies is capped, and the least
+recently used entries are evicted first. Streamed responses are cached too:
+a 200 body is written to disk as the caller reads it, and a 304 is answered
+with a response that streams the cached body from its file.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# --- Global Configuration ---
+DEFAULT_CACHE_DIR = ".http_cache"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+# Headers that describe the transfer rather than the body we store.
+_SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+# --- End Global Configuration ---
+
+
+class ResponseCache:
+    """
+    Stores response bodies and validators on disk, evicting in LRU order.
+
+    The cache is thread-safe so a single instance can sit under a concurrent crawl.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initializes the ResponseCache.
+
+        Args:
+            cache_dir: The directory where bodies and the index are stored.
+            max_bytes: The maximum total size of cached bodies.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.stored = 0
+        self.bytes_saved = 0
+        os.makedirs(os.path.join(cache_dir, "bodies"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._db.commit()
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _body_path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "bodies", digest)
+
+    def conditional_headers(self, url: str) -> dict:
+        """Returns the If-None-Match / If-Modified-Since headers for a cached URL."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return {}
+        etag, last_modified = row
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def load(self, url: str, not_modified: requests.Response, stream: bool = False) -> requests.Response | None:
+        """
+        Builds a 200 response from the cached body after a 304 revalidation.
+
+        Args:
+            url: The URL that was revalidated.
+            not_modified: The 304 response returned by the server.
+            stream: Leave the body in its file, to be read with `iter_content()`.
+
+        Returns:
+            The cached response, or None if the entry has gone missing.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT headers, size FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            try:
+                body_file = open(self._body_path(url), "rb")
+            except OSError:
+                self._delete(url)
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+            self.hits += 1
+            self.bytes_saved += row[1]
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.request = not_modified.request
+        response.headers = CaseInsensitiveDict(json.loads(row[0]))
+        if stream:
+            response.raw = body_file
+        else:
+            with body_file:
+                response._content = body_file.read()
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def store(self, url: str, response: requests.Response):
+        """Caches a successful response if it carries a validator to revalidate with."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        tmp_path = self._tmp_path(url)
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        self._commit(url, response, tmp_path, len(body))
+
+    def spool(self, url: str, response: requests.Response) -> requests.Response:
+        """
+        Caches a streamed response's body as the caller reads it.
+
+        The body goes to a temporary file chunk by chunk and becomes the
+        cache entry once it has been read to the end; a body that is not read
+        to the end, or outgrows the size cap, is discarded. Responses that
+        `store` would not cache are returned untouched.
+        """
+        if response.status_code != 200 or not (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+            return response
+        response.raw = _SpoolingReader(self, url, response)
+        return response
+
+    def _tmp_path(self, url: str) -> str:
+        return f"{self._body_path(url)}.{threading.get_ident()}.tmp"
+
+    def _commit(self, url: str, response: requests.Response, tmp_path: str, size: int):
+        """Moves a written body into place and records it in the index."""
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _SKIPPED_HEADERS}
+        with self._lock:
+            self.stored += 1
+            os.replace(tmp_path, self._body_path(url))
+
+            previous = self._db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            if previous:
+                self._total_bytes -= previous[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    json.dumps(headers),
+                    size,
+                    time.time(),
+                ),
+            )
+            self._total_bytes += size
+            self._evict()
+            self._db.commit()
+
+    def _delete(self, url: str):
+        row = self._db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return
+        self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+        self._total_bytes -= row[0]
+        try:
+            os.remove(self._body_path(url))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache fits its size cap."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT url FROM responses ORDER BY last_access").fetchall()
+        for (url,) in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._delete(url)
+
+    def summary(self) -> str:
+        return (
+            f"HTTP cache: {self.hits} page(s) revalidated from disk, {self.stored} stored, "
+            f"{self.bytes_saved / 1_000_000:.2f} MB not re-downloaded"
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class _SpoolingReader:
+    """Stands in for a streamed response's raw body, copying what is read into the cache."""
+
+    def __init__(self, cache: ResponseCache, url: str, response: requests.Response):
+        self._cache = cache
+        self._url = url
+        self._response = response
+        self._raw = response.raw
+        self._tmp_path = cache._tmp_path(url)
+        self._file = open(self._tmp_path, "wb")
+        self._size = 0
+
+    def stream(self, amt: int, decode_content: bool | None = None):
+        """Yields the body in chunks; `iter_content()` prefers this to `read()`."""
+        while True:
+            data = self.read(amt)
+            if not data:
+                return
+            yield data
+
+    def read(self, amt: int | None = None, decode_content: bool | None = None) -> bytes:
+        # Always decoded, to match the bodies `store` keeps.
+        data = self._raw.read(amt, decode_content=True)
+        if self._file is None:
+            return data
+        if data:
+            self._size += len(data)
+            if self._size > self._cache.max_bytes:
+                self._discard()
+            else:
+                self._file.write(data)
+        else:
+            self._file.close()
+            self._file = None
+            self._cache._commit(self._url, self._response, self._tmp_path, self._size)
+        return data
+
+    def _discard(self):
+        self._file.close()
+        self._file = None
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._file is not None:
+            self._discard()
+        self._raw.close()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
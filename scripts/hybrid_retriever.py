@@ -0,0 +1,67 @@
+"""
+The LlamaIndex retriever for hybrid (BM25 + vector) search over one Chroma collection.
+
+It lives apart from `lexical_index` because subclassing `BaseRetriever`
+loads LlamaIndex, which the index itself and its command do not need.
+"""
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+from lexical_index import LexicalIndex, hybrid_search, is_identifier_query, tokenize
+
+
+class HybridRetriever(BaseRetriever):
+    """A LlamaIndex retriever that fuses BM25 and vector search over one Chroma collection."""
+
+    def __init__(
+        self,
+        chroma_collection,
+        lexical_index: LexicalIndex,
+        embed_model,
+        similarity_top_k: int,
+        mode: str = "hybrid",
+    ):
+        """
+        Initializes the HybridRetriever.
+
+        Args:
+            chroma_collection: The Chroma collection to search.
+            lexical_index: The collection's LexicalIndex.
+            embed_model: Embeds queries that arrive without an embedding.
+            similarity_top_k: The number of nodes to return.
+            mode: "hybrid", "vector" or "lexical".
+        """
+        super().__init__()
+        self.chroma_collection = chroma_collection
+        self.lexical_index = lexical_index
+        self.embed_model = embed_model
+        self.similarity_top_k = similarity_top_k
+        self.mode = mode
+
+    def needs_embedding(self, query: str) -> bool:
+        """Returns False when the query will be answered from the lexical index alone."""
+        if self.mode == "lexical":
+            return False
+        if self.mode == "vector" or not is_identifier_query(query):
+            return True
+        return not any(self.lexical_index.has_term(term) for term in tokenize(query))
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        query = query_bundle.query_str
+        hits = hybrid_search(
+            self.chroma_collection,
+            self.lexical_index,
+            query,
+            self.similarity_top_k,
+            lambda: query_bundle.embedding or self.embed_model.get_query_embedding(query),
+            mode=self.mode,
+        )
+        nodes = []
+        for hit in hits:
+            try:
+                node = metadata_dict_to_node(hit.metadata, text=hit.text)
+            except Exception:
+                node = TextNode(id_=hit.id, text=hit.text, metadata=hit.metadata)
+            nodes.append(NodeWithScore(node=node, score=hit.score))
+        return nodes
@@ -0,0 +1,284 @@
+"""
+Incremental synchronization of documents into a Chroma collection.
+
+Instead of deleting a collection and re-embedding everything, each document
+is keyed by a stable source ID (Confluence page ID, URL, or file path and
+page) and a hash of its content. Only new or changed documents are embedded
+and written; chunks whose source disappeared are deleted, and unchanged
+chunks are left untouched. A changed document's old chunks are only deleted
+once all of its new chunks are written, so a run that fails midway never
+leaves it out of the index.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from embedding_stage import DEFAULT_MAX_IN_FLIGHT, EmbeddingStage
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+
+# --- Global Configuration ---
+# Metadata key holding the hash of a document's text.
+CONTENT_HASH_KEY = "content_hash"
+# Chroma caps how many records a single get/delete call can handle comfortably.
+_CHROMA_PAGE_SIZE = 5000
+# --- End Global Configuration ---
+
+
+@dataclass
+class SyncReport:
+    """Counts of documents handled by an incremental sync."""
+
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    skipped: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    def summary(self) -> str:
+        return (
+            f"{self.added} added, {self.updated} updated, "
+            f"{self.removed} removed, {self.skipped} unchanged"
+        )
+
+
+@dataclass
+class SourceListing:
+    """
+    What loading found out about the documents it did not yield.
+
+    A sync removes every stored document that was not loaded, which is only
+    right if the source was listed completely and every listed document
+    loaded. Loaders fill this in while documents stream past: documents that
+    exist but failed to load go in `failed_ids` and are kept, and a listing
+    that may have missed documents (a fallback, or a crawl through pages
+    that failed) is marked incomplete, which skips removals altogether.
+    """
+
+    failed_ids: set[str] = field(default_factory=set)
+    complete: bool = True
+
+    def mark_incomplete(self, reason: str):
+        if self.complete:
+            print(f"⚠️ {reason}; documents missing from this run will not be removed.")
+        self.complete = False
+
+    @property
+    def partial(self) -> bool:
+        """True if some documents may not have been loaded, so the run must not count as a full sync."""
+        return not self.complete or bool(self.failed_ids)
+
+
+def stable_document_id(doc: Document) -> str:
+    """
+    Derives an ID for a document that stays the same across ingestion runs.
+
+    Confluence pages are keyed by page ID, web pages by URL, and PDF content by
+    file path plus page number. Documents without any source metadata fall back
+    to their content hash, so an edit shows up as one removal plus one addition.
+    """
+    metadata = doc.metadata
+    if metadata.get("page_id"):
+        return confluence_document_id(metadata["page_id"])
+    if metadata.get("url"):
+        return metadata["url"]
+    source = metadata.get("file_path") or metadata.get("filename")
+    if source:
+        page = metadata.get("page_number")
+        return f"{source}#page={page}" if page is not None else source
+    return f"sha256:{content_hash(doc.text)}"
+
+
+def confluence_document_id(page_id: str) -> str:
+    return f"confluence:{page_id}"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_prepared(documents: Iterable[Document]) -> Iterator[Document]:
+    """
+    Assigns stable IDs and content hashes to documents as they stream past.
+
+    Documents that resolve to the same ID get a numeric suffix so every ID in
+    a run is unique. The hash is excluded from the text sent to the embedding
+    model and the LLM, so adding it does not change any vectors.
+    """
+    seen: dict[str, int] = {}
+    for doc in documents:
+        doc_id = stable_document_id(doc)
+        count = seen.get(doc_id, 0)
+        seen[doc_id] = count + 1
+        if count:
+            doc_id = f"{doc_id}#{count}"
+
+        doc.id_ = doc_id
+        doc.metadata[CONTENT_HASH_KEY] = content_hash(doc.text)
+        for excluded in (doc.excluded_embed_metadata_keys, doc.excluded_llm_metadata_keys):
+            if CONTENT_HASH_KEY not in excluded:
+                excluded.append(CONTENT_HASH_KEY)
+        yield doc
+
+
+def existing_document_hashes(chroma_collection) -> dict[str, str | None]:
+    """
+    Maps every source document ID stored in the collection to its content hash.
+
+    A document whose chunks disagree on the hash (an interrupted sync wrote
+    part of its new version next to the old one) maps to None, so the next
+    sync treats it as changed and replaces all of its chunks.
+    """
+    hashes = {}
+    offset = 0
+    while True:
+        page = chroma_collection.get(include=["metadatas"], limit=_CHROMA_PAGE_SIZE, offset=offset)
+        metadatas = page.get("metadatas") or []
+        for metadata in metadatas:
+            ref_doc_id = (metadata or {}).get("ref_doc_id")
+            if ref_doc_id:
+                digest = metadata.get(CONTENT_HASH_KEY)
+                hashes[ref_doc_id] = digest if hashes.get(ref_doc_id, digest) == digest else None
+        if len(metadatas) < _CHROMA_PAGE_SIZE:
+            return hashes
+        offset += _CHROMA_PAGE_SIZE
+
+
+def stored_document_ids(db, collection_name: str) -> set[str]:
+    """Returns the source document IDs stored in a collection, or an empty set if it does not exist."""
+    if collection_name not in [c.name for c in db.list_collections()]:
+        return set()
+    return set(existing_document_hashes(db.get_collection(collection_name)))
+
+
+def delete_documents(chroma_collection, doc_ids: list[str]):
+    """Deletes every chunk belonging to the given source document IDs."""
+    for i in range(0, len(doc_ids), _CHROMA_PAGE_SIZE):
+        batch = doc_ids[i:i + _CHROMA_PAGE_SIZE]
+        chroma_collection.delete(where={"ref_doc_id": {"$in": batch}})
+
+
+def document_node_ids(chroma_collection, doc_id: str) -> list[str]:
+    """Returns the IDs of the chunks currently stored for a source document."""
+    return chroma_collection.get(where={"ref_doc_id": doc_id}, include=[])["ids"]
+
+
+def delete_nodes(chroma_collection, node_ids: list[str]):
+    """Deletes the chunks with the given node IDs."""
+    for i in range(0, len(node_ids), _CHROMA_PAGE_SIZE):
+        chroma_collection.delete(ids=node_ids[i:i + _CHROMA_PAGE_SIZE])
+
+
+def sync_documents(
+    chroma_collection,
+    documents: Iterable[Document],
+    embed_model: BaseEmbedding,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    stage: EmbeddingStage | None = None,
+    retain_ids: Iterable[str] = (),
+    lexical_index=None,
+    rescore_store=None,
+    listing: SourceListing | None = None,
+) -> SyncReport:
+    """
+    Brings a Chroma collection in line with the given documents.
+
+    Documents are streamed: each one is classified, and new or changed ones
+    flow straight into the embedding stage. A changed document's old chunks
+    are deleted once its new chunks are all written, so if embedding fails
+    partway the document keeps its previous version. Removals are only
+    decided at the end, once every current document has been seen.
+
+    Args:
+        chroma_collection: The Chroma collection to update.
+        documents: The complete current set of documents for the collection,
+            already passed through `iter_prepared`. IDs are assigned once,
+            by the caller: preparing again after the caller has filtered
+            documents out would renumber the `#n` suffixes.
+        embed_model: The embedding model used for new and changed documents.
+        max_in_flight: How many embedding requests may run at once.
+        stage: An optional preconfigured EmbeddingStage to write through.
+        retain_ids: IDs of documents that still exist but were not passed in,
+            e.g. because a resumed run already stored them or their source
+            reports no change since the last run. They are kept. The iterable
+            is only read once every document has been processed, so loaders
+            may still be adding to it while documents stream in.
+        lexical_index: An optional LexicalIndex to delete removed chunks from.
+        rescore_store: The RescoreStore of a compact collection, to delete
+            removed chunks' full vectors from.
+        listing: Filled in by the loaders; like `retain_ids`, it is only read
+            once every document has been processed. Its failed documents are
+            kept, and nothing is removed if it is incomplete.
+
+    Returns:
+        A SyncReport with the added/updated/removed/unchanged counts.
+    """
+    existing = existing_document_hashes(chroma_collection)
+    seen_ids = set()
+    report = SyncReport()
+    if stage is None:
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+        stage = EmbeddingStage(embed_model, vector_store, max_in_flight=max_in_flight)
+
+    # Chunks of changed documents, by document ID, to delete once the new version is written.
+    replaced: dict[str, list[str]] = {}
+    mark_done = stage.on_document_written
+
+    def on_document_written(doc_id: str):
+        old_node_ids = replaced.pop(doc_id, None)
+        if old_node_ids:
+            delete_nodes(chroma_collection, old_node_ids)
+            if lexical_index is not None:
+                lexical_index.delete_nodes(old_node_ids)
+            if rescore_store is not None:
+                rescore_store.delete_nodes(old_node_ids)
+        if mark_done is not None:
+            mark_done(doc_id)
+
+    stage.on_document_written = on_document_written
+
+    def changed_documents() -> Iterator[Document]:
+        for doc in documents:
+            seen_ids.add(doc.id_)
+            if doc.id_ not in existing:
+                report.added += 1
+                yield doc
+            elif existing[doc.id_] != doc.metadata[CONTENT_HASH_KEY]:
+                report.updated += 1
+                replaced[doc.id_] = document_node_ids(chroma_collection, doc.id_)
+                yield doc
+            else:
+                report.skipped += 1
+                if mark_done is not None:
+                    mark_done(doc.id_)
+
+    try:
+        print(f"✅ {stage.run(changed_documents()).summary()}")
+    finally:
+        stage.on_document_written = mark_done
+
+    seen_ids.update(retain_ids)
+    if listing is not None:
+        seen_ids.update(listing.failed_ids)
+    stale_ids = [doc_id for doc_id in existing if doc_id not in seen_ids]
+    if stale_ids and listing is not None and not listing.complete:
+        print(f"Keeping {len(stale_ids)} document(s) that were not loaded, since the listing was incomplete.")
+        stale_ids = []
+    report.removed = len(stale_ids)
+    if stale_ids:
+        print(f"Deleting chunks for {len(stale_ids)} document(s) whose source disappeared...")
+        delete_documents(chroma_collection, stale_ids)
+        if lexical_index is not None:
+            lexical_index.delete_documents(stale_ids)
+        if rescore_store is not None:
+            rescore_store.delete_documents(stale_ids)
+    return report
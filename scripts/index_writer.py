@@ -0,0 +1,184 @@
+"""
+Writing a stream of documents into a knowledge base collection.
+
+Both ingestion scripts end the same way: open (or recreate) the Chroma
+collection, chunk and embed the documents through the EmbeddingStage, and
+write every chunk to Chroma, the collection's BM25 index and, for compact
+collections, the int8 re-scoring store. `write_index` does all of that, as
+a full build or as an incremental sync, and leaves only loading the
+documents to the scripts.
+"""
+from __future__ import annotations
+
+import itertools
+from typing import TYPE_CHECKING, Iterable
+
+import compact_storage
+import knowledge_store
+import models
+from dedup import DuplicateFilter
+from embedding_stage import DEFAULT_MAX_IN_FLIGHT, MAX_BATCH_ITEMS, EmbeddingStage
+from index_sync import SourceListing, iter_prepared, sync_documents
+from ingest_common import DEFAULT_MAX_DISTANCE
+from lexical_index import IndexingSink, LexicalIndex
+from pipeline import Checkpoint, buffered
+from query_cache import bump_collection_version
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+    from chunking import StructuredNodeParser
+
+
+def write_index(
+    collection_name: str,
+    documents: Iterable[Document],
+    overwrite: bool = False,
+    sync: bool = False,
+    embed_concurrency: int = DEFAULT_MAX_IN_FLIGHT,
+    checkpoint: Checkpoint | None = None,
+    done_ids: Iterable[str] = (),
+    node_parser: StructuredNodeParser | None = None,
+    dedup_distance: int | None = DEFAULT_MAX_DISTANCE,
+    unchanged_ids: Iterable[str] = (),
+    embed_model=None,
+    source: str | None = None,
+    compact_dims: int | None = None,
+    listing: SourceListing | None = None,
+) -> str:
+    """
+    Chunks, embeds and writes documents to a Chroma collection.
+
+    Documents are streamed: loading runs in a background thread behind a
+    bounded buffer, and each document is chunked, embedded and written as
+    soon as it arrives. Embedding requests are batched to the API's limits,
+    `embed_concurrency` at a time. With `sync`, the existing collection is
+    updated incrementally: only new or changed documents are embedded, and
+    documents that are no longer present are removed.
+
+    Args:
+        collection_name: The Chroma collection to write to.
+        documents: The documents to index, typically a generator.
+        overwrite: If True, delete the existing collection first. Ignored
+            with `sync` or when resuming (`done_ids` is not empty).
+        sync: If True, update the existing collection incrementally.
+        embed_concurrency: How many embedding requests may run at once.
+        checkpoint: Records each fully written document so a run can resume.
+            It is cleared once the run completes.
+        done_ids: IDs already stored by an interrupted run; they are skipped.
+        node_parser: Splits documents into chunks. Defaults to a
+            StructuredNodeParser with the default chunk size and overlap.
+        dedup_distance: Pages and chunks whose SimHash fingerprints are at
+            most this many bits apart from an earlier one are not embedded.
+            None disables deduplication, and so does `sync`.
+        unchanged_ids: With `sync`, IDs of documents that were not loaded
+            because their source reports no change; they are kept.
+        embed_model: The embedding model. Defaults to Vertex AI
+            text-embedding-004 behind the local embedding cache.
+        source: Where the documents came from, recorded in the knowledge
+            store's registry.
+        compact_dims: Store only this many leading dimensions of each vector
+            in Chroma and keep the full vectors as int8 for re-scoring (see
+            `compact_storage`). Fixed when the collection is created; later
+            syncs keep the recorded value.
+        listing: With `sync`, what loading found out about the documents it
+            did not yield (see `index_sync.SourceListing`).
+
+    Returns:
+        How the collection changed, to finish a "Knowledge base ... " line:
+        "has been created" or "is up to date: <sync summary>".
+    """
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
+    from chunking import StructuredNodeParser
+
+    done_ids = set(done_ids)
+    node_parser = node_parser or StructuredNodeParser()
+    page_filter = chunk_filter = None
+    # A sync only re-chunks changed documents, so a chunk dropped in favor of another
+    # document's copy would be lost once that document changes; and which of two
+    # duplicate pages is kept depends on fetch order, so the stored one would swap.
+    if dedup_distance is not None and not sync:
+        page_filter = DuplicateFilter(dedup_distance, label="page")
+        chunk_filter = DuplicateFilter(dedup_distance, label="chunk")
+
+    print("\nSetting up ChromaDB vector store...")
+    db = knowledge_store.get_client()
+    lexical_index = LexicalIndex(collection_name)
+    if overwrite and not sync and not done_ids:
+        if collection_name in [c.name for c in db.list_collections()]:
+            print(f"Deleting existing collection '{collection_name}'...")
+            db.delete_collection(name=collection_name)
+            print(f"✅ Collection '{collection_name}' deleted.")
+        lexical_index.reset()
+        compact_storage.delete_store(collection_name)
+
+    chroma_collection = db.get_or_create_collection(collection_name)
+    compact_dims = compact_storage.resolve_dims(chroma_collection, compact_dims)
+    print(f"✅ Using collection: '{collection_name}'")
+
+    if embed_model is None:
+        print("Initializing the embedding model...")
+        embed_model = models.embedding_model(embed_batch_size=MAX_BATCH_ITEMS)
+        print("✅ Embedding model initialized.")
+
+    # Every chunk written to Chroma is also added to the collection's BM25 index.
+    lexical_index.ensure_built(chroma_collection)
+    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    rescore_store = None
+    if compact_dims:
+        # Chroma gets the vector prefixes; the full vectors go to the int8 store for re-scoring.
+        print(f"Storing {compact_dims}-dimension vectors, with full int8 vectors for re-scoring.")
+        rescore_store = compact_storage.RescoreStore(chroma_collection)
+        vector_store = compact_storage.CompactSink(vector_store, rescore_store, compact_dims)
+        if not (chroma_collection.metadata or {}).get(compact_storage.COMPACT_DIMS_KEY):
+            knowledge_store.describe_collection(chroma_collection, compact_dims=compact_dims)
+    vector_store = IndexingSink(vector_store, lexical_index)
+    stage = EmbeddingStage(
+        embed_model,
+        vector_store,
+        max_in_flight=embed_concurrency,
+        node_parser=node_parser,
+        chunk_filter=chunk_filter,
+        on_document_written=checkpoint.mark_done if checkpoint else None,
+    )
+    documents = (doc for doc in iter_prepared(buffered(documents)) if doc.id_ not in done_ids)
+    if page_filter is not None:
+        documents = page_filter.filter_documents(documents)
+
+    if sync:
+        print("Synchronizing the index with the loaded documents...")
+        report = sync_documents(
+            chroma_collection,
+            documents,
+            embed_model,
+            stage=stage,
+            retain_ids=itertools.chain(done_ids, unchanged_ids),
+            lexical_index=lexical_index,
+            rescore_store=rescore_store,
+            listing=listing,
+        )
+        if report.changed:
+            bump_collection_version(chroma_collection)
+            knowledge_store.describe_collection(chroma_collection, source, embed_model.model_name)
+        summary = f"is up to date: {report.summary()}"
+    else:
+        print("Creating the index. This may take a few minutes...")
+        print(f"✅ {stage.run(documents).summary()}")
+        bump_collection_version(chroma_collection)
+        knowledge_store.describe_collection(chroma_collection, source, embed_model.model_name)
+        summary = "has been created"
+
+    lexical_index.close()
+    if rescore_store is not None:
+        rescore_store.close()
+    if checkpoint is not None:
+        checkpoint.clear()
+    print(node_parser.stats.summary())
+    for duplicates in (page_filter, chunk_filter):
+        if duplicates is not None:
+            print(duplicates.summary())
+    # Only the cached wrapper keeps statistics; any other embedder passed in has none.
+    if hasattr(embed_model, "summary"):
+        print(embed_model.summary())
+    return summary
@@ -0,0 +1,61 @@
+"""
+Defaults and small helpers shared by the ingestion scripts and their stages.
+
+Nothing here imports LlamaIndex, numpy or Chroma, so the command-line scripts
+can show these defaults in `--help` and the crawler can canonicalize URLs
+without loading the indexing stack.
+"""
+import posixpath
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# --- Global Configuration ---
+# The chunking defaults match the splitter that was used before (SentenceSplitter).
+DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_CHUNK_OVERLAP = 200
+# Fingerprints at most this many bits apart are near duplicates; 3 of 64 bits
+# is the usual threshold for web pages.
+DEFAULT_MAX_DISTANCE = 3
+# Query parameters that never change the content of a page.
+TRACKING_PARAMS = ("utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "gclid", "fbclid", "ref")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# --- End Global Configuration ---
+
+_INDEX_PAGES = ("index.html", "index.htm", "index.php")
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Returns one spelling for all the URL variants of a page.
+
+    Lowercases the scheme and host, drops default ports, credentials,
+    fragments, tracking parameters, duplicate slashes, `.`/`..` segments,
+    trailing `index.html` and trailing slashes, and sorts the query.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path)
+    if path:
+        path = posixpath.normpath(path)
+    if posixpath.basename(path) in _INDEX_PAGES:
+        path = posixpath.dirname(path)
+    path = path.rstrip("/") or "/"
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def estimate_tokens(text: str) -> int:
+    """A cheap token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
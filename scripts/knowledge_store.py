@@ -0,0 +1,427 @@
+"""
+The knowledge store: one Chroma client for the process, a registry of knowledge bases, and search across them.
+
+Every APM lives in its own `<name>_docs` collection, next to `core_knowledge`.
+Scripts get their client from `get_client` instead of opening their own: a
+local database in `./chroma_db` by default, another directory with
+`CHROMA_PATH=...`, or a Chroma server with `CHROMA_HOST=...` (and
+`CHROMA_PORT`). Lexical (BM25) indexes and compact collections' full
+vectors stay local either way, in directories derived from the Chroma
+location (`side_store_dir`); lexical indexes are built from the server's
+collections on first use.
+
+The ingestion scripts describe every collection they write in its metadata
+(source, embedding model, time of the last change, next to the version kept
+by `query_cache`), so `KnowledgeStore.knowledge_bases` can list them
+without a side registry that could drift from the data.
+
+`KnowledgeStore.search` answers one question from many knowledge bases: the
+query is embedded once, every collection is searched in parallel with the
+usual hybrid search, and the candidates are merged. As in a single
+collection, an identifier (`payment_method_id`, `EUR`) found in any lexical
+index is looked up by BM25 alone, everywhere. Scores from different
+collections are not comparable (BM25 statistics and fusion ranks are per
+collection), so the merged list fuses two rankings: every candidate's cosine
+similarity to the query, recomputed from its stored vector, and its rank
+within its own collection. Collections embedded with a different model than
+the query are skipped.
+
+    python scripts/knowledge_store.py --list
+    python scripts/knowledge_store.py --query "Which providers support recurring payments?"
+"""
+import argparse
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+
+import compact_storage
+from lexical_index import LexicalIndex, hybrid_search, is_identifier_query, reciprocal_rank_fusion, tokenize
+from query_cache import VERSION_KEY, QueryCache
+
+# --- Global Configuration ---
+DEFAULT_CHROMA_PATH = "./chroma_db"
+DEFAULT_CHROMA_PORT = 8000
+# Suffix the ingestion scripts give every knowledge base collection.
+COLLECTION_SUFFIX = "_docs"
+CORE_COLLECTION = "core_knowledge"
+# Collection metadata written by the ingestion scripts.
+SOURCE_KEY = "kb_source"
+EMBED_MODEL_KEY = "kb_embed_model"
+UPDATED_KEY = "kb_updated"
+# Collections searched at once.
+DEFAULT_SEARCH_WORKERS = 8
+# Candidates each collection contributes before the results are merged.
+DEFAULT_CANDIDATES_PER_COLLECTION = 10
+# --- End Global Configuration ---
+
+
+def _resolve_location(path: str | None, host: str | None, port: int | None) -> tuple:
+    """Fills unset Chroma options from CHROMA_HOST, CHROMA_PORT and CHROMA_PATH; returns (path, host, port)."""
+    host = host or os.environ.get("CHROMA_HOST")
+    if host:
+        return None, host, port or int(os.environ.get("CHROMA_PORT", DEFAULT_CHROMA_PORT))
+    return path or os.environ.get("CHROMA_PATH", DEFAULT_CHROMA_PATH), None, None
+
+
+def create_client(path: str | None = None, host: str | None = None, port: int | None = None):
+    """
+    Opens a Chroma client: a server if a host is given, a local database otherwise.
+
+    Unset arguments are read from CHROMA_HOST, CHROMA_PORT and CHROMA_PATH.
+    """
+    import chromadb
+
+    path, host, port = _resolve_location(path, host, port)
+    if host:
+        return chromadb.HttpClient(host=host, port=port)
+    return chromadb.PersistentClient(path=path)
+
+
+_default_client = None
+_default_options: dict = {}
+_default_client_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    """Replaces the shared client with one opened with the given `create_client` options."""
+    global _default_client, _default_options
+    with _default_client_lock:
+        _default_client = create_client(**kwargs)
+        _default_options = kwargs
+        return _default_client
+
+
+def get_client():
+    """Returns the shared Chroma client, opening it on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = create_client()
+        return _default_client
+
+
+def side_store_dir(kind: str, path: str | None = None, host: str | None = None, port: int | None = None) -> str:
+    """
+    Returns the directory of the local stores kept beside a Chroma database, e.g. its lexical indexes.
+
+    A local database's stores live next to its directory, so ./chroma_db
+    keeps ./lexical_index and /data/kb/chroma_db keeps /data/kb/lexical_index;
+    a server's live under ./<kind>/<host>_<port>. Without arguments, the
+    location of the shared client is used.
+
+    Args:
+        kind: The kind of store, which names the directory ("lexical_index").
+        path, host, port: A Chroma location, as for `create_client`.
+    """
+    if path is None and host is None and port is None:
+        path, host, port = (_default_options.get(key) for key in ("path", "host", "port"))
+    path, host, port = _resolve_location(path, host, port)
+    if host:
+        return os.path.join(kind, re.sub(r"[^A-Za-z0-9._-]", "_", f"{host}_{port}"))
+    return os.path.join(os.path.dirname(os.path.normpath(path)), kind)
+
+
+def collection_name(name: str) -> str:
+    """Returns the collection of a knowledge base (e.g., 'alma' -> 'alma_docs')."""
+    name = name.lower()
+    if name == CORE_COLLECTION or name.endswith(COLLECTION_SUFFIX):
+        return name
+    return f"{name}{COLLECTION_SUFFIX}"
+
+
+def knowledge_base_name(collection: str) -> str:
+    """Returns the knowledge base stored in a collection (e.g., 'alma_docs' -> 'alma')."""
+    return collection[: -len(COLLECTION_SUFFIX)] if collection.endswith(COLLECTION_SUFFIX) else collection
+
+
+def describe_collection(
+    chroma_collection,
+    source: str | None = None,
+    embed_model: str | None = None,
+    compact_dims: int | None = None,
+):
+    """Records where a collection's documents came from, which model embedded them and how they are stored."""
+    # modify() replaces the metadata, so the existing keys are carried over.
+    # Index settings (hnsw:*) cannot be changed after creation and are left out.
+    metadata = {
+        key: value
+        for key, value in (chroma_collection.metadata or {}).items()
+        if not key.startswith("hnsw:")
+    }
+    if source is not None:
+        metadata[SOURCE_KEY] = source
+    if embed_model is not None:
+        metadata[EMBED_MODEL_KEY] = embed_model
+    if compact_dims is not None:
+        metadata[compact_storage.COMPACT_DIMS_KEY] = compact_dims
+    metadata[UPDATED_KEY] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    chroma_collection.modify(metadata=metadata)
+
+
+@dataclass
+class KnowledgeBase:
+    """One entry of the registry."""
+
+    name: str
+    collection: str
+    chunks: int
+    version: int = 0
+    source: str | None = None
+    embed_model: str | None = None
+    updated: str | None = None
+    compact_dims: int | None = None
+
+
+@dataclass
+class FederatedHit:
+    """One result of a search across knowledge bases."""
+
+    knowledge_base: str
+    id: str
+    score: float
+    text: str
+    metadata: dict = field(default_factory=dict)
+
+
+class KnowledgeStore:
+    """The knowledge bases of one Chroma database, with a registry and federated search."""
+
+    def __init__(self, client=None):
+        """
+        Initializes the KnowledgeStore.
+
+        Args:
+            client: A Chroma client. Defaults to the shared one from `get_client`.
+        """
+        self.client = client or get_client()
+        self._lexical_indexes: dict[str, LexicalIndex] = {}
+        self._rescore_stores: dict[str, compact_storage.RescoreStore] = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str):
+        """Returns the Chroma collection of a knowledge base, wrapped for re-scoring if it is compact."""
+        chroma_collection = self.client.get_collection(collection_name(name))
+        if not (chroma_collection.metadata or {}).get(compact_storage.COMPACT_DIMS_KEY):
+            return chroma_collection
+        with self._lock:
+            store = self._rescore_stores.get(chroma_collection.name)
+            if store is None:
+                store = self._rescore_stores[chroma_collection.name] = compact_storage.RescoreStore(chroma_collection)
+        # The collection may have been rebuilt since the store was opened.
+        store.ensure_current(chroma_collection)
+        return compact_storage.wrap(chroma_collection, store)
+
+    def collection_names(self) -> list[str]:
+        names = []
+        for collection in self.client.list_collections():
+            # Older chromadb versions return Collection objects, newer ones names.
+            name = getattr(collection, "name", collection)
+            if name == CORE_COLLECTION or name.endswith(COLLECTION_SUFFIX):
+                names.append(name)
+        return sorted(names)
+
+    def knowledge_bases(self) -> list[KnowledgeBase]:
+        """Returns the registry: every knowledge base with its size, version and provenance."""
+        entries = []
+        for name in self.collection_names():
+            chroma_collection = self.client.get_collection(name)
+            metadata = chroma_collection.metadata or {}
+            entries.append(
+                KnowledgeBase(
+                    name=knowledge_base_name(name),
+                    collection=name,
+                    chunks=chroma_collection.count(),
+                    version=int(metadata.get(VERSION_KEY, 0)),
+                    source=metadata.get(SOURCE_KEY),
+                    embed_model=metadata.get(EMBED_MODEL_KEY),
+                    updated=metadata.get(UPDATED_KEY),
+                    compact_dims=metadata.get(compact_storage.COMPACT_DIMS_KEY),
+                )
+            )
+        return entries
+
+    def lexical_index(self, chroma_collection) -> LexicalIndex:
+        """Returns the collection's lexical index, kept open for later searches."""
+        with self._lock:
+            index = self._lexical_indexes.get(chroma_collection.name)
+            if index is None:
+                index = self._lexical_indexes[chroma_collection.name] = LexicalIndex(chroma_collection.name)
+        index.ensure_built(chroma_collection)
+        return index
+
+    def search(
+        self,
+        query: str,
+        embed_model,
+        names: list[str] | None = None,
+        top_n: int = 5,
+        mode: str = "hybrid",
+        cache: QueryCache | None = None,
+        candidates: int = DEFAULT_CANDIDATES_PER_COLLECTION,
+        workers: int = DEFAULT_SEARCH_WORKERS,
+    ) -> list[FederatedHit]:
+        """
+        Searches several knowledge bases at once and merges their results.
+
+        Args:
+            query: The query text.
+            embed_model: Embeds the query, once for all collections.
+            names: The knowledge bases to search. Defaults to all of them.
+            top_n: The number of merged hits to return.
+            mode: "hybrid", "vector" or "lexical".
+            cache: An optional QueryCache for the query embedding.
+            candidates: How many hits each collection contributes.
+            workers: How many collections are searched at once.
+
+        Returns:
+            The best hits across all searched knowledge bases.
+        """
+        model_name = getattr(embed_model, "model_name", None)
+        collections = []
+        for name in names or self.collection_names():
+            chroma_collection = self.collection(name)
+            recorded_model = (chroma_collection.metadata or {}).get(EMBED_MODEL_KEY)
+            if mode != "lexical" and model_name and recorded_model and recorded_model != model_name:
+                print(f"Skipping '{chroma_collection.name}': embedded with {recorded_model}, not {model_name}.")
+                continue
+            collections.append(chroma_collection)
+
+        if mode == "hybrid" and is_identifier_query(query):
+            # An exact match anywhere beats vector neighbours elsewhere.
+            terms = tokenize(query)
+            if any(self.lexical_index(c).has_term(term) for c in collections for term in terms):
+                mode = "lexical"
+
+        embedding = []
+        embedding_lock = threading.Lock()
+
+        def embed_query() -> list[float]:
+            # Called from every collection's search; the first call embeds.
+            with embedding_lock:
+                if not embedding:
+                    if cache is not None:
+                        embedding.append(cache.embed_query(embed_model, query))
+                    else:
+                        embedding.append(embed_model.get_query_embedding(query))
+                return embedding[0]
+
+        def search_collection(chroma_collection):
+            lexical_index = self.lexical_index(chroma_collection) if mode != "vector" else None
+            return hybrid_search(chroma_collection, lexical_index, query, candidates, embed_query, mode=mode)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(search_collection, collections))
+
+        hits = {}
+        by_collection_rank = []
+        for chroma_collection, collection_hits in zip(collections, results):
+            for rank, hit in enumerate(collection_hits):
+                key = (chroma_collection.name, hit.id)
+                hits[key] = hit
+                by_collection_rank.append((rank, -hit.score, key))
+        rankings = [[key for _, _, key in sorted(by_collection_rank)]]
+        if embedding:
+            rankings.append(self._rank_by_similarity(collections, results, embedding[0]))
+            if mode == "vector":
+                rankings = rankings[1:]
+
+        merged = []
+        for key, score in reciprocal_rank_fusion(rankings)[:top_n]:
+            hit = hits[key]
+            merged.append(FederatedHit(knowledge_base_name(key[0]), hit.id, score, hit.text, hit.metadata))
+        return merged
+
+    def _rank_by_similarity(self, collections, results, query_embedding: list[float]) -> list[tuple[str, str]]:
+        """Ranks all candidates by the cosine similarity of their stored vectors to the query."""
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        scored = []
+        for chroma_collection, collection_hits in zip(collections, results):
+            if not collection_hits:
+                continue
+            if isinstance(chroma_collection, compact_storage.CompactCollection):
+                # Chroma only holds the prefixes; score the full vectors.
+                similarities = chroma_collection.similarities([hit.id for hit in collection_hits], query_embedding)
+                scored.extend((score, (chroma_collection.name, node_id)) for node_id, score in similarities.items())
+                continue
+            page = chroma_collection.get(ids=[hit.id for hit in collection_hits], include=["embeddings"])
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1)
+            similarities = vectors @ query_vector / np.where(norms == 0, 1.0, norms)
+            scored.extend(
+                (float(similarity), (chroma_collection.name, node_id))
+                for node_id, similarity in zip(page["ids"], similarities)
+            )
+        return [key for _, key in sorted(scored, reverse=True)]
+
+    def close(self):
+        with self._lock:
+            for index in [*self._lexical_indexes.values(), *self._rescore_stores.values()]:
+                index.close()
+            self._lexical_indexes.clear()
+            self._rescore_stores.clear()
+
+
+def main():
+    """Main function to list the knowledge bases or search across them."""
+    parser = argparse.ArgumentParser(
+        description="List the knowledge bases, or search several of them at once.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument("--list", action="store_true", help="List every knowledge base with its metadata.")
+    parser.add_argument("--query", help="The question or text to search for.")
+    parser.add_argument("--names", nargs="*", default=None, help="Knowledge bases to search (default: all).")
+    parser.add_argument("--top_n", type=int, default=5, help="Number of results to return.")
+    parser.add_argument(
+        "--mode",
+        choices=["hybrid", "vector", "lexical"],
+        default="hybrid",
+        help="Fuse BM25 and vector search (default), or use only one of them.",
+    )
+    parser.add_argument("--chroma-path", help=f"Local Chroma directory (default: $CHROMA_PATH or {DEFAULT_CHROMA_PATH}).")
+    parser.add_argument("--chroma-host", help="Use the Chroma server on this host (default: $CHROMA_HOST).")
+    parser.add_argument("--chroma-port", type=int, help=f"Port of the Chroma server (default: {DEFAULT_CHROMA_PORT}).")
+    args = parser.parse_args()
+    if not args.list and not args.query:
+        parser.error("Pass --list, --query, or both.")
+
+    configure(path=args.chroma_path, host=args.chroma_host, port=args.chroma_port)
+    store = KnowledgeStore()
+
+    if args.list:
+        print(
+            f"{'knowledge base':<24} {'chunks':>8} {'version':>8} {'vectors':>8}  {'embedded with':<20} "
+            f"{'updated':<26} source"
+        )
+        for entry in store.knowledge_bases():
+            vectors = f"{entry.compact_dims}d" if entry.compact_dims else "full"
+            print(
+                f"{entry.name:<24} {entry.chunks:>8} {entry.version:>8} {vectors:>8}  {entry.embed_model or '-':<20} "
+                f"{entry.updated or '-':<26} {entry.source or '-'}"
+            )
+
+    if args.query:
+        embed_model = None
+        if args.mode != "lexical":
+            import models
+
+            embed_model = models.embedding_model()
+        hits = store.search(args.query, embed_model, names=args.names, top_n=args.top_n, mode=args.mode)
+        print(f"\n--- Top Results for \"{args.query}\" ---")
+        if not hits:
+            print("No results found.")
+        for i, hit in enumerate(hits):
+            print(f"\n--- Result {i+1}: {hit.knowledge_base} ---")
+            print(f"Source: {hit.metadata.get('url') or hit.metadata.get('file_name') or hit.id}")
+            print(f"Score: {hit.score:.4f}")
+            print(hit.text)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
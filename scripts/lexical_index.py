@@ -0,0 +1,371 @@
+"""
+A local BM25 index built alongside each Chroma collection, for hybrid search.
+
+Payment docs are full of exact tokens - field names (`payment_method_id`),
+error codes, currency codes - that dense embeddings rank poorly. Every chunk
+written to Chroma is also added to a compact inverted index (one SQLite file
+per collection in a lexical_index/ directory next to the Chroma database),
+and queries fuse the BM25 ranking with the vector ranking using reciprocal
+rank fusion. Each index records the ID of the Chroma collection it was
+built from and is rebuilt when that collection is replaced. The LlamaIndex
+retriever over both lives in `hybrid_retriever`, so this module and its
+command do not load LlamaIndex.
+
+A query that is a single identifier-like token (contains an underscore or a
+digit, or is a short all-caps code like EUR) is answered from the lexical
+index alone when it has matches, which skips the embedding round trip.
+
+The index can be rebuilt from an existing collection:
+
+    python scripts/lexical_index.py --name ppro
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Iterable
+
+if TYPE_CHECKING:
+    from llama_index.core.schema import BaseNode
+
+# --- Global Configuration ---
+# Directory name of the indexes, beside the Chroma database (see knowledge_store.side_store_dir).
+INDEX_DIR_NAME = "lexical_index"
+# Standard BM25 parameters.
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant; 60 is the value from the original paper.
+RRF_K = 60
+# How many candidates each ranking contributes before fusion.
+DEFAULT_CANDIDATES = 50
+_CHROMA_PAGE_SIZE = 5000
+# --- End Global Configuration ---
+
+# Keeps identifiers like payment_method_id, 3ds2 or ISO-4217 together.
+_TOKEN = re.compile(r"[a-z0-9_]+(?:[-.][a-z0-9_]+)*")
+_IDENTIFIER = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def is_identifier_query(query: str) -> bool:
+    """Returns True for single-token queries that look like a field name, code or currency."""
+    query = query.strip().strip("`'\"")
+    if not _IDENTIFIER.match(query):
+        return False
+    return "_" in query or any(char.isdigit() for char in query) or (query.isupper() and len(query) <= 5)
+
+
+class LexicalIndex:
+    """A BM25 inverted index over the chunks of one Chroma collection, stored in SQLite."""
+
+    def __init__(self, collection_name: str, index_dir: str | None = None):
+        """
+        Initializes the LexicalIndex.
+
+        Args:
+            collection_name: The Chroma collection the index mirrors.
+            index_dir: The directory where lexical indexes are kept. Defaults
+                to the one beside the shared Chroma client's database.
+        """
+        if index_dir is None:
+            import knowledge_store
+
+            index_dir = knowledge_store.side_store_dir(INDEX_DIR_NAME)
+        os.makedirs(index_dir, exist_ok=True)
+        self.collection_name = collection_name
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(index_dir, f"{collection_name}.sqlite3"), check_same_thread=False
+        )
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                node_id TEXT UNIQUE NOT NULL,
+                ref_doc_id TEXT,
+                length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_ref_doc ON chunks (ref_doc_id);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        self._db.commit()
+        self._stats = None
+
+    def __len__(self) -> int:
+        return self._collection_stats()[0]
+
+    @property
+    def collection_id(self) -> str | None:
+        """The ID of the Chroma collection the index was built from, if recorded."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'collection_id'").fetchone()
+            return row[0] if row else None
+
+    def _record_collection(self, chroma_collection):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('collection_id', ?)", (str(chroma_collection.id),))
+            self._db.commit()
+
+    def _collection_stats(self) -> tuple[int, float]:
+        """Returns (number of chunks, average chunk length), cached until the next write."""
+        with self._lock:
+            if self._stats is None:
+                count, total = self._db.execute("SELECT COUNT(*), TOTAL(length) FROM chunks").fetchone()
+                self._stats = (count, total / count if count else 0.0)
+            return self._stats
+
+    def _delete_chunks(self, where: str, params: Iterable):
+        self._db.execute(
+            f"DELETE FROM postings WHERE chunk IN (SELECT id FROM chunks WHERE {where})", params
+        )
+        self._db.execute(f"DELETE FROM chunks WHERE {where}", params)
+
+    def add_texts(self, node_ids: list[str], ref_doc_ids: list[str | None], texts: list[str]):
+        """Indexes chunks, replacing any that are already indexed under the same node ID."""
+        with self._lock:
+            for node_id, ref_doc_id, text in zip(node_ids, ref_doc_ids, texts):
+                tokens = tokenize(text)
+                self._delete_chunks("node_id = ?", (node_id,))
+                cursor = self._db.execute(
+                    "INSERT INTO chunks (node_id, ref_doc_id, length) VALUES (?, ?, ?)",
+                    (node_id, ref_doc_id, len(tokens)),
+                )
+                self._db.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    [(term, cursor.lastrowid, tf) for term, tf in Counter(tokens).items()],
+                )
+            self._db.commit()
+            self._stats = None
+
+    def add(self, nodes: list[BaseNode]):
+        """Indexes nodes as they are written to the vector store."""
+        from llama_index.core.schema import MetadataMode
+
+        self.add_texts(
+            [node.node_id for node in nodes],
+            [node.ref_doc_id for node in nodes],
+            [node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes],
+        )
+
+    def delete_documents(self, ref_doc_ids: list[str]):
+        """Removes every chunk belonging to the given source document IDs."""
+        with self._lock:
+            for i in range(0, len(ref_doc_ids), 500):
+                batch = ref_doc_ids[i:i + 500]
+                self._delete_chunks(f"ref_doc_id IN ({','.join('?' * len(batch))})", batch)
+            self._db.commit()
+            self._stats = None
+
+    def delete_nodes(self, node_ids: list[str]):
+        """Removes the chunks with the given node IDs."""
+        with self._lock:
+            for i in range(0, len(node_ids), 500):
+                batch = node_ids[i:i + 500]
+                self._delete_chunks(f"node_id IN ({','.join('?' * len(batch))})", batch)
+            self._db.commit()
+            self._stats = None
+
+    def reset(self):
+        with self._lock:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM chunks")
+            self._db.commit()
+            self._stats = None
+
+    def has_term(self, term: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM postings WHERE term = ? LIMIT 1", (term,)).fetchone() is not None
+
+    def search(self, query: str, top_k: int = DEFAULT_CANDIDATES) -> list[tuple[str, float]]:
+        """Returns up to `top_k` (node ID, BM25 score) pairs, best first."""
+        count, average_length = self._collection_stats()
+        if not count:
+            return []
+        scores: dict[str, float] = {}
+        with self._lock:
+            for term in set(tokenize(query)):
+                rows = self._db.execute(
+                    "SELECT c.node_id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.chunk"
+                    " WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+                for node_id, tf, length in rows:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (average_length or 1))
+                    scores[node_id] = scores.get(node_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def rebuild_from(self, chroma_collection):
+        """Rebuilds the index from the chunks already stored in a Chroma collection."""
+        self.reset()
+        self._record_collection(chroma_collection)
+        offset = 0
+        while True:
+            page = chroma_collection.get(
+                include=["documents", "metadatas"], limit=_CHROMA_PAGE_SIZE, offset=offset
+            )
+            ids = page.get("ids") or []
+            self.add_texts(
+                ids,
+                [(metadata or {}).get("ref_doc_id") for metadata in page["metadatas"]],
+                [text or "" for text in page["documents"]],
+            )
+            if len(ids) < _CHROMA_PAGE_SIZE:
+                return
+            offset += _CHROMA_PAGE_SIZE
+
+    def ensure_built(self, chroma_collection):
+        """
+        Builds the index from the collection if the collection predates it.
+
+        An index built from another collection of the same name (another
+        database, or a collection that was since recreated) is rebuilt.
+        """
+        current = self.collection_id == str(chroma_collection.id)
+        if current and (len(self) or not chroma_collection.count()):
+            return
+        if not len(self) and not chroma_collection.count():
+            self._record_collection(chroma_collection)
+            return
+        if current or not len(self):
+            print(f"Building the lexical index for '{self.collection_name}' from the stored chunks...")
+        else:
+            print(f"The lexical index for '{self.collection_name}' was built from another collection; rebuilding...")
+        self.rebuild_from(chroma_collection)
+        print(f"✅ Lexical index built ({len(self)} chunks).")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class IndexingSink:
+    """A vector store wrapper that also adds every written node to a LexicalIndex."""
+
+    def __init__(self, vector_store, lexical_index: LexicalIndex):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+
+    def add(self, nodes: list[BaseNode], **kwargs) -> list[str]:
+        ids = self.vector_store.add(nodes, **kwargs)
+        self.lexical_index.add(nodes)
+        return ids
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """Fuses several rankings of IDs into one, scoring each ID by the sum of 1 / (k + rank)."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+@dataclass
+class SearchHit:
+    """One result of a hybrid search."""
+
+    id: str
+    score: float
+    text: str
+    metadata: dict = field(default_factory=dict)
+
+
+def hybrid_search(
+    chroma_collection,
+    lexical_index: LexicalIndex,
+    query: str,
+    top_n: int,
+    embed_query: Callable[[], list[float]],
+    mode: str = "hybrid",
+    candidates: int = DEFAULT_CANDIDATES,
+) -> list[SearchHit]:
+    """
+    Searches a collection by BM25, by vector similarity, or by both fused.
+
+    Args:
+        chroma_collection: The Chroma collection to search.
+        lexical_index: The collection's LexicalIndex.
+        query: The query text.
+        top_n: The number of hits to return.
+        embed_query: Returns the query embedding. Only called when a vector
+            search is actually needed.
+        mode: "hybrid", "vector" or "lexical".
+        candidates: How many candidates each ranking contributes to the fusion.
+
+    Returns:
+        The best hits, with their fused (or single-ranking) scores.
+    """
+    lexical = lexical_index.search(query, candidates) if mode != "vector" else []
+    if mode == "lexical" or (mode == "hybrid" and lexical and is_identifier_query(query)):
+        ranked = lexical[:top_n]
+        found = {}
+    else:
+        results = chroma_collection.query(
+            query_embeddings=[embed_query()],
+            n_results=candidates if mode == "hybrid" else top_n,
+            include=["documents", "metadatas", "distances"],
+        )
+        found = {
+            node_id: (text, metadata or {}, distance)
+            for node_id, text, metadata, distance in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        }
+        if mode == "vector":
+            ranked = [(node_id, math.exp(-found[node_id][2])) for node_id in results["ids"][0]]
+        else:
+            ranked = reciprocal_rank_fusion(
+                [[node_id for node_id, _ in lexical], results["ids"][0]]
+            )[:top_n]
+
+    missing = [node_id for node_id, _ in ranked if node_id not in found]
+    if missing:
+        page = chroma_collection.get(ids=missing, include=["documents", "metadatas"])
+        for node_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            found[node_id] = (text, metadata or {}, None)
+    return [
+        SearchHit(id=node_id, score=score, text=found[node_id][0] or "", metadata=found[node_id][1])
+        for node_id, score in ranked
+        if node_id in found
+    ]
+
+
+def main():
+    """Main function to rebuild the lexical index of a knowledge base."""
+    import knowledge_store
+
+    parser = argparse.ArgumentParser(description="Rebuild the lexical (BM25) index of a knowledge base.")
+    parser.add_argument("--name", required=True, help="The unique name of the knowledge base (e.g., 'alma').")
+    args = parser.parse_args()
+
+    collection_name = knowledge_store.collection_name(args.name)
+    lexical_index = LexicalIndex(collection_name)
+    print(f"Rebuilding the lexical index for '{collection_name}'...")
+    lexical_index.rebuild_from(knowledge_store.get_client().get_collection(collection_name))
+    print(f"🎉 Indexed {len(lexical_index)} chunk(s).")
+    lexical_index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+The Google Cloud models used by the scripts, imported and authenticated only when one is built.
+
+The Vertex AI and Gemini SDKs take seconds to import, so nothing here imports
+them up front: `--help`, a usage error, a lexical-only query or a cached
+answer never pay for them.
+"""
+
+# --- Global Configuration ---
+EMBED_MODEL_NAME = "text-embedding-004"
+LLM_MODEL_NAME = "models/gemini-pro"
+DEFAULT_LOCATION = "us-central1"
+# --- End Global Configuration ---
+
+
+def embedding_model(embed_batch_size: int | None = None):
+    """
+    Returns Vertex AI text-embedding-004 behind the local embedding cache.
+
+    Args:
+        embed_batch_size: Texts per embedding request; the model's default if None.
+    """
+    import google.auth
+    from llama_index.embeddings.vertex import VertexTextEmbedding
+
+    from embedding_cache import with_cache
+
+    credentials, project_id = google.auth.default()
+    options = {"embed_batch_size": embed_batch_size} if embed_batch_size else {}
+    return with_cache(
+        VertexTextEmbedding(model_name=EMBED_MODEL_NAME, project=project_id, credentials=credentials, **options)
+    )
+
+
+def llm(location: str = DEFAULT_LOCATION):
+    """
+    Returns the Gemini model used to write answers, served through Vertex AI.
+
+    Args:
+        location: The Google Cloud location/region.
+    """
+    import google.auth
+    import vertexai
+    from llama_index.llms.google_genai import GoogleGenAI
+
+    credentials, project_id = google.auth.default()
+    vertexai.init(project=project_id, location=location, credentials=credentials)
+    return GoogleGenAI(model_name=LLM_MODEL_NAME, vertex=vertexai)
@@ -0,0 +1,435 @@
+"""
+Parallel PDF ingestion with `unstructured` across a process pool.
+
+The `hi_res` strategy runs layout detection and Tesseract OCR, which keeps a
+single core busy per file. To use every core, each PDF is split into page
+ranges, and the ranges of all listed PDFs (directories are expanded to the
+PDFs they contain) are partitioned in parallel in worker processes. Results
+are merged back in page order, producing one Document per page with
+`file_path` and `page_number` metadata, and the time spent on each file is
+reported.
+
+Two shortcuts keep repeat runs cheap. Before partitioning its pages, each
+worker reads their embedded text layer with pypdf: pages that already carry
+enough text are partitioned with the fast strategy, and only image or scanned
+pages, and text pages that look like they hold a table (whose structure only
+hi_res recovers), go through hi_res. And every page's elements are cached on
+disk under a hash of the page's content, so unchanged pages are never
+partitioned twice.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import telemetry
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+# --- Global Configuration ---
+# Pages per worker task. Smaller ranges balance load better across cores;
+# larger ones pay the per-task model-loading overhead less often.
+DEFAULT_PAGES_PER_TASK = 10
+# "auto" picks "fast" or "hi_res" per page based on its text layer.
+DEFAULT_STRATEGY = "auto"
+DEFAULT_OCR_CACHE_DIR = ".ocr_cache"
+# A page whose text layer has at least this many non-space characters is
+# parsed from that layer instead of being OCR'd.
+MIN_TEXT_LAYER_CHARS = 200
+# A text-layer page with at least this many lines of three or more
+# space-separated columns is treated as holding a table.
+MIN_TABLE_ROWS = 3
+# Bump when the stored element format, or how "auto" picks a page's
+# strategy, changes, to invalidate old entries.
+_CACHE_VERSION = 2
+# --- End Global Configuration ---
+
+_COLUMN_GAP = re.compile(r"\S {3,}(?=\S)")
+# Dot leaders of a table of contents, which are laid out like columns too.
+_DOT_LEADER = re.compile(r"\.\s+\.\s+\.")
+
+
+class OcrCache:
+    """Partitioned page elements on disk, keyed by page content hash and strategy."""
+
+    def __init__(self, cache_dir: str = DEFAULT_OCR_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "pages.sqlite3"), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, elements TEXT NOT NULL)")
+        self._db.commit()
+
+    def get(self, key: str) -> list[dict] | None:
+        with self._lock:
+            row = self._db.execute("SELECT elements FROM pages WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, items: dict[str, list[dict]]):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?)",
+                [(key, json.dumps(elements)) for key, elements in items.items()],
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+@dataclass
+class PagePlan:
+    """How one page will be processed: its cache key, and either cached elements or a strategy."""
+
+    page_number: int
+    cache_key: str
+    strategy: str | None = None
+    elements: list[dict] | None = None
+
+
+def page_fingerprint(page) -> str:
+    """Hashes a pypdf page's content stream and the raw data of its images and forms."""
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    resources = page.get("/Resources") or {}
+    xobjects = resources.get("/XObject") or {}
+    for name in sorted(xobjects):
+        digest.update(name.encode("utf-8"))
+        try:
+            digest.update(xobjects[name].get_object().get_data())
+        except Exception:
+            # Undecodable streams still contribute their name; the content
+            # stream that places them is already part of the hash.
+            pass
+    return digest.hexdigest()
+
+
+def page_fingerprints(path: str) -> list[str]:
+    """Returns the fingerprint of every page of a PDF. Runs inside a worker process."""
+    from pypdf import PdfReader
+
+    return [page_fingerprint(page) for page in PdfReader(path).pages]
+
+
+def has_text_layer(text: str) -> bool:
+    """Returns True if a page's extracted text is enough to skip OCR."""
+    return sum(1 for char in text if not char.isspace()) >= MIN_TEXT_LAYER_CHARS
+
+
+def has_table(layout_text: str) -> bool:
+    """
+    Returns True if a page's text layer looks like it holds a table.
+
+    In text laid out the way it is positioned on the page, a table shows up
+    as several lines split into three or more columns by wide gaps.
+    """
+    rows = sum(
+        1
+        for line in layout_text.splitlines()
+        if len(_COLUMN_GAP.findall(line.strip())) >= 2 and not _DOT_LEADER.search(line)
+    )
+    return rows >= MIN_TABLE_ROWS
+
+
+def auto_strategy(page) -> str:
+    """
+    Picks the strategy "auto" uses for a page, extracting its text layer once.
+
+    Pages with a usable text layer are read with "fast", unless they hold a
+    table: "fast" ignores `infer_table_structure`, so tables would lose their
+    rows and columns. Those pages, and pages without a text layer, use "hi_res".
+    """
+    try:
+        text = page.extract_text(extraction_mode="layout") or ""
+    except Exception:
+        return "hi_res"
+    return "fast" if has_text_layer(text) and not has_table(text) else "hi_res"
+
+
+def plan_pages(
+    fingerprints: list[str], strategy: str = DEFAULT_STRATEGY, cache: OcrCache | None = None
+) -> list[PagePlan]:
+    """
+    Looks every page of a PDF up in the cache.
+
+    Pages are keyed by their content hash (see `page_fingerprints`) and the
+    requested strategy. Uncached pages keep the requested strategy; "auto" is
+    resolved per page by the worker that partitions it, so the text layer is
+    only inspected for pages that are not cached, and in parallel.
+    """
+    plans = []
+    for index, fingerprint in enumerate(fingerprints):
+        plan = PagePlan(page_number=index + 1, cache_key=f"v{_CACHE_VERSION}:{strategy}:{fingerprint}")
+        plan.elements = cache.get(plan.cache_key) if cache else None
+        if plan.elements is None:
+            plan.strategy = strategy
+        plans.append(plan)
+    return plans
+
+
+def expand_pdf_paths(paths: Iterable[str]) -> list[str]:
+    """Expands directories into the PDFs they contain, keeping the given order and dropping repeats."""
+    pdf_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                pdf_paths.extend(
+                    os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf")
+                )
+        else:
+            pdf_paths.append(path)
+
+    unique_paths, seen = [], set()
+    for path in pdf_paths:
+        real_path = os.path.realpath(path)
+        if real_path not in seen:
+            seen.add(real_path)
+            unique_paths.append(path)
+    return unique_paths
+
+
+def plan_tasks(plans: list[PagePlan], pages_per_task: int) -> list[tuple[int, int, str]]:
+    """
+    Groups pages into worker tasks.
+
+    Each task is a run of consecutive pages that share a strategy, at most
+    `pages_per_task` long, returned as an inclusive (first, last, strategy).
+    """
+    tasks = []
+    for plan in plans:
+        if tasks:
+            first, last, strategy = tasks[-1]
+            if (
+                plan.strategy == strategy
+                and plan.page_number == last + 1
+                and last - first + 1 < pages_per_task
+            ):
+                tasks[-1] = (first, plan.page_number, strategy)
+                continue
+        tasks.append((plan.page_number, plan.page_number, plan.strategy))
+    return tasks
+
+
+def _write_page_range(path: str, first: int, last: int) -> str:
+    """Writes pages first..last of a PDF to a temporary file and returns its path."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(path)
+    writer = PdfWriter()
+    for index in range(first - 1, last):
+        writer.add_page(reader.pages[index])
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        writer.write(f)
+        return f.name
+
+
+def _strategy_runs(path: str, first: int, last: int, strategy: str) -> list[tuple[int, int, str]]:
+    """Splits pages first..last into runs of one strategy, resolving "auto" per page."""
+    if strategy != "auto":
+        return [(first, last, strategy)]
+    from pypdf import PdfReader
+
+    pages = PdfReader(path).pages
+    runs = []
+    for page_number in range(first, last + 1):
+        page_strategy = auto_strategy(pages[page_number - 1])
+        if runs and runs[-1][2] == page_strategy:
+            runs[-1] = (runs[-1][0], page_number, page_strategy)
+        else:
+            runs.append((page_number, page_number, page_strategy))
+    return runs
+
+
+def _partition(path: str, first: int, last: int, num_pages: int, strategy: str) -> list:
+    from unstructured.partition.pdf import partition_pdf
+
+    whole_file = first == 1 and last == num_pages
+    filename = path if whole_file else _write_page_range(path, first, last)
+    try:
+        return partition_pdf(
+            filename=filename,
+            strategy=strategy,
+            infer_table_structure=True,
+            starting_page_number=first,
+        )
+    finally:
+        if not whole_file:
+            os.remove(filename)
+
+
+def partition_page_range(path: str, first: int, last: int, num_pages: int, strategy: str) -> dict:
+    """
+    Partitions one page range of a PDF. Runs inside a worker process.
+
+    With "auto", each page's strategy is picked from its text layer here, in
+    the worker, and each run of pages sharing a strategy is partitioned
+    together.
+
+    Returns:
+        A picklable dict with the pages' elements keyed by page number, the
+        strategy used for each page, and the start, seconds and process ID
+        of the work for the run's telemetry.
+    """
+    start = time.perf_counter()
+    pages = {page: [] for page in range(first, last + 1)}
+    strategies = {}
+    for run_first, run_last, run_strategy in _strategy_runs(path, first, last, strategy):
+        strategies.update(dict.fromkeys(range(run_first, run_last + 1), run_strategy))
+        for element in _partition(path, run_first, run_last, num_pages, run_strategy):
+            page = element.metadata.page_number or run_first
+            pages.setdefault(page, []).append(
+                {
+                    "type": element.category,
+                    "text": element.text,
+                    "html": getattr(element.metadata, "text_as_html", None),
+                }
+            )
+    return {
+        "pages": pages,
+        "strategies": strategies,
+        "start": start,
+        "seconds": time.perf_counter() - start,
+        "pid": os.getpid(),
+    }
+
+
+def page_document(path: str, page_number: int, elements: list[dict]) -> Document:
+    """
+    Builds the Document for one PDF page from its partitioned elements.
+
+    Running headers, footers and page numbers are dropped, and tables are kept
+    as pipe rows so the chunker never splits them mid-row.
+    """
+    from llama_index.core import Document
+
+    from chunking import pdf_element_text
+
+    text = "\n\n".join(filter(None, map(pdf_element_text, elements)))
+    return Document(
+        text=text,
+        extra_info={
+            "file_path": path,
+            "file_name": os.path.basename(path),
+            "page_number": page_number,
+        },
+    )
+
+
+def load_pdf_documents(
+    paths: Iterable[str],
+    workers: int | None = None,
+    pages_per_task: int = DEFAULT_PAGES_PER_TASK,
+    strategy: str = DEFAULT_STRATEGY,
+    cache_dir: str | None = DEFAULT_OCR_CACHE_DIR,
+) -> Iterator[Document]:
+    """
+    Partitions PDFs in parallel and yields one Document per page.
+
+    Each file is fingerprinted in the process pool and its cached pages are
+    read from disk. Every remaining page range of every file is queued on the
+    same pool, and as soon as all ranges of a file are done, its pages are
+    yielded in page order.
+
+    Args:
+        paths: PDF files and/or directories containing PDFs.
+        workers: The number of worker processes. Defaults to the CPU count.
+        pages_per_task: How many pages each worker task handles.
+        strategy: "auto" to choose per page, or an `unstructured` strategy for all pages.
+        cache_dir: Where partitioned pages are cached. None disables the cache.
+
+    Yields:
+        LlamaIndex Document objects, one per non-empty page.
+    """
+    pdf_paths = expand_pdf_paths(paths)
+    if not pdf_paths:
+        return
+    cache = OcrCache(cache_dir) if cache_dir else None
+
+    print(f"Reading {len(pdf_paths)} PDF file(s) with {workers or os.cpu_count()} worker process(es)...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        remaining = {}
+        started = {}
+        results: dict[str, dict[int, list[dict]]] = {}
+        cache_keys: dict[str, dict[int, str]] = {}
+        counts: dict[str, dict[str, int]] = {}
+        worker_seconds = {path: 0.0 for path in pdf_paths}
+        # Files are fingerprinted in the pool too, and each file's page ranges
+        # are queued as soon as its fingerprints are back.
+        fingerprinting = {}
+        for path in pdf_paths:
+            started[path] = time.perf_counter()
+            fingerprinting[executor.submit(page_fingerprints, path)] = path
+        partitioning = {}
+
+        def plan_file(path: str, fingerprints: list[str]) -> bool:
+            """Queues a file's uncached page ranges; returns True if there are none."""
+            plans = plan_pages(fingerprints, strategy, cache)
+            results[path] = {plan.page_number: plan.elements for plan in plans if plan.elements is not None}
+            cache_keys[path] = {plan.page_number: plan.cache_key for plan in plans}
+            counts[path] = {"cached": len(results[path]), "fast": 0, "hi_res": 0, "ocr_only": 0}
+            tasks = plan_tasks([plan for plan in plans if plan.elements is None], pages_per_task)
+            remaining[path] = len(tasks)
+            for first, last, task_strategy in tasks:
+                future = executor.submit(
+                    partition_page_range, path, first, last, len(plans), task_strategy
+                )
+                partitioning[future] = path
+            return not tasks
+
+        def merge(path: str, result: dict) -> bool:
+            """Records a finished page range; returns True once the file is complete."""
+            results[path].update(result["pages"])
+            worker_seconds[path] += result["seconds"]
+            for page_strategy in result["strategies"].values():
+                counts[path][page_strategy] = counts[path].get(page_strategy, 0) + 1
+            # perf_counter is a system-wide monotonic clock, so worker
+            # timestamps line up with the main process in the trace.
+            chars = sum(len(e["text"] or "") for elements in result["pages"].values() for e in elements)
+            telemetry.record(
+                "pdf_partition", result["seconds"], bytes=chars, start=result["start"], thread=result["pid"]
+            )
+            if cache:
+                cache.put_many({cache_keys[path][page]: elements for page, elements in result["pages"].items()})
+            remaining[path] -= 1
+            return not remaining[path]
+
+        def finished_files():
+            while fingerprinting or partitioning:
+                done, _ = wait([*fingerprinting, *partitioning], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fingerprinting:
+                        path = fingerprinting.pop(future)
+                        if plan_file(path, future.result()):
+                            yield path
+                    else:
+                        path = partitioning.pop(future)
+                        if merge(path, future.result()):
+                            yield path
+
+        for path in finished_files():
+            pages = results.pop(path)
+            elapsed = time.perf_counter() - started[path]
+            count = counts[path]
+            print(
+                f"✅ {path}: {len(pages)} page(s) in {elapsed:.1f}s "
+                f"({worker_seconds[path]:.1f}s of worker time; {count['cached']} cached, "
+                f"{count['fast']} from text layer, {count['hi_res']} hi_res, {count['ocr_only']} ocr_only)"
+            )
+            for page_number in sorted(pages):
+                if any(element["text"] for element in pages[page_number]):
+                    yield page_document(path, page_number, pages[page_number])
+
+    if cache:
+        cache.close()
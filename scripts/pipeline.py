@@ -0,0 +1,187 @@
+"""
+Streaming helpers for the ingestion pipeline.
+
+The ingestion scripts run as a chain of generators (scrape -> chunk ->
+embed -> write) instead of building one big list of documents first.
+`buffered` decouples two stages with a bounded queue, so the producer keeps
+working while the consumer is busy but can never run far ahead of it, and
+`merged` runs several sources side by side the same way.
+`Checkpoint` records which source documents have been fully written to
+Chroma, so an interrupted run can resume where it stopped. `LastRun`
+remembers when the last successful run of a collection started, so sources
+that report modification times can skip what has not changed since.
+"""
+import os
+import queue
+import re
+import threading
+from datetime import datetime
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# --- Global Configuration ---
+DEFAULT_STATE_DIR = ".ingest_state"
+# How many documents may wait between two pipeline stages by default.
+DEFAULT_BUFFER_SIZE = 64
+# --- End Global Configuration ---
+
+_DONE = object()
+
+
+def buffered(items: Iterable[T], maxsize: int = DEFAULT_BUFFER_SIZE) -> Iterator[T]:
+    """
+    Runs an iterable in a background thread and yields its items through a bounded queue.
+
+    The producer blocks once `maxsize` items are waiting, which keeps memory
+    bounded. Exceptions raised by the producer are re-raised in the consumer.
+    If the consumer stops early, the producer stops at its next item and
+    closes the iterable.
+    """
+    return merged(items, maxsize=maxsize)
+
+
+def merged(*sources: Iterable[T], maxsize: int = DEFAULT_BUFFER_SIZE) -> Iterator[T]:
+    """
+    Runs several iterables at once, each in its own thread, and yields their items as they arrive.
+
+    Items from one source keep their order; items from different sources
+    are interleaved. At most `maxsize` items wait at a time, the first
+    exception raised by a source is re-raised in the consumer, and the
+    sources are stopped and closed if the consumer stops early.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        """Waits for room in the buffer; returns False once the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(source: Iterable[T]):
+        iterator = None
+        try:
+            iterator = iter(source)
+            for item in iterator:
+                if not put(item):
+                    break
+            else:
+                put(_DONE)
+        except BaseException as e:
+            put(e)
+        finally:
+            # Runs the source's own cleanup, e.g. a generator's `finally`.
+            if stop.is_set() and hasattr(iterator, "close"):
+                iterator.close()
+
+    for source in sources:
+        threading.Thread(target=produce, args=(source,), daemon=True).start()
+    try:
+        remaining = len(sources)
+        while remaining:
+            item = buffer.get()
+            if item is _DONE:
+                remaining -= 1
+                continue
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _state_path(collection_name: str, state_dir: str, suffix: str) -> str:
+    safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", collection_name)
+    return os.path.join(state_dir, f"{safe_name}.{suffix}")
+
+
+class Checkpoint:
+    """
+    An append-only log of source document IDs that are fully stored in a collection.
+
+    Each ID is flushed to disk as soon as all of its chunks have been written,
+    so the log survives a crash at any point.
+    """
+
+    def __init__(self, collection_name: str, state_dir: str = DEFAULT_STATE_DIR):
+        """
+        Initializes the Checkpoint.
+
+        Args:
+            collection_name: The Chroma collection the checkpoint belongs to.
+            state_dir: The directory where checkpoint files are kept.
+        """
+        self.path = _state_path(collection_name, state_dir, "checkpoint")
+        self._file = None
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> set[str]:
+        """Returns the IDs recorded by a previous, interrupted run."""
+        if not self.exists():
+            return set()
+        with open(self.path, encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def reset(self) -> set[str]:
+        """Discards any previous progress and returns the (empty) set of done IDs."""
+        self.clear()
+        return set()
+
+    def mark_done(self, doc_id: str):
+        """Records that every chunk of a source document has been written."""
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(f"{doc_id}\n")
+            self._file.flush()
+
+    def clear(self):
+        """Removes the checkpoint, typically after a run completes successfully."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class LastRun:
+    """The start time of the last run that finished writing a collection."""
+
+    def __init__(self, collection_name: str, state_dir: str = DEFAULT_STATE_DIR):
+        """
+        Initializes the LastRun.
+
+        Args:
+            collection_name: The Chroma collection the record belongs to.
+            state_dir: The directory where state files are kept.
+        """
+        self.path = _state_path(collection_name, state_dir, "last_run")
+
+    def load(self) -> datetime | None:
+        """Returns when the last successful run started, or None if there was none."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return datetime.fromisoformat(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def record(self, started: datetime):
+        """
+        Records a successful run.
+
+        The start time is stored rather than the end time, so anything that
+        changed while the run was in progress is picked up by the next one.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(started.isoformat())
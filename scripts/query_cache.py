@@ -0,0 +1,213 @@
+"""
+A two-level cache for repeated discovery questions.
+
+Analysts ask the same questions ("supported currencies", "refund flow")
+against many knowledge bases. The first level maps the embedding model and
+the normalized query text to the query's embedding and is shared by every
+collection, so a question is embedded once per model. The second level maps
+(collection version, retrieval settings, query) to the retrieved sources
+and the final answer, so asking the same question of an unchanged
+collection, retrieved the same way, skips retrieval and the LLM entirely.
+
+A collection's version combines its Chroma ID with a counter that ingestion
+bumps in the collection's metadata, so re-ingesting (or recreating) a
+collection automatically invalidates its cached answers. Entries also
+expire after a TTL, and the least recently used ones are evicted once a
+level holds more than `max_entries`.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# --- Global Configuration ---
+DEFAULT_CACHE_DIR = ".query_cache"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+# Collection metadata key holding the ingestion counter.
+VERSION_KEY = "kb_version"
+# --- End Global Configuration ---
+
+
+def normalize_query(text: str) -> str:
+    """Case-folds a query and collapses whitespace and trailing punctuation."""
+    return " ".join(text.casefold().split()).rstrip("?!. ")
+
+
+def collection_version(chroma_collection) -> str:
+    """Returns a version string that changes whenever the collection is re-ingested or recreated."""
+    metadata = chroma_collection.metadata or {}
+    return f"{chroma_collection.id}:{metadata.get(VERSION_KEY, 0)}"
+
+
+def retrieval_settings(mode: str, similarity_top_k: int) -> str:
+    """Describes how an answer's sources were retrieved; answers are only reused for the same settings."""
+    return f"{mode}:{similarity_top_k}"
+
+
+def bump_collection_version(chroma_collection):
+    """Marks a collection as changed, invalidating answers cached for its previous version."""
+    # modify() replaces the metadata, so the existing keys are carried over.
+    # Index settings (hnsw:*) cannot be changed after creation and are left out.
+    metadata = {
+        key: value
+        for key, value in (chroma_collection.metadata or {}).items()
+        if not key.startswith("hnsw:")
+    }
+    metadata[VERSION_KEY] = int(metadata.get(VERSION_KEY, 0)) + 1
+    chroma_collection.modify(metadata=metadata)
+
+
+class QueryCache:
+    """Query embeddings and answers on disk, with TTL expiry and LRU eviction."""
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        Initializes the QueryCache.
+
+        Args:
+            cache_dir: The directory where the cache database is kept.
+            ttl_seconds: How long an entry stays valid after it is stored.
+            max_entries: The maximum number of entries per level.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "queries.sqlite3"), check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                model TEXT NOT NULL,
+                query TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, query)
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                version TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                query TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (version, settings, query)
+            );
+            """
+        )
+        self._db.commit()
+        self.embedding_hits = 0
+        self.answer_hits = 0
+        self.lookups = 0
+
+    def _get(self, table: str, where: str, params: tuple, column: str):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {column}, created FROM {table} WHERE {where}", params
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._db.execute(f"DELETE FROM {table} WHERE {where}", params)
+                self._db.commit()
+                return None
+            self._db.execute(f"UPDATE {table} SET last_access = ? WHERE {where}", (now, *params))
+            self._db.commit()
+            return row[0]
+
+    def _put(self, table: str, columns: tuple, values: tuple):
+        now = time.time()
+        placeholders = ", ".join("?" * (len(values) + 2))
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}, created, last_access)"
+                f" VALUES ({placeholders})",
+                (*values, now, now),
+            )
+            (count,) = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    f"DELETE FROM {table} WHERE rowid IN"
+                    f" (SELECT rowid FROM {table} ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._db.commit()
+
+    def get_embedding(self, model: str, query: str) -> list[float] | None:
+        """Returns the embedding a model produced for a query, or None."""
+        blob = self._get("query_embeddings", "model = ? AND query = ?", (model, normalize_query(query)), "vector")
+        if blob is None:
+            return None
+        self.embedding_hits += 1
+        return np.frombuffer(blob, dtype=np.float32).tolist()
+
+    def put_embedding(self, model: str, query: str, embedding: list[float]):
+        vector = np.asarray(embedding, dtype=np.float32).tobytes()
+        self._put("query_embeddings", ("model", "query", "vector"), (model, normalize_query(query), vector))
+
+    def embed_query(self, embed_model, query: str) -> list[float]:
+        """Returns a query's embedding from the cache, embedding and storing it on a miss."""
+        embedding = self.get_embedding(embed_model.model_name, query)
+        if embedding is None:
+            embedding = embed_model.get_query_embedding(query)
+            self.put_embedding(embed_model.model_name, query, embedding)
+        return embedding
+
+    def embed_queries(self, embed_model, queries: list[str]) -> list[list[float]]:
+        """Returns embeddings for several queries, embedding all cache misses in one batch."""
+        model = embed_model.model_name
+        embeddings = [self.get_embedding(model, query) for query in queries]
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        if missing:
+            from embedding_cache import embed_query_batch
+
+            computed = dict(zip(missing, embed_query_batch(embed_model, missing)))
+            for query, embedding in computed.items():
+                self.put_embedding(model, query, embedding)
+            embeddings = [computed.get(query, embedding) for query, embedding in zip(queries, embeddings)]
+        return embeddings
+
+    def get_answer(self, version: str, settings: str, query: str) -> dict | None:
+        """
+        Returns the answer stored for a query, or None.
+
+        Args:
+            version: The collection's version (see collection_version).
+            settings: How the sources are retrieved (see retrieval_settings).
+            query: The question.
+        """
+        self.lookups += 1
+        key = (version, settings, normalize_query(query))
+        payload = self._get("answers", "version = ? AND settings = ? AND query = ?", key, "payload")
+        if payload is None:
+            return None
+        self.answer_hits += 1
+        return json.loads(payload)
+
+    def put_answer(self, version: str, settings: str, query: str, answer: dict):
+        self._put(
+            "answers",
+            ("version", "settings", "query", "payload"),
+            (version, settings, normalize_query(query), json.dumps(answer)),
+        )
+
+    def summary(self) -> str:
+        lookups = self.lookups or 1
+        return (
+            f"Query cache: {self.answer_hits}/{self.lookups} answer(s) reused "
+            f"({self.answer_hits / lookups:.0%}), {self.embedding_hits} query embedding(s) reused"
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
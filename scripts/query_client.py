@@ -0,0 +1,79 @@
+"""
+A thin client for query_server.py.
+
+It only imports `requests`, so asking a question costs one HTTP round trip
+to the warm server instead of a full model and Chroma cold start.
+"""
+import argparse
+
+import requests
+
+# --- Global Configuration ---
+DEFAULT_SERVER = "http://127.0.0.1:8765"
+# Answer synthesis can take a while for long contexts.
+DEFAULT_TIMEOUT = 300
+# --- End Global Configuration ---
+
+
+def post(server: str, path: str, payload: dict) -> dict:
+    """Sends a JSON request to the query server and returns its JSON reply."""
+    response = requests.post(f"{server.rstrip('/')}{path}", json=payload, timeout=DEFAULT_TIMEOUT)
+    if response.status_code != 200:
+        try:
+            message = response.json().get("error", response.text)
+        except ValueError:
+            message = response.text
+        raise RuntimeError(f"Query server returned {response.status_code}: {message}")
+    return response.json()
+
+
+def format_timings(timings: dict[str, float]) -> str:
+    return ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items())
+
+
+def main():
+    """Main function to parse arguments and send a query to the server."""
+    parser = argparse.ArgumentParser(description="Ask a running query server about a knowledge base.")
+    parser.add_argument("--name", required=True, help="The unique name of the payment method (e.g., alma).")
+    parser.add_argument("--query", required=True, help="The question you want to ask the knowledge base.")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help=f"Query server URL (default: {DEFAULT_SERVER}).")
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Only retrieve the top chunks, without generating an answer (like verify_chroma.py).",
+    )
+    parser.add_argument("--top_n", type=int, default=3, help="Number of chunks to return with --search.")
+    args = parser.parse_args()
+
+    try:
+        if args.search:
+            result = post(args.server, "/search", {"name": args.name, "query": args.query, "top_n": args.top_n})
+        else:
+            result = post(args.server, "/query", {"name": args.name, "query": args.query})
+    except (requests.RequestException, RuntimeError) as e:
+        print(f"❌ {e}")
+        return
+
+    if args.search:
+        for i, hit in enumerate(result["results"]):
+            print(f"\n--- Result {i+1} ---")
+            print(f"Source ID: {hit['id']}")
+            print(f"Score: {hit['score']:.4f}")
+            print("Text:")
+            print(hit["text"])
+    else:
+        # Kept in sync with query_knowledge_base.print_response, which this
+        # module does not import to stay lightweight.
+        print("--- RESPONSE ---")
+        print(result["response"])
+        print("\n--- SOURCES ---")
+        for source in result["sources"]:
+            print(f"Source: {source['url']}")
+            print(f"Score: {source['score']:.4f}")
+            print("-" * 20)
+    label = "Cached answer" if result.get("cached") else "Timings"
+    print(f"\n{label}: {format_timings(result['timings'])}")
+
+
+if __name__ == "__main__":
+    main()
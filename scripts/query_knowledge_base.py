@@ -1,79 +1,233 @@
+from __future__ import annotations
+
 import argparse
-import chromadb
-import google.auth
-import vertexai
+import time
+from typing import TYPE_CHECKING
 
-from llama_index.core import VectorStoreIndex, Settings
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.vertex import VertexTextEmbedding
-from llama_index.llms.google_genai import GoogleGenAI
+import compact_storage
+import knowledge_store
+import models
+from lexical_index import LexicalIndex
+from query_cache import DEFAULT_CACHE_DIR, DEFAULT_TTL_SECONDS, QueryCache, collection_version, retrieval_settings
 
-def main():
-    parser = argparse.ArgumentParser(description="Query a knowledge base for a specific payment method.")
-    parser.add_argument("--name", required=True, help="The unique name of the payment method (e.g., alma).")
-    parser.add_argument("--query", required=True, help="The question you want to ask the knowledge base.")
-    parser.add_argument("--location", default="us-central1", help="The Google Cloud location/region.")
-    args = parser.parse_args()
+if TYPE_CHECKING:
+    from hybrid_retriever import HybridRetriever
 
-    print(f"Querying knowledge base for '{args.name}'...")
+# --- Global Configuration ---
+DEFAULT_LOCATION = models.DEFAULT_LOCATION
+# Chunks retrieved per query; LlamaIndex's own default (llama_index.core.constants).
+DEFAULT_SIMILARITY_TOP_K = 2
+# "hybrid" fuses BM25 and vector search; "vector" and "lexical" use one of them.
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+# --- End Global Configuration ---
 
-    # 1. Authenticate with Google Cloud and configure models
-    print("Authenticating with Google Cloud and configuring models...")
-    credentials, project_id = google.auth.default()
-    vertexai.init(project=project_id, location=args.location, credentials=credentials)
 
-    # Configure the embedding model
-    embed_model = VertexTextEmbedding(
-        model_name="text-embedding-004",
-        project=project_id,
-        credentials=credentials,
-    )
+def configure_models(location: str = DEFAULT_LOCATION):
+    """
+    Authenticates with Google Cloud and sets up the embedding model and LLM.
 
-    # Configure the LLM for answer generation
-    llm = GoogleGenAI(
-        model_name="models/gemini-pro",
-        vertex=vertexai,
-    )
+    Both models are also installed in the global llama_index Settings.
+
+    Args:
+        location: The Google Cloud location/region.
+
+    Returns:
+        A tuple of (embedding model, LLM).
+    """
+    from llama_index.core import Settings
+
+    embed_model = models.embedding_model()
+    llm = models.llm(location)
 
     # Set the global settings
     Settings.llm = llm
     Settings.embed_model = embed_model
-    
-    print("✅ Authentication and model configuration successful.")
+    return embed_model, llm
 
-    # 2. Connect to the ChromaDB vector store
-    print("Connecting to ChromaDB...")
-    db = chromadb.PersistentClient(path="./chroma_db")
-    collection_name = f"{args.name.lower()}_docs"
-    chroma_collection = db.get_collection(collection_name)
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    print(f"✅ Connected to collection '{collection_name}'.")
-
-    # 3. Load the index from the vector store
-    # NOTE: We no longer need to pass the embed_model here
-    # as it's now in the global Settings.
-    index = VectorStoreIndex.from_vector_store(
-        vector_store,
-    )
 
-    # 4. Create a query engine
-    print("Creating query engine...")
-    query_engine = index.as_query_engine()
-    print("✅ Query engine created.")
+def open_collection(db, name: str):
+    """Returns the Chroma collection of a knowledge base (e.g., 'alma'), wrapped for re-scoring if it is compact."""
+    return compact_storage.wrap(db.get_collection(knowledge_store.collection_name(name)))
 
-    # 5. Execute the query
-    print(f"\nAsking: \"{args.query}\"\n")
-    response = query_engine.query(args.query)
 
-    # 6. Print the results
+def open_retriever(
+    chroma_collection,
+    embed_model,
+    similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K,
+    mode: str = "hybrid",
+) -> HybridRetriever:
+    """
+    Creates the retriever for a knowledge base's Chroma collection.
+
+    Args:
+        chroma_collection: The knowledge base's collection.
+        embed_model: Embeds queries that arrive without an embedding.
+        similarity_top_k: The number of chunks to retrieve.
+        mode: One of RETRIEVAL_MODES.
+
+    Returns:
+        A HybridRetriever over the collection and its lexical index.
+    """
+    from hybrid_retriever import HybridRetriever
+
+    lexical_index = LexicalIndex(chroma_collection.name)
+    if mode != "vector":
+        lexical_index.ensure_built(chroma_collection)
+    return HybridRetriever(chroma_collection, lexical_index, embed_model, similarity_top_k, mode=mode)
+
+
+def source_list(source_nodes) -> list[dict]:
+    """Reduces a response's source nodes to their URL and score."""
+    return [
+        {"url": node.metadata.get("url", "N/A"), "score": node.score}
+        for node in source_nodes
+    ]
+
+
+def answer_query(
+    retriever,
+    synthesizer,
+    embed_model,
+    query: str,
+    cache: QueryCache | None = None,
+    version: str | None = None,
+) -> dict:
+    """
+    Answers a question in explicit, timed stages: embed, retrieve, synthesize.
+
+    With a cache, the query embedding is reused across collections, and the
+    whole answer is reused while the collection stays at the same version.
+    The embed stage is skipped when the retriever can answer from its lexical
+    index alone (exact identifier lookups).
+
+    Args:
+        retriever: The knowledge base's retriever.
+        synthesizer: The response synthesizer that writes the answer.
+        embed_model: The embedding model used for the query.
+        query: The question.
+        cache: An optional QueryCache.
+        version: The collection's version (see query_cache.collection_version).
+            Answers are only cached when it is given.
+
+    Returns:
+        A dict with the answer ("response"), its "sources", per-stage
+        "timings" in seconds, and whether it was "cached".
+    """
+    from llama_index.core import QueryBundle
+
+    start = time.perf_counter()
+    settings = retrieval_settings(retriever.mode, retriever.similarity_top_k)
+    if cache is not None and version is not None:
+        answer = cache.get_answer(version, settings, query)
+        if answer is not None:
+            answer["timings"] = {"total": time.perf_counter() - start}
+            answer["cached"] = True
+            return answer
+
+    needs_embedding = getattr(retriever, "needs_embedding", None)
+    if needs_embedding is not None and not needs_embedding(query):
+        embedding = None
+    elif cache is not None:
+        embedding = cache.embed_query(embed_model, query)
+    else:
+        embedding = embed_model.get_query_embedding(query)
+    bundle = QueryBundle(query_str=query, embedding=embedding)
+    embedded = time.perf_counter()
+
+    nodes = retriever.retrieve(bundle)
+    retrieved = time.perf_counter()
+
+    response = synthesizer.synthesize(bundle, nodes)
+    synthesized = time.perf_counter()
+
+    answer = {"response": str(response), "sources": source_list(response.source_nodes)}
+    if cache is not None and version is not None:
+        cache.put_answer(version, settings, query, answer)
+    answer["timings"] = {
+        "embed": embedded - start,
+        "retrieve": retrieved - embedded,
+        "synthesize": synthesized - retrieved,
+        "total": synthesized - start,
+    }
+    answer["cached"] = False
+    return answer
+
+
+def print_response(response: str, sources: list[dict]):
+    """Prints an answer and its sources."""
     print("--- RESPONSE ---")
     print(response)
     print("\n--- SOURCES ---")
-    for node in response.source_nodes:
-        print(f"Source: {node.metadata.get('url', 'N/A')}")
-        print(f"Score: {node.score:.4f}")
-        # print(f"Text: {node.get_content()[:250]}...") # Uncomment for more detail
+    for source in sources:
+        print(f"Source: {source['url']}")
+        print(f"Score: {source['score']:.4f}")
         print("-" * 20)
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a knowledge base for a specific payment method.")
+    parser.add_argument("--name", required=True, help="The unique name of the payment method (e.g., alma).")
+    parser.add_argument("--query", required=True, help="The question you want to ask the knowledge base.")
+    parser.add_argument("--location", default=DEFAULT_LOCATION, help="The Google Cloud location/region.")
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory for cached query embeddings and answers (default: {DEFAULT_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_SECONDS,
+        help="Seconds a cached answer stays valid (default: one week).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Always embed and answer the query afresh.")
+    parser.add_argument(
+        "--retrieval-mode",
+        choices=RETRIEVAL_MODES,
+        default="hybrid",
+        help="Fuse BM25 and vector search (default), or use only one of them.",
+    )
+    args = parser.parse_args()
+
+    print(f"Querying knowledge base for '{args.name}'...")
+
+    # 1. Connect to the ChromaDB vector store
+    print("Connecting to ChromaDB...")
+    chroma_collection = open_collection(knowledge_store.get_client(), args.name)
+    version = collection_version(chroma_collection)
+    print(f"✅ Connected to collection '{chroma_collection.name}'.")
+
+    # 2. Reuse the answer if this question was already asked of this version
+    # of the collection; that skips the model setup entirely.
+    cache = None if args.no_cache else QueryCache(args.cache_dir, ttl_seconds=args.cache_ttl)
+    print(f"\nAsking: \"{args.query}\"\n")
+    settings = retrieval_settings(args.retrieval_mode, DEFAULT_SIMILARITY_TOP_K)
+    answer = cache.get_answer(version, settings, args.query) if cache is not None else None
+    if answer is not None:
+        print("✅ Answered from the query cache.")
+    else:
+        # 3. Authenticate with Google Cloud and configure models
+        print("Authenticating with Google Cloud and configuring models...")
+        embed_model, llm = configure_models(args.location)
+        print("✅ Authentication and model configuration successful.")
+
+        # 4. Create the retriever and response synthesizer
+        print("Creating query engine...")
+        from llama_index.core import get_response_synthesizer
+
+        retriever = open_retriever(chroma_collection, embed_model, mode=args.retrieval_mode)
+        synthesizer = get_response_synthesizer(llm=llm)
+        print("✅ Query engine created.")
+
+        # 5. Execute the query
+        answer = answer_query(retriever, synthesizer, embed_model, args.query, cache=cache, version=version)
+        timings = ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in answer["timings"].items())
+        print(f"Timings: {timings}\n")
+
+    # 6. Print the results
+    print_response(answer["response"], answer["sources"])
+    if cache is not None:
+        cache.close()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,260 @@
+"""
+A long-running query service that keeps models and Chroma clients warm.
+
+Every run of `query_knowledge_base.py` or `verify_chroma.py` pays the full
+cold start: imports, Google auth, model setup, opening Chroma and loading
+the index. The server does all of that once, keeps one retriever (with its
+lexical index) and response synthesizer per knowledge base, and answers concurrent
+requests over local HTTP:
+
+    POST /query   {"name": "alma", "query": "..."}              -> answer + sources
+    POST /search  {"name": "alma", "query": "...", "top_n": 3}  -> top chunks
+    GET  /stats                                                 -> latency per stage
+    GET  /health
+
+Each query runs its stages explicitly (embed, retrieve, synthesize) so the
+time spent in each is reported with the answer and aggregated in /stats.
+Query embeddings and answers go through a QueryCache, so a repeated question
+is answered in milliseconds until its collection is re-ingested.
+Use `query_client.py` to talk to it.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import knowledge_store
+from lexical_index import hybrid_search
+from query_cache import DEFAULT_CACHE_DIR, DEFAULT_TTL_SECONDS, QueryCache, collection_version
+from query_knowledge_base import (
+    DEFAULT_LOCATION,
+    answer_query,
+    configure_models,
+    open_collection,
+    open_retriever,
+)
+
+# --- Global Configuration ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# How many recent timings per stage are kept for the /stats percentiles.
+_STATS_WINDOW = 1000
+# --- End Global Configuration ---
+
+
+class LatencyStats:
+    """Thread-safe per-stage latency samples over a sliding window."""
+
+    def __init__(self, window: int = _STATS_WINDOW):
+        self._samples: dict[str, deque] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, timings: dict[str, float]):
+        with self._lock:
+            for stage, seconds in timings.items():
+                self._samples.setdefault(stage, deque(maxlen=self._window)).append(seconds)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Returns count, p50 and p95 in milliseconds for every stage."""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": values[len(values) // 2] * 1000,
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+            }
+            for stage, values in samples.items()
+        }
+
+
+class QueryService:
+    """Warm models, a shared Chroma client and cached per-collection query components."""
+
+    def __init__(self, embed_model, llm, db=None, cache: QueryCache | None = None):
+        """
+        Initializes the QueryService.
+
+        Args:
+            embed_model: The embedding model used for queries.
+            llm: The LLM used to synthesize answers.
+            db: A Chroma client. Defaults to the knowledge store's shared client.
+            cache: An optional QueryCache for query embeddings and answers.
+        """
+        self.embed_model = embed_model
+        self.llm = llm
+        self.db = db or knowledge_store.get_client()
+        self.cache = cache
+        self.stats = LatencyStats()
+        self._engines: dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def engine(self, name: str):
+        """
+        Returns (version, retriever, synthesizer) for a knowledge base.
+
+        The collection's version is read on every call, so a re-ingestion is
+        picked up by the next query. The retriever is opened on first use and
+        reopened if the collection was recreated in the meantime.
+        """
+        from llama_index.core import get_response_synthesizer
+
+        key = name.lower()
+        chroma_collection = open_collection(self.db, name)
+        version = collection_version(chroma_collection)
+        with self._lock:
+            cached = self._engines.get(key)
+            if cached is None or cached[0] != chroma_collection.id:
+                start = time.perf_counter()
+                cached = (
+                    chroma_collection.id,
+                    open_retriever(chroma_collection, self.embed_model),
+                    get_response_synthesizer(llm=self.llm),
+                )
+                self._engines[key] = cached
+                print(f"✅ Opened knowledge base '{key}' in {time.perf_counter() - start:.2f}s.")
+        return (version, *cached[1:])
+
+    def query(self, name: str, query: str) -> dict:
+        """Answers a question, returning the answer, its sources and per-stage timings."""
+        version, retriever, synthesizer = self.engine(name)
+        answer = answer_query(retriever, synthesizer, self.embed_model, query, cache=self.cache, version=version)
+        self.stats.record(
+            {f"cached_{stage}" if answer["cached"] else stage: seconds for stage, seconds in answer["timings"].items()}
+        )
+        return answer
+
+    def search(self, name: str, query: str, top_n: int = 3) -> dict:
+        """Returns the top chunks for a query without calling the LLM, like verify_chroma.py."""
+        start = time.perf_counter()
+        _, retriever, _ = self.engine(name)
+        timings = {"embed": 0.0}
+
+        def embed_query() -> list[float]:
+            # Only called when the search needs vectors; identifier lookups skip it.
+            started = time.perf_counter()
+            if self.cache is not None:
+                embedding = self.cache.embed_query(self.embed_model, query)
+            else:
+                embedding = self.embed_model.get_query_embedding(query)
+            timings["embed"] = time.perf_counter() - started
+            return embedding
+
+        hits = hybrid_search(retriever.chroma_collection, retriever.lexical_index, query, top_n, embed_query)
+        total = time.perf_counter() - start
+        timings.update(retrieve=total - timings["embed"], total=total)
+        self.stats.record({f"search_{stage}": seconds for stage, seconds in timings.items()})
+        return {
+            "results": [
+                {"id": hit.id, "score": hit.score, "url": hit.metadata.get("url"), "text": hit.text}
+                for hit in hits
+            ],
+            "timings": timings,
+        }
+
+    def open_collections(self) -> list[str]:
+        with self._lock:
+            return sorted(self._engines)
+
+
+def make_handler(service: QueryService):
+    """Builds the request handler class bound to a QueryService."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok", "collections": service.open_collections()})
+            elif self.path == "/stats":
+                stats = service.stats.snapshot()
+                if service.cache is not None:
+                    stats["cache"] = service.cache.summary()
+                self._send_json(200, stats)
+            else:
+                self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                name, query = request["name"], request["query"]
+            except (ValueError, KeyError) as e:
+                self._send_json(400, {"error": f"Expected a JSON body with 'name' and 'query': {e}"})
+                return
+
+            try:
+                if self.path == "/query":
+                    result = service.query(name, query)
+                elif self.path == "/search":
+                    result = service.search(name, query, int(request.get("top_n", 3)))
+                else:
+                    self._send_json(404, {"error": f"Unknown path: {self.path}"})
+                    return
+            except Exception as e:
+                print(f"❌ Query for '{name}' failed: {e}")
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    """Main function to parse arguments and run the query server."""
+    parser = argparse.ArgumentParser(description="Serve knowledge base queries from warm, resident models.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST}).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT}).")
+    parser.add_argument("--location", default=DEFAULT_LOCATION, help="The Google Cloud location/region.")
+    parser.add_argument(
+        "--preload", nargs="*", default=[], help="Knowledge base names to open at startup (e.g., alma ppro)."
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory for cached query embeddings and answers (default: {DEFAULT_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_SECONDS,
+        help="Seconds a cached answer stays valid (default: one week).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Always embed and answer queries afresh.")
+    args = parser.parse_args()
+
+    print("Authenticating with Google Cloud and configuring models...")
+    embed_model, llm = configure_models(args.location)
+    cache = None if args.no_cache else QueryCache(args.cache_dir, ttl_seconds=args.cache_ttl)
+    service = QueryService(embed_model, llm, cache=cache)
+    print("✅ Models ready.")
+    for name in args.preload:
+        service.engine(name)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(f"🎉 Query server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Sitemap discovery and page scraping for the web ingestion scripts.
+
+Pages are found through the site's sitemaps or by crawling, fetched through
+the shared fetcher pool, stripped of boilerplate, optionally translated, and
+yielded as LlamaIndex Documents as soon as each one is ready. Nothing here
+touches Chroma, the embedding models or PDF parsing, so scripts that only
+need pages (`create_core_knowledge_base.py`, the benchmarks) can import it
+without those dependencies. LlamaIndex is only loaded once the first page
+is turned into a Document.
+"""
+from __future__ import annotations
+
+import importlib.util
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Container, Iterable, Iterator
+from urllib.parse import urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+
+import fetcher
+import telemetry
+import translation
+from frontier import Frontier, URLFilter
+from ingest_common import canonicalize_url
+from sitemap import read_sitemaps
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+# --- Global Configuration ---
+# A set of patterns to ignore during web crawling to avoid irrelevant links.
+IGNORE_PATTERNS = [
+    "/login", "/signup", "/edit", "cdn-cgi", "?", "#", ".pdf", ".zip", ".jpg", ".png"
+]
+
+# lxml parses HTML several times faster than the pure-Python parser, so we
+# use it whenever it's installed.
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+# --- End Global Configuration ---
+
+
+def fetch_sitemap_urls(
+    base_url: str,
+    modified_since: datetime | None = None,
+    unchanged_ids: set[str] | None = None,
+    stored_ids: Container[str] = (),
+) -> list[str]:
+    """
+    Finds the site's sitemaps and returns every URL they list.
+
+    This is the preferred method for URL discovery as it's efficient and
+    respects the website's own declared structure. Sitemaps declared in
+    robots.txt, sitemap indexes and gzipped sitemaps are all followed.
+
+    Args:
+        base_url: The base URL of the website (e.g., https://example.com).
+        modified_since: The start of the last successful run, if any.
+        unchanged_ids: If given, the canonical URLs of stored pages whose
+            sitemap `<lastmod>` is not after `modified_since` are added to it.
+        stored_ids: The IDs of the documents already in the collection. A
+            page that is not stored is never reported as unchanged, so one
+            that failed or was left out before is fetched whatever its
+            `<lastmod>` says.
+
+    Returns:
+        A list of URLs found in the sitemaps, or an empty list if not found.
+    """
+    entries = read_sitemaps(base_url)
+    if unchanged_ids is not None and modified_since is not None:
+        unchanged = []
+        for entry in entries:
+            canonical = canonicalize_url(entry.url)
+            if entry.unchanged_since(modified_since) and canonical in stored_ids:
+                unchanged.append(canonical)
+        unchanged_ids.update(unchanged)
+        print(f"{len(unchanged)} of {len(entries)} sitemap URL(s) unchanged since the last run")
+    return [entry.url for entry in entries]
+
+
+def translate_text(text: str, target_language: str) -> str:
+    """
+    Translates a given text to the target language using Google Cloud Translate.
+
+    The text is translated line by line through the shared Translator, which
+    batches requests and caches every translated segment, so text already
+    seen on another page or in a previous run costs no API call. If
+    translation fails, the original text is kept.
+
+    Args:
+        text: The text to translate.
+        target_language: The ISO 639-1 code for the target language (e.g., "en").
+
+    Returns:
+        The translated text, or the original text if translation fails.
+    """
+    with telemetry.span("translate", bytes=len(text)):
+        return translation.translate(text, target_language)
+
+
+@dataclass
+class PageResult:
+    """The outcome of fetching and parsing a single page."""
+
+    url: str
+    document: Document | None
+    links: list[str] = field(default_factory=list)
+
+
+def fetch_page(url: str, translate_to: str = None, extract_links: bool = False) -> PageResult | None:
+    """
+    Downloads and parses a page once, returning both its Document and its links.
+
+    The download, the parse and the translation are recorded as the
+    "fetch", "parse" and "translate" stages of the run's telemetry.
+
+    Args:
+        url: The URL to scrape.
+        translate_to: The target language for translation. If None, no translation.
+        extract_links: If True, also collect the absolute URLs of all links on the page.
+
+    Returns:
+        A PageResult, or None if the page could not be fetched.
+    """
+    from llama_index.core import Document
+
+    from chunking import html_to_text
+
+    print(f"Scraping: {url}")
+    try:
+        with telemetry.span("fetch") as span:
+            response = fetcher.get(url)
+            response.raise_for_status()
+            content = response.content
+            span.bytes = len(content)
+    except requests.RequestException as e:
+        print(f"Could not fetch {url}: {e}")
+        return None
+
+    with telemetry.span("parse", bytes=len(content)):
+        soup = BeautifulSoup(content, HTML_PARSER)
+        links = []
+        if extract_links:
+            links = [urljoin(url, link["href"]) for link in soup.find_all("a", href=True)]
+        page_text = html_to_text(soup)
+
+    if translate_to:
+        page_text = translate_text(page_text, translate_to)
+
+    return PageResult(
+        url=url,
+        document=Document(text=page_text, extra_info={"url": url}),
+        links=links,
+    )
+
+
+def process_url(url: str, translate_to: str = None) -> Document | None:
+    """
+    Scrapes a single URL, extracts its text content, and optionally translates it.
+
+    Args:
+        url: The URL to scrape.
+        translate_to: The target language for translation. If None, no translation.
+
+    Returns:
+        A LlamaIndex Document object, or None if scraping fails.
+    """
+    page = fetch_page(url, translate_to)
+    return page.document if page else None
+
+
+def iter_scrape(
+    urls: list[str],
+    recursive: bool = False,
+    translate_to: str = None,
+    workers: int = 1,
+    skip_urls: Iterable[str] = (),
+    url_filter: URLFilter | None = None,
+    max_depth: int | None = None,
+    max_pages: int | None = None,
+    failed_urls: set[str] | None = None,
+    left_urls: set[str] | None = None,
+) -> Iterator[Document]:
+    """
+    Scrapes a list of URLs, yielding each page's Document as soon as it is ready.
+
+    Up to `workers` pages are fetched concurrently. Requests go through the
+    shared fetcher pool, so per-host concurrency and rate limits still apply
+    no matter how many workers are running. Each page is downloaded and
+    parsed exactly once, even when its links are needed for recursion. URLs
+    are canonicalized first, so variants of one page (trailing slash,
+    index.html, fragments, tracking parameters) are fetched only once, and
+    every Document carries the canonical URL. The crawl order and the URL
+    rules are kept by a Frontier, which queues each URL at most once.
+
+    Args:
+        urls: A list of starting URLs.
+        recursive: If True, recursively follows links on the same domain.
+        translate_to: The target language for translation.
+        workers: The maximum number of pages in flight at once.
+        skip_urls: URLs that are already stored, e.g. by an interrupted run.
+            They are not yielded, and are only fetched when crawling
+            recursively, to discover their links.
+        url_filter: Include/exclude rules for URLs. Defaults to excluding
+            IGNORE_PATTERNS.
+        max_depth: Links more than this many hops from the start URLs are
+            not followed.
+        max_pages: Stop after fetching this many pages.
+        failed_urls: If given, the canonical URLs of pages that could not be
+            fetched are added to it.
+        left_urls: If given, the canonical URLs still queued when
+            `max_pages` stopped the crawl are added to it.
+
+    Yields:
+        LlamaIndex Document objects, in completion order.
+    """
+    skip_urls = {canonicalize_url(url) for url in skip_urls}
+    frontier = Frontier(
+        urlparse(canonicalize_url(urls[0])).netloc,
+        url_filter or URLFilter(exclude=map(re.escape, IGNORE_PATTERNS)),
+        max_depth=max_depth,
+        max_pages=max_pages,
+    )
+    if not recursive:
+        # Stored pages are only worth fetching for their links.
+        for url in skip_urls:
+            frontier.seen.add(url)
+    frontier.extend(urls)
+    found = 0
+
+    print(f"Starting scrape with {workers} worker(s)...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        while frontier or in_flight:
+            while frontier and len(in_flight) < workers:
+                linked_url, current_url, depth = frontier.pop()
+                future = executor.submit(fetch_page, linked_url, translate_to, recursive)
+                in_flight[future] = (current_url, depth)
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth = in_flight.pop(future)
+                page = future.result()
+                if page is None:
+                    if failed_urls is not None:
+                        failed_urls.add(url)
+                    continue
+                page.document.metadata["url"] = url
+                frontier.extend(page.links, depth + 1)
+                if url not in skip_urls:
+                    found += 1
+                    yield page.document
+
+    if left_urls is not None:
+        left_urls.update(canonical for _, canonical, _ in frontier.remaining())
+    print(f"✅ Scrape complete. Found {found} pages.")
+    print(f"   {telemetry.get_telemetry().stage_summary('fetch')}")
+    print(f"   {telemetry.get_telemetry().stage_summary('parse')} ({HTML_PARSER})")
+    print(f"   {frontier.stats.summary()}")
+
+
+def crawl_and_scrape(
+    urls: list[str], recursive: bool = False, translate_to: str = None, workers: int = 1
+) -> list[Document]:
+    """
+    Scrapes a list of URLs, optionally crawling recursively and translating content.
+
+    Args:
+        urls: A list of starting URLs.
+        recursive: If True, recursively follows links on the same domain.
+        translate_to: The target language for translation.
+        workers: The maximum number of pages in flight at once.
+
+    Returns:
+        A list of LlamaIndex Document objects.
+    """
+    return list(iter_scrape(urls, recursive, translate_to, workers=workers))
@@ -1,4 +1,4 @@
-import nltk
+import argparse
 import ssl
 
 def main():
@@ -6,6 +6,9 @@ def main():
     Downloads the necessary NLTK data (stopwords and punkt)
     and handles potential SSL certificate issues.
     """
+    argparse.ArgumentParser(description="Download the NLTK data used by the PDF parser.").parse_args()
+    import nltk
+
     print("Attempting to download NLTK data...")
     try:
         _create_unverified_https_context = ssl._create_unverified_context
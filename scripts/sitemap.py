@@ -0,0 +1,207 @@
+"""
+Sitemap discovery and parsing for the web scrapers.
+
+Sitemaps are found through the `Sitemap:` lines of the site's robots.txt,
+falling back to `sitemap.xml` next to the start URL. Each sitemap is streamed
+from the response into an `XMLPullParser` (entries are dropped from the tree
+as soon as they are read, so neither the body nor the element tree of a
+50,000-URL sitemap is ever held in memory), gzipped sitemaps (`.xml.gz`)
+are decompressed on the fly, and `<sitemapindex>` files are followed, with
+their child sitemaps fetched concurrently through the shared fetcher pool.
+
+Every URL is returned with its `<lastmod>`, so a re-ingestion can skip
+pages that have not changed since its last successful run.
+"""
+import xml.etree.ElementTree as ET
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time, timezone
+from typing import Iterable, Iterator
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+import fetcher
+
+# --- Global Configuration ---
+# Child sitemaps fetched at once while following a sitemap index.
+DEFAULT_SITEMAP_WORKERS = 4
+# Sitemap indexes are not supposed to nest, but some sites do; stop at this depth.
+MAX_SITEMAP_DEPTH = 4
+# Bytes read from a sitemap response at a time.
+CHUNK_SIZE = 64 * 1024
+# --- End Global Configuration ---
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+@dataclass
+class SitemapEntry:
+    """A page listed in a sitemap, with its last modification time if declared."""
+
+    url: str
+    lastmod: datetime | None = None
+
+    def unchanged_since(self, since: datetime | None) -> bool:
+        """True when the sitemap says the page was last modified before `since`."""
+        return since is not None and self.lastmod is not None and self.lastmod <= since
+
+
+def parse_lastmod(value: str | None) -> datetime | None:
+    """
+    Parses a W3C datetime from `<lastmod>` into an aware UTC datetime.
+
+    A date without a time counts as the end of that day, so a page changed
+    later on the day of the last run is not skipped. Unparseable values
+    return None, which means "changed".
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if len(value) == 10:
+        parsed = datetime.combine(parsed.date(), dt_time.max)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def robots_sitemaps(base_url: str) -> list[str]:
+    """Returns the sitemap URLs declared in the site's robots.txt."""
+    parts = urlparse(base_url)
+    robots_url = f"{parts.scheme}://{parts.netloc}/robots.txt"
+    try:
+        response = fetcher.get(robots_url)
+        response.raise_for_status()
+    except requests.RequestException:
+        return []
+    sitemaps = []
+    for line in response.text.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip().lower() == "sitemap" and value.strip():
+            sitemaps.append(urljoin(robots_url, value.strip()))
+    return sitemaps
+
+
+def _split_tag(tag: str) -> tuple[str, str]:
+    """Splits an ElementTree tag into its `{namespace}` prefix and local name."""
+    namespace, _, name = tag.rpartition("}")
+    return namespace + "}" if namespace else "", name
+
+
+def _decompressed(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Passes the chunks through, gunzipping them if the stream starts with the gzip magic."""
+    chunks = iter(chunks)
+    first = next((chunk for chunk in chunks if chunk), b"")
+    if first[:2] != _GZIP_MAGIC:
+        yield first
+        yield from chunks
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decompressor.decompress(first)
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    if not decompressor.eof:
+        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+
+def parse_sitemap(chunks: Iterable[bytes]) -> Iterator[tuple[str, str, datetime | None]]:
+    """
+    Streams the entries of a sitemap or sitemap index.
+
+    Only the `<loc>` and `<lastmod>` that are direct children of a `<url>` or
+    `<sitemap>` entry, in the entry's own namespace, are read, so extension
+    tags such as `<image:image><image:loc>` never replace the page URL.
+
+    Args:
+        chunks: The sitemap body, plain or gzipped, as an iterable of byte chunks.
+
+    Yields:
+        ("url", loc, lastmod) for pages and ("sitemap", loc, lastmod) for the
+        child sitemaps of an index.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    depth = 0
+    for data in _decompressed(chunks):
+        parser.feed(data)
+        for event, element in parser.read_events():
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = element
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            namespace, name = _split_tag(element.tag)
+            if name in ("url", "sitemap"):
+                loc = (element.findtext(f"{namespace}loc") or "").strip()
+                if loc:
+                    yield name, loc, parse_lastmod(element.findtext(f"{namespace}lastmod"))
+            # Every entry has been read once it ends; drop it from the root too.
+            root.clear()
+    parser.close()
+
+
+def _fetch_sitemap(url: str) -> tuple[list[SitemapEntry], list[str]]:
+    """Fetches one sitemap, returning its pages and the child sitemaps it points to."""
+    try:
+        with fetcher.get(url, stream=True) as response:
+            response.raise_for_status()
+            pages, children = [], []
+            for kind, loc, lastmod in parse_sitemap(response.iter_content(CHUNK_SIZE)):
+                if kind == "url":
+                    pages.append(SitemapEntry(loc, lastmod))
+                else:
+                    children.append(loc)
+        return pages, children
+    except (requests.RequestException, ET.ParseError, OSError, EOFError, zlib.error) as e:
+        print(f"Could not fetch or parse sitemap {url}: {e}")
+        return [], []
+
+
+def read_sitemaps(base_url: str, workers: int = DEFAULT_SITEMAP_WORKERS) -> list[SitemapEntry]:
+    """
+    Finds and reads every sitemap of a site, following sitemap indexes.
+
+    Args:
+        base_url: The start URL of the site (e.g., https://docs.example.com/).
+        workers: How many sitemaps are fetched at once.
+
+    Returns:
+        The pages listed in the sitemaps, each URL once, or an empty list if
+        the site has no usable sitemap.
+    """
+    candidates = robots_sitemaps(base_url)
+    if candidates:
+        print(f"Found {len(candidates)} sitemap(s) in robots.txt")
+    else:
+        candidates = [urljoin(base_url, "sitemap.xml")]
+
+    entries: dict[str, SitemapEntry] = {}
+    seen = set(candidates)
+    level = candidates
+    sitemaps_read = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in range(MAX_SITEMAP_DEPTH):
+            if not level:
+                break
+            next_level = []
+            for pages, children in executor.map(_fetch_sitemap, level):
+                sitemaps_read += 1
+                for entry in pages:
+                    entries.setdefault(entry.url, entry)
+                for child in children:
+                    if child not in seen:
+                        seen.add(child)
+                        next_level.append(child)
+            level = next_level
+
+    if entries:
+        print(f"✅ Found {len(entries)} URLs in {sitemaps_read} sitemap(s)")
+    return list(entries.values())
@@ -0,0 +1,337 @@
+"""
+Per-stage metrics, traces and run reports for the ingestion jobs.
+
+The pipeline's stages (fetching, parsing, translation, PDF partitioning,
+embedding, vector store writes) record every call into a shared
+`Telemetry`: a count, the bytes handled, the latency, and whether it
+failed. Recording is a lock and a few additions per call, so it is always
+on. At the end of a run the totals and p50/p95 latencies per stage are
+written as a JSON run report and printed as a table, which shows at a
+glance which stage bound the run.
+
+Two heavier outputs are optional:
+
+-   A trace of every call in the Chrome trace event format, one row per
+    thread (and per PDF worker process), which Perfetto
+    (https://ui.perfetto.dev), chrome://tracing and speedscope open as a
+    timeline / flame chart.
+-   A cProfile of every thread, merged into one pstats file for
+    `python -m pstats` or snakeviz.
+
+Like the fetcher and the translator, one instance is shared by the whole
+process; `configure` replaces it and `span`/`record` write to it.
+"""
+import cProfile
+import contextlib
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# --- Global Configuration ---
+DEFAULT_REPORT_DIR = "./.ingest_reports"
+# Latency samples kept per stage for the percentiles.
+_SAMPLE_WINDOW = 10_000
+# Trace events kept in memory; later calls are still counted but not traced.
+MAX_TRACE_EVENTS = 1_000_000
+# --- End Global Configuration ---
+
+
+def peak_rss_mb() -> float | None:
+    """Returns the peak resident memory of this process in MB, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+@dataclass
+class StageMetrics:
+    """Totals and recent latencies of one pipeline stage."""
+
+    calls: int = 0
+    errors: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    samples: deque = field(default_factory=lambda: deque(maxlen=_SAMPLE_WINDOW))
+
+    def to_dict(self) -> dict:
+        values = sorted(self.samples)
+        p50 = values[len(values) // 2] if values else 0.0
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))] if values else 0.0
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "p50_ms": p50 * 1000,
+            "p95_ms": p95 * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000,
+        }
+
+
+@dataclass
+class Span:
+    """A call being timed by `Telemetry.span`; set `bytes` once the size is known."""
+
+    stage: str
+    bytes: int = 0
+
+
+class Telemetry:
+    """Thread-safe per-stage counters, latencies and an optional trace of every call."""
+
+    def __init__(self, trace: bool = False):
+        """
+        Initializes the Telemetry.
+
+        Args:
+            trace: If True, every call is also kept as a trace event for
+                `write_trace`.
+        """
+        self.started = datetime.now(timezone.utc)
+        self._origin = time.perf_counter()
+        self.stages: dict[str, StageMetrics] = {}
+        self._events: list[dict] | None = [] if trace else None
+        self.dropped_events = 0
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        stage: str,
+        seconds: float,
+        bytes: int = 0,
+        error: bool = False,
+        start: float | None = None,
+        thread: int | None = None,
+    ):
+        """
+        Records one call of a stage.
+
+        Args:
+            stage: The stage name, e.g. "fetch".
+            seconds: How long the call took.
+            bytes: The bytes (or characters, for text stages) it handled.
+            error: Whether it failed.
+            start: Its `time.perf_counter()` start, to place it in the trace.
+            thread: The trace row; defaults to the calling thread.
+        """
+        with self._lock:
+            metrics = self.stages.get(stage)
+            if metrics is None:
+                metrics = self.stages[stage] = StageMetrics()
+            metrics.calls += 1
+            metrics.errors += error
+            metrics.bytes += bytes
+            metrics.seconds += seconds
+            metrics.samples.append(seconds)
+            if self._events is None or start is None:
+                return
+            if len(self._events) >= MAX_TRACE_EVENTS:
+                self.dropped_events += 1
+                return
+            self._events.append(
+                {
+                    "name": stage,
+                    "ph": "X",
+                    "ts": (start - self._origin) * 1_000_000,
+                    "dur": seconds * 1_000_000,
+                    "pid": os.getpid(),
+                    "tid": thread if thread is not None else threading.get_ident(),
+                    "args": {"bytes": bytes, "error": error} if error else {"bytes": bytes},
+                }
+            )
+
+    @contextlib.contextmanager
+    def span(self, stage: str, bytes: int = 0) -> Iterator[Span]:
+        """Times the body as one call of `stage`; an exception counts as an error and is re-raised."""
+        span = Span(stage, bytes)
+        error = False
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, span.bytes, error, start)
+
+    def stage_summary(self, stage: str) -> str:
+        """A one-line summary of a stage, for progress output."""
+        with self._lock:
+            metrics = self.stages.get(stage)
+            data = metrics.to_dict() if metrics else StageMetrics().to_dict()
+        return (
+            f"{stage}: {data['calls']} call(s), {data['bytes'] / 1_000_000:.2f} MB, "
+            f"p50 {data['p50_ms']:.1f} ms, p95 {data['p95_ms']:.1f} ms, {data['errors']} error(s)"
+        )
+
+    def report(self, **details) -> dict:
+        """Returns the run report: wall time, peak memory and the metrics of every stage."""
+        with self._lock:
+            stages = {stage: metrics.to_dict() for stage, metrics in self.stages.items()}
+        return {
+            **details,
+            "started": self.started.isoformat(),
+            "wall_seconds": time.perf_counter() - self._origin,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": stages,
+        }
+
+    def summary_table(self, report: dict | None = None) -> str:
+        """Formats a run report (by default, the current one) as a table."""
+        report = report or self.report()
+        lines = [
+            f"{'stage':<14} {'calls':>8} {'errors':>7} {'MB':>9} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9}"
+        ]
+        for stage, data in sorted(report["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(
+                f"{stage:<14} {data['calls']:>8} {data['errors']:>7} {data['bytes'] / 1_000_000:>9.2f} "
+                f"{data['seconds']:>9.1f} {data['p50_ms']:>9.1f} {data['p95_ms']:>9.1f}"
+            )
+        peak = report["peak_rss_mb"]
+        lines.append(
+            f"Wall time {report['wall_seconds']:.1f}s"
+            + (f", peak RSS {peak:.0f} MB" if peak is not None else "")
+            + ". Stage totals add up the time of concurrent calls."
+        )
+        return "\n".join(lines)
+
+    def write_trace(self, path: str):
+        """Writes the recorded calls as a Chrome trace event file."""
+        if self._events is None:
+            raise ValueError("Tracing was not enabled for this Telemetry.")
+        with self._lock:
+            events = list(self._events)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"✅ Trace of {len(events)} call(s) written to {path}" + (
+            f" ({self.dropped_events} not traced)" if self.dropped_events else ""
+        ))
+
+
+@contextlib.contextmanager
+def profile(path: str):
+    """
+    Profiles every thread of the process with cProfile and writes the merged stats to `path`.
+
+    PDF pages are partitioned in worker processes, which are not profiled;
+    their time shows up in the run report and the trace.
+    """
+    if sys.version_info >= (3, 12):
+        # cProfile is built on sys.monitoring and sees every thread.
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            print(f"✅ Profile written to {path}")
+        return
+
+    # Before 3.12 a profiler only sees the thread that enabled it, so every
+    # thread started from now on enables its own, and they are merged.
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def profile_thread(*_):
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    threading.setprofile(profile_thread)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        threading.setprofile(None)
+        with lock:
+            stats = pstats.Stats(profilers[0])
+            for profiler in profilers[1:]:
+                stats.add(profiler)
+        stats.dump_stats(path)
+        print(f"✅ Profile of {len(profilers)} thread(s) written to {path}")
+
+
+@contextlib.contextmanager
+def instrumented_run(
+    name: str,
+    report_dir: str = DEFAULT_REPORT_DIR,
+    trace_path: str | None = None,
+    profile_path: str | None = None,
+    **details,
+) -> Iterator[Telemetry]:
+    """
+    Collects telemetry for one ingestion run and reports it when the run ends, even if it fails.
+
+    Args:
+        name: The run's name, e.g. the collection; the report is written to
+            `report_dir/<name>-<start time>.json`.
+        report_dir: Where run reports are written.
+        trace_path: If given, a Chrome trace of every call is written there.
+        profile_path: If given, a cProfile of every thread is written there.
+        details: Extra fields for the report, e.g. the run's options.
+    """
+    telemetry = configure(trace=trace_path is not None)
+    status = "failed"
+    try:
+        with profile(profile_path) if profile_path else contextlib.nullcontext():
+            yield telemetry
+        status = "completed"
+    finally:
+        report = telemetry.report(name=name, status=status, **details)
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"{name}-{telemetry.started:%Y%m%dT%H%M%SZ}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\n--- Run Report ({status}) ---")
+        print(telemetry.summary_table(report))
+        print(f"✅ Run report written to {path}")
+        if trace_path:
+            telemetry.write_trace(trace_path)
+
+
+_default_telemetry: Telemetry | None = None
+_default_telemetry_lock = threading.Lock()
+
+
+def configure(**kwargs) -> Telemetry:
+    """Replaces the shared Telemetry with a new one built from the given options."""
+    global _default_telemetry
+    with _default_telemetry_lock:
+        _default_telemetry = Telemetry(**kwargs)
+        return _default_telemetry
+
+
+def get_telemetry() -> Telemetry:
+    """Returns the shared Telemetry, creating it on first use."""
+    global _default_telemetry
+    with _default_telemetry_lock:
+        if _default_telemetry is None:
+            _default_telemetry = Telemetry()
+        return _default_telemetry
+
+
+def span(stage: str, bytes: int = 0):
+    """Times one call of a stage in the shared Telemetry."""
+    return get_telemetry().span(stage, bytes)
+
+
+def record(stage: str, seconds: float, **kwargs):
+    """Records one call of a stage in the shared Telemetry."""
+    get_telemetry().record(stage, seconds, **kwargs)
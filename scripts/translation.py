@@ -0,0 +1,293 @@
+"""
+Batched, deduplicated and cached translation of scraped pages.
+
+Instead of sending each page's full text to Google Translate as one request,
+pages are split into segments (their non-blank lines). Segments already
+translated in this run or a previous one are served from a persistent cache
+keyed by (source hash, target language), so repeated navigation and footer
+text and unchanged pages cost no API calls. The remaining unique segments
+are sent in multi-segment requests. When several crawl workers hit the same
+untranslated segment at once, only one of them requests it.
+
+The client is anything with Google's `translate(values, target_language=...,
+format_=...)` signature, so the path can be exercised with a local fake.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+# --- Global Configuration ---
+DEFAULT_CACHE_DIR = ".translation_cache"
+# Google Translate v2 accepts at most 128 segments per request and recommends
+# keeping a request under about 30k characters.
+MAX_SEGMENTS_PER_REQUEST = 128
+MAX_CHARS_PER_REQUEST = 30000
+
+# The shared translator is created on first use, or explicitly via configure().
+_default_translator = None
+_default_translator_lock = threading.Lock()
+# --- End Global Configuration ---
+
+_LINE_SPLIT = re.compile(r"(\n+)")
+
+
+def segment_hash(segment: str) -> str:
+    return hashlib.sha256(segment.encode("utf-8")).hexdigest()
+
+
+def split_segments(text: str) -> list[tuple[str, str, str]]:
+    """
+    Splits text into (leading whitespace, segment, trailing whitespace) pieces.
+
+    Joining all three parts of every piece gives back the original text. The
+    segment is empty for pieces that are whitespace only or contain no letters
+    (numbers, punctuation), which need no translation.
+    """
+    pieces = []
+    for part in _LINE_SPLIT.split(text):
+        stripped = part.strip()
+        if not any(char.isalpha() for char in stripped):
+            pieces.append((part, "", ""))
+            continue
+        start = part.index(stripped)
+        pieces.append((part[:start], stripped, part[start + len(stripped):]))
+    return pieces
+
+
+class TranslationCache:
+    """Translated segments on disk, keyed by source hash and target language."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "segments.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " source_hash TEXT NOT NULL,"
+            " target TEXT NOT NULL,"
+            " translated TEXT NOT NULL,"
+            " PRIMARY KEY (source_hash, target))"
+        )
+        self._db.commit()
+
+    def get_many(self, hashes: list[str], target: str) -> dict[str, str]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT source_hash, translated FROM segments"
+                    f" WHERE target = ? AND source_hash IN ({placeholders})",
+                    [target, *batch],
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, translations: dict[str, str], target: str):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO segments VALUES (?, ?, ?)",
+                [(source_hash, target, text) for source_hash, text in translations.items()],
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Translator:
+    """Translates texts segment by segment, with batching, deduplication and caching."""
+
+    def __init__(
+        self,
+        client=None,
+        cache_dir: str | None = DEFAULT_CACHE_DIR,
+        max_segments_per_request: int = MAX_SEGMENTS_PER_REQUEST,
+        max_chars_per_request: int = MAX_CHARS_PER_REQUEST,
+    ):
+        """
+        Initializes the Translator.
+
+        Args:
+            client: A Google Translate v2 client, or a compatible fake. By
+                default one is created on first use.
+            cache_dir: Where translated segments are cached. None keeps them in memory only.
+            max_segments_per_request: The maximum number of segments per API request.
+            max_chars_per_request: The maximum characters per API request.
+        """
+        self.client = client
+        self.cache = TranslationCache(cache_dir) if cache_dir else None
+        self.max_segments_per_request = max_segments_per_request
+        self.max_chars_per_request = max_chars_per_request
+        self._memory: dict[tuple[str, str], str] = {}
+        # Segments another thread is translating right now.
+        self._pending: dict[tuple[str, str], threading.Event] = {}
+        self._lock = threading.Lock()
+        self._client_failed = False
+        self.segments = 0
+        self.cache_hits = 0
+        self.requests = 0
+        self.chars_sent = 0
+
+    def _get_client(self):
+        with self._lock:
+            if self.client is None and not self._client_failed:
+                try:
+                    from google.cloud import translate_v2 as translate
+
+                    print("Initializing Google Translate client...")
+                    self.client = translate.Client()
+                    print("✅ Translate client initialized.")
+                except Exception as e:
+                    print(f"Could not initialize Google Translate client: {e}")
+                    print("Translation will be skipped.")
+                    self._client_failed = True
+            return self.client
+
+    def _request_batches(self, items: list[tuple[str, str]]):
+        """Groups (source hash, segment) items into requests within the segment and character limits."""
+        batch, chars = [], 0
+        for item in items:
+            if batch and (
+                len(batch) >= self.max_segments_per_request
+                or chars + len(item[1]) > self.max_chars_per_request
+            ):
+                yield batch
+                batch, chars = [], 0
+            batch.append(item)
+            chars += len(item[1])
+        if batch:
+            yield batch
+
+    def _call_api(self, items: list[tuple[str, str]], target: str) -> dict[str, str]:
+        """Translates (source hash, segment) items and returns the translations keyed by source hash."""
+        client = self._get_client()
+        if client is None:
+            return {}
+        translated = {}
+        for batch in self._request_batches(items):
+            segments = [segment for _, segment in batch]
+            try:
+                results = client.translate(segments, target_language=target, format_="text")
+            except Exception as e:
+                print(f"Could not translate text: {e}")
+                continue
+            with self._lock:
+                self.requests += 1
+                self.chars_sent += sum(len(segment) for segment in segments)
+            for (source_hash, _), result in zip(batch, results):
+                translated[source_hash] = result["translatedText"]
+        return translated
+
+    def translate_segments(self, segments: list[str], target: str) -> dict[str, str]:
+        """
+        Translates segments, returning a map from source hash to translation.
+
+        Segments that could not be translated are missing from the result.
+        """
+        hashes = {segment_hash(segment): segment for segment in segments}
+        found, owned, waiting = {}, {}, {}
+        with self._lock:
+            self.segments += len(segments)
+            for source_hash, segment in hashes.items():
+                key = (source_hash, target)
+                if key in self._memory:
+                    found[source_hash] = self._memory[key]
+                elif key in self._pending:
+                    waiting[source_hash] = self._pending[key]
+                else:
+                    owned[source_hash] = segment
+                    self._pending[key] = threading.Event()
+        claimed = list(owned)
+
+        try:
+            if owned and self.cache:
+                cached = self.cache.get_many(claimed, target)
+                found.update(cached)
+                self._remember(cached, target)
+                for source_hash in cached:
+                    del owned[source_hash]
+            if owned:
+                translated = self._call_api(list(owned.items()), target)
+                found.update(translated)
+                if self.cache and translated:
+                    self.cache.put_many(translated, target)
+                self._remember(translated, target)
+        finally:
+            with self._lock:
+                for source_hash in claimed:
+                    self._pending.pop((source_hash, target)).set()
+
+        for source_hash, event in waiting.items():
+            event.wait()
+            with self._lock:
+                if (source_hash, target) in self._memory:
+                    found[source_hash] = self._memory[(source_hash, target)]
+
+        with self._lock:
+            self.cache_hits += sum(1 for segment in segments if segment_hash(segment) not in owned)
+        return found
+
+    def _remember(self, translations: dict[str, str], target: str):
+        with self._lock:
+            for source_hash, text in translations.items():
+                self._memory[(source_hash, target)] = text
+
+    def translate(self, text: str, target: str) -> str:
+        """
+        Translates a text to the target language, keeping its line structure.
+
+        Segments that fail to translate are kept in the original language.
+
+        Args:
+            text: The text to translate.
+            target: The ISO 639-1 code for the target language (e.g., "en").
+
+        Returns:
+            The translated text.
+        """
+        pieces = split_segments(text)
+        translations = self.translate_segments([segment for _, segment, _ in pieces if segment], target)
+        return "".join(
+            leading + (translations.get(segment_hash(segment), segment) if segment else "") + trailing
+            for leading, segment, trailing in pieces
+        )
+
+    def summary(self) -> str:
+        segments = self.segments or 1
+        return (
+            f"Translation: {self.segments} segment(s), {self.cache_hits / segments:.0%} served "
+            f"without an API call, {self.requests} request(s), {self.chars_sent:,} characters sent"
+        )
+
+    def close(self):
+        if self.cache:
+            self.cache.close()
+
+
+def configure(**kwargs) -> Translator:
+    """Replaces the shared translator with one built from the given Translator options."""
+    global _default_translator
+    with _default_translator_lock:
+        if _default_translator is not None:
+            _default_translator.close()
+        _default_translator = Translator(**kwargs)
+        return _default_translator
+
+
+def get_translator() -> Translator:
+    """Returns the shared translator, creating it with the default cache on first use."""
+    global _default_translator
+    with _default_translator_lock:
+        if _default_translator is None:
+            _default_translator = Translator()
+        return _default_translator
+
+
+def translate(text: str, target: str) -> str:
+    """Translates a text through the shared translator."""
+    return get_translator().translate(text, target)